@@ -0,0 +1,219 @@
+# benchmarks/corpus.py
+# Benchmark corpus: deterministic synthetic crawl console screens (120x45,
+# same layout as crawl-console: map | stat panel at col 37 | messages below)
+# for each situation the controller handles, plus frames from recorded
+# sessions (core/recorder.py).
+#
+# Each scenario is a *sequence* of frames (consecutive turns), so the
+# incremental parser and the FSM see realistic frame-to-frame changes.
+from __future__ import annotations
+
+import hashlib
+import random
+from dataclasses import dataclass
+
+WIDTH, HEIGHT = 120, 45
+PANEL_COL = 37
+VIEW_ROWS = 21
+
+SCENARIOS = ("explore", "fight", "more", "shop", "repeat", "confirm")
+
+_MAP = [
+    "###########################",
+    "#.........#...............#",
+    "#.........+.......>.......#",
+    "#.........#...............#",
+    "#####+#####...............#",
+    "#.........#######+#########",
+    "#..<......#.......#",
+    "###########.......#",
+    "          #########",
+]
+_MONSTERS = [
+    ("g", "goblin"),
+    ("j", "jackal"),
+    ("o", "orc"),
+    ("r", "rat"),
+    ("S", "ball python"),
+    ("k", "kobold"),
+    ("K", "hobgoblin"),
+]
+_STATUS = ["wandering", "asleep", "", "", "constriction, asleep", "fleeing"]
+_WEAPONS = ["dagger", "short sword", "hand axe", "spear", "mace", "whip", "club"]
+_FLAVOUR = [
+    "You see here a +0 dagger.",
+    "There is an open door here.",
+    "You open the door.",
+    "Done exploring.",
+    "You now have 32 gold pieces.",
+    "Found a staircase leading down.",
+    "You feel a little hungry.",
+]
+
+
+@dataclass(frozen=True)
+class Sample:
+    scenario: str
+    text: str
+    width: int = WIDTH
+    height: int = HEIGHT
+
+
+class _Screen:
+    def __init__(self):
+        self.rows = [[" "] * WIDTH for _ in range(HEIGHT)]
+
+    def put(self, r: int, c: int, s: str) -> None:
+        row = self.rows[r]
+        for i, ch in enumerate(s[: WIDTH - c]):
+            row[c + i] = ch
+
+    def text(self) -> str:
+        return "".join("".join(r) for r in self.rows)
+
+
+def _hud(scr: _Screen, hp: int, hp_max: int, turn: int, depth: int) -> None:
+    lines = [
+        "Robin the Skirmisher",
+        "Minotaur Berserker",
+        f"Health: {hp}/{hp_max}    " + "=" * max(0, hp * 20 // hp_max),
+        "Magic:  2/2      ==========",
+        "AC:  3          Str: 21",
+        "EV:  9          Int:  7",
+        "SH:  0          Dex: 11",
+        f"XL:  3 Next: 42% Place: Dungeon:{depth}",
+        f"Noise: ---------  Time: {turn}.0 (1.0)",
+        "Wp: a - +0 hand axe",
+        "Qv: Nothing quivered",
+    ]
+    for i, line in enumerate(lines):
+        scr.put(i, PANEL_COL, line)
+
+
+def _screen(turn, hp, hp_max, monsters, messages, depth=1) -> str:
+    scr = _Screen()
+    for i, line in enumerate(_MAP):
+        scr.put(i + 1, 1, line)
+    scr.put(3, 3 + turn % 7, "@")
+    for k, (glyph, _, _) in enumerate(monsters):
+        scr.put(2 + k, 12 + k * 2, glyph)
+    _hud(scr, hp, hp_max, turn, depth)
+    row = 12
+    if hp * 3 < hp_max:
+        scr.put(row, PANEL_COL, "Slow Weak")
+        row += 1
+    for glyph, name, status in monsters:
+        line = f"{glyph}   {name}" + (f" ({status})" if status else "")
+        scr.put(row, PANEL_COL, line)
+        row += 1
+    shown = messages[-(HEIGHT - VIEW_ROWS) :]
+    for i, msg in enumerate(shown):
+        scr.put(VIEW_ROWS + i, 0, "_" + msg)
+    return scr.text()
+
+
+def _shop_screen(turn) -> str:
+    scr = _Screen()
+    scr.put(0, 0, "Welcome to Ziggy's Antique Weapon Shop! What would you like to do?")
+    for i in range(14):
+        price = 20 + (turn * 7 + i * 13) % 300
+        scr.put(
+            2 + i,
+            0,
+            f"{chr(97 + i)} - a +{i % 4} {_WEAPONS[i % len(_WEAPONS)]} ({price} gold)",
+        )
+    scr.put(
+        HEIGHT - 2, 0, "[Esc] exit          [!] buy|examine items    [a-n] mark item"
+    )
+    scr.put(HEIGHT - 1, 0, f"You have {100 + turn} gold pieces.")
+    return scr.text()
+
+
+def _scenario(name: str, n: int, rng: random.Random):
+    hp_max = 40
+    hp = hp_max
+    messages = ["Welcome, Robin the Minotaur Berserker."]
+    for turn in range(n):
+        monsters = []
+        if name == "explore":
+            if rng.random() < 0.4:
+                messages.append(rng.choice(_FLAVOUR))
+            hp = min(hp_max, hp + 1)
+            yield _screen(turn, hp, hp_max, monsters, messages)
+
+        elif name == "fight":
+            count = 2 + turn % 3
+            monsters = [
+                (g, nm, rng.choice(_STATUS)) for g, nm in rng.sample(_MONSTERS, count)
+            ]
+            _, victim, _ = monsters[0]
+            roll = rng.random()
+            if roll < 0.4:
+                hp = max(1, hp - rng.randint(1, 6))
+                messages.append(f"The {victim} hits you.")
+            elif roll < 0.6:
+                messages.append(f"The {victim} misses you.")
+            elif roll < 0.8:
+                messages.append(f"You hit the {victim}.")
+            else:
+                messages.append(f"A {monsters[-1][1]} comes into view.")
+            if hp <= 5:
+                hp = hp_max
+            yield _screen(turn, hp, hp_max, monsters, messages)
+
+        elif name == "more":
+            messages.append(rng.choice(_FLAVOUR))
+            if turn % 2 == 0:
+                messages.append("--more--")
+            yield _screen(turn, hp, hp_max, monsters, messages)
+            if messages[-1] == "--more--":
+                messages.pop()
+
+        elif name == "shop":
+            yield _shop_screen(turn)
+
+        elif name == "repeat":
+            messages.append(rng.choice(_FLAVOUR))
+            if turn % 2 == 0:
+                messages.append("Number of times to repeat, then command key: 3")
+            yield _screen(turn, hp, hp_max, monsters, messages)
+
+        elif name == "confirm":
+            monsters = [("g", "goblin", "")]
+            messages.append(rng.choice(_FLAVOUR))
+            if turn % 2 == 0:
+                messages.append("Really attack the goblin? (y/n)")
+            yield _screen(turn, hp, hp_max, monsters, messages)
+
+
+def synthetic(n_per_scenario: int = 200, seed: int = 1234) -> list[Sample]:
+    """Same seed -> byte-identical corpus, so results compare across runs."""
+    out = []
+    for name in SCENARIOS:
+        rng = random.Random(f"{seed}:{name}")
+        for text in _scenario(name, n_per_scenario, rng):
+            out.append(Sample(name, text))
+    return out
+
+
+def recorded(path: str, limit: int | None = None) -> list[Sample]:
+    """Frames of a recorded session (run_logs/recordings/<...>)."""
+    from core.recorder import Recording
+
+    rec = Recording(path)
+    try:
+        n = len(rec) if limit is None else min(limit, len(rec))
+        return [
+            Sample("recorded", f.text, f.width, f.height)
+            for f in (rec[i] for i in range(n))
+        ]
+    finally:
+        rec.close()
+
+
+def fingerprint(samples: list[Sample]) -> str:
+    h = hashlib.sha1()
+    for s in samples:
+        h.update(s.scenario.encode())
+        h.update(s.text.encode("utf-8"))
+    return h.hexdigest()[:16]
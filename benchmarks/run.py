@@ -0,0 +1,220 @@
+# benchmarks/run.py
+# Hot-path benchmarks over the corpus in benchmarks/corpus.py.
+#
+#   python benchmarks/run.py                                  (synthetic only)
+#   python benchmarks/run.py --recorded run_logs/recordings/<session>
+#   python benchmarks/run.py --out bench.json --compare baseline.json
+#
+# Per benchmark: n, mean, p50, p90, p99, max (microseconds per call).
+# --out writes them as JSON together with the corpus fingerprint, git commit
+# and interpreter, so files from different days can be compared;
+# --compare exits 1 if any p50 got slower than --threshold (default 15%).
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks import corpus  # noqa: E402
+from core.controller import POLICY, ControllerState, evaluate_threat, step  # noqa: E402
+from core.controller import update_mode  # noqa: E402
+from core.map_grid import MapGrid  # noqa: E402
+from core.rules import Matcher  # noqa: E402
+from core.state_parser import FrameParser, parse_game_state, parse_hp  # noqa: E402
+from main import detect_flags_from_text  # noqa: E402
+
+# calls this cheap are timed in groups (timer overhead would dominate)
+FAST_BATCH = 100
+
+
+def percentiles(samples_ns: list[float]) -> dict:
+    xs = sorted(samples_ns)
+    n = len(xs)
+
+    def pct(p: float) -> float:
+        return xs[min(n - 1, int(p / 100.0 * n))] / 1000.0
+
+    return {
+        "n": n,
+        "mean_us": sum(xs) / n / 1000.0,
+        "p50_us": pct(50),
+        "p90_us": pct(90),
+        "p99_us": pct(99),
+        "max_us": xs[-1] / 1000.0,
+    }
+
+
+def measure(fn, args: list, repeat: int, batch: int = 1) -> list[float]:
+    """ns per call; each sample is the mean over `batch` consecutive calls."""
+    clock = time.perf_counter_ns
+    out = []
+    for _ in range(repeat):
+        for i in range(0, len(args) - batch + 1, batch):
+            chunk = args[i : i + batch]
+            t0 = clock()
+            for a in chunk:
+                fn(*a)
+            out.append((clock() - t0) / batch)
+    return out
+
+
+def bench_pipeline(samples: list, repeat: int) -> list[float]:
+    """
+    Frame -> commands, as the live loop does it: incremental parse of each
+    frame in sequence + controller step(). Fresh parser/state/matcher per pass.
+    """
+    clock = time.perf_counter_ns
+    out = []
+    for _ in range(repeat):
+        parser = FrameParser()
+        state = ControllerState()
+        matcher = Matcher(POLICY)
+        now = 0.0
+        for s in samples:
+            now += 0.1
+            t0 = clock()
+            gs = parser.parse(s.text, s.width)
+            state, _ = step(state, gs, now, matcher=matcher)
+            out.append(clock() - t0)
+    return out
+
+
+def git_commit() -> str | None:
+    try:
+        r = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        )
+        return r.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(samples: list, repeat: int) -> dict:
+    texts = [(s.text,) for s in samples]
+    flags_args = [(s.text, s.width) for s in samples]
+    states = [parse_game_state(s.text, s.width) for s in samples]
+    threat_args = [(gs, mode) for gs in states for mode in ("NORMAL", "CAUTION")]
+    ratios = [gs.hp_ratio for gs in states if gs.hp_ratio is not None]
+    mode_args = [(mode, r) for r in ratios for mode in ("NORMAL", "CAUTION", "PANIC")]
+    escape_args = [
+        (gs.map, 1, gs.hostile_glyphs)
+        for gs in states
+        if gs.map is not None and gs.monsters
+    ]
+
+    results = {}
+    gc.collect()
+    gc.disable()  # no collector pauses inside timings
+    try:
+        results["parse_hp"] = measure(parse_hp, texts, repeat)
+        results["detect_flags_from_text"] = measure(
+            detect_flags_from_text, flags_args, repeat
+        )
+        results["evaluate_threat"] = measure(
+            evaluate_threat, threat_args, repeat, FAST_BATCH
+        )
+        results["update_mode"] = measure(update_mode, mode_args, repeat, FAST_BATCH)
+        if escape_args:
+            results["escape_keys"] = measure(MapGrid.escape_keys, escape_args, repeat)
+        results["frame_to_commands"] = bench_pipeline(samples, repeat)
+        for name in corpus.SCENARIOS + ("recorded",):
+            part = [s for s in samples if s.scenario == name]
+            if part:
+                results[f"frame_to_commands.{name}"] = bench_pipeline(part, repeat)
+    finally:
+        gc.enable()
+    return {name: percentiles(xs) for name, xs in results.items()}
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    slower = []
+    for name, cur in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old or not old.get("p50_us"):
+            continue
+        ratio = cur["p50_us"] / old["p50_us"]
+        mark = ""
+        if ratio > 1.0 + threshold:
+            mark = "  <-- slower"
+            slower.append(name)
+        print(
+            f"  {name:34s} p50 {old['p50_us']:9.2f} -> {cur['p50_us']:9.2f} us "
+            f"({(ratio - 1) * 100:+.1f}%){mark}"
+        )
+    old_corpus = baseline.get("meta", {}).get("corpus", {}).get("fingerprint")
+    if old_corpus != current["meta"]["corpus"]["fingerprint"]:
+        print("  (warning: different corpus than the baseline)")
+    return slower
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Parse/decide/end-to-end benchmarks.")
+    ap.add_argument("--recorded", action="append", default=[], help="session dir")
+    ap.add_argument("--recorded-limit", type=int, default=2000)
+    ap.add_argument("--per-scenario", type=int, default=200)
+    ap.add_argument("--seed", type=int, default=1234)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--warmup", type=int, default=1)
+    ap.add_argument("--out", help="write results as JSON")
+    ap.add_argument("--compare", help="baseline JSON to compare against")
+    ap.add_argument("--threshold", type=float, default=0.15)
+    args = ap.parse_args()
+
+    samples = corpus.synthetic(args.per_scenario, args.seed)
+    for path in args.recorded:
+        samples += corpus.recorded(path, args.recorded_limit)
+
+    if args.warmup:
+        run(samples, args.warmup)
+    results = run(samples, args.repeat)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git": git_commit(),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "corpus": {
+                "fingerprint": corpus.fingerprint(samples),
+                "samples": len(samples),
+                "seed": args.seed,
+                "per_scenario": args.per_scenario,
+                "recorded": args.recorded,
+            },
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+    print(f"[BENCH] {len(samples)} frames x {args.repeat} (us per call)")
+    print(f"  {'benchmark':34s} {'p50':>9s} {'p90':>9s} {'p99':>9s} {'max':>9s}")
+    for name, r in results.items():
+        print(
+            f"  {name:34s} {r['p50_us']:9.2f} {r['p90_us']:9.2f} "
+            f"{r['p99_us']:9.2f} {r['max_us']:9.2f}"
+        )
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"[BENCH] wrote {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"[BENCH] vs {args.compare} ({baseline.get('meta', {}).get('git')})")
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
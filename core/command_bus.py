@@ -0,0 +1,249 @@
+# core/command_bus.py
+# Controller -> input_worker command bus.
+# Single-producer / single-consumer ring in shared memory (run_logs/commands.shm).
+#
+# Layout (little-endian):
+#   header  : magic, version, nslots, slot_size, head, tail, done, cancel,
+#             dropped, acked
+#   slot[i] : length, priority, plan_seq, t_ns, payload (utf-8 command line,
+#             "MOVE h")
+#             plan_seq: id of the controller decision that queued it (grows by
+#             one per decision, ControllerState.plan_id); t_ns: capture time
+#             (time.time_ns) of the frame it was decided on, 0 if unknown
+#             (core/trace.py)
+#
+# head and cancel are only written by the producer (main.py); tail, done,
+# dropped and acked only by the consumer (input_worker). A command becomes visible when
+# head is bumped, after its slot is fully written, so enqueue is atomic.
+#
+# The consumer moves everything visible into a local heap (tail = slots it
+# has taken) and hands commands out by (priority, arrival): prompt-clearing
+# commands (URGENT_COMMANDS) jump ahead of queued moves. cancel_before(seq)
+# raises the cancel watermark; a command queued by an older decision than the
+# watermark is dropped instead of delivered. done counts commands delivered
+# or dropped, so depth() = head - done covers both the ring and the heap.
+#
+# acked counts commands the worker has finished with: written to the game
+# (ack() after the backend returns) or dropped. The screen source stamps a
+# frame with the acked value read right before capturing it when the screen
+# differs from a capture made before those sends, so a frame with
+# ack_seq >= head shows the game's answer to everything sent.
+from __future__ import annotations
+
+import heapq
+import struct
+import time
+
+from core.shm import map_file
+
+MAGIC = b"DCCB"
+VERSION = 3
+NSLOTS = 256
+SLOT_SIZE = 64
+
+# lower goes first
+URGENT, NORMAL = 0, 1
+URGENT_COMMANDS = frozenset(("MORE", "ESC", "CONFIRM_Y"))
+
+_HEADER = struct.Struct("<4sIII")
+_HEADER_SIZE = 64
+_HEAD_OFF = 16
+_TAIL_OFF = 24
+_DONE_OFF = 32
+_CANCEL_OFF = 40
+_DROPPED_OFF = 48
+_ACKED_OFF = 56
+_U64 = struct.Struct("<Q")
+_SLOT = struct.Struct("<HBxIQ")  # length, priority, plan_seq, t_ns
+_PAYLOAD_MAX = SLOT_SIZE - _SLOT.size
+_SEQ_MASK = 0xFFFFFFFF
+
+
+def command_priority(cmd: str) -> int:
+    return URGENT if cmd in URGENT_COMMANDS else NORMAL
+
+
+REGION_SIZE = _HEADER_SIZE + NSLOTS * SLOT_SIZE
+
+
+class BusFull(RuntimeError):
+    pass
+
+
+def create_bus(path: str) -> None:
+    """(Re)create an empty bus region. Called by the controller at startup."""
+    mm = map_file(path, REGION_SIZE, create=True)
+    _HEADER.pack_into(mm, 0, MAGIC, VERSION, NSLOTS, SLOT_SIZE)
+    mm.close()
+
+
+class CommandBus:
+    """Either end of the bus; main.py uses send(), input_worker uses recv()."""
+
+    def __init__(self, path: str, create: bool = False, wait: float = 5.0):
+        if create:
+            create_bus(path)
+        self._mm = map_file(path, REGION_SIZE, create=False, wait=wait)
+        magic, version, _, _ = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise RuntimeError(f"not a command bus region: {path}")
+        # consumer side: (priority, arrival, cmd, plan_seq, t_ns)
+        self._heap: list[tuple] = []
+
+    def _get(self, off: int) -> int:
+        return _U64.unpack_from(self._mm, off)[0]
+
+    def depth(self) -> int:
+        """Commands sent but not yet delivered or dropped."""
+        return self._get(_HEAD_OFF) - self._get(_DONE_OFF)
+
+    def consumed(self) -> int:
+        """Number of commands the input worker has delivered or dropped."""
+        return self._get(_DONE_OFF)
+
+    def cancelled(self) -> int:
+        """Number of commands dropped as stale so far."""
+        return self._get(_DROPPED_OFF)
+
+    def acked(self) -> int:
+        """Commands delivered to the game (or dropped) so far."""
+        return self._get(_ACKED_OFF)
+
+    # ---- producer side ----
+    def send(self, cmd: str, plan_seq: int, t_ns: int = 0) -> int:
+        return self.send_many([cmd], plan_seq, t_ns)
+
+    def send_many(
+        self,
+        cmds: list[str],
+        plan_seq: int,
+        t_ns: int = 0,
+        priorities: list[int] | None = None,
+    ) -> int:
+        """
+        Enqueue all cmds at once (all-or-nothing). Returns the new head.
+        plan_seq is required: commands below the cancel watermark are
+        dropped, so it must come from the same increasing counter as
+        cancel_before() (the controller's plan_id). priorities default to
+        command_priority().
+        """
+        head = self._get(_HEAD_OFF)
+        depth = head - self._get(_DONE_OFF)
+        if depth + len(cmds) > NSLOTS:
+            raise BusFull(f"command bus full (depth={depth})")
+
+        seq = plan_seq & _SEQ_MASK
+        for i, cmd in enumerate(cmds):
+            data = cmd.encode("utf-8")[:_PAYLOAD_MAX]
+            prio = command_priority(cmd) if priorities is None else priorities[i]
+            off = _HEADER_SIZE + ((head + i) % NSLOTS) * SLOT_SIZE
+            _SLOT.pack_into(self._mm, off, len(data), prio, seq, t_ns)
+            self._mm[off + _SLOT.size : off + _SLOT.size + len(data)] = data
+
+        head += len(cmds)
+        _U64.pack_into(self._mm, _HEAD_OFF, head)
+        return head
+
+    def cancel_before(self, plan_seq: int) -> None:
+        """Drop every queued command with a plan_seq older than plan_seq."""
+        plan_seq &= _SEQ_MASK
+        if plan_seq > self._get(_CANCEL_OFF):
+            _U64.pack_into(self._mm, _CANCEL_OFF, plan_seq)
+
+    # ---- consumer side ----
+    def _pull(self) -> None:
+        """Move every visible slot into the local heap (frees the slots)."""
+        tail = self._get(_TAIL_OFF)
+        head = self._get(_HEAD_OFF)
+        mm = self._mm
+        while tail < head:
+            off = _HEADER_SIZE + (tail % NSLOTS) * SLOT_SIZE
+            n, prio, seq, t_ns = _SLOT.unpack_from(mm, off)
+            cmd = mm[off + _SLOT.size : off + _SLOT.size + n].decode(
+                "utf-8", errors="ignore"
+            )
+            heapq.heappush(self._heap, (prio, tail, cmd, seq, t_ns))
+            tail += 1
+        _U64.pack_into(mm, _TAIL_OFF, tail)
+
+    def try_recv_entry(self) -> tuple[str, int, int] | None:
+        """
+        Most urgent (cmd, plan_seq, t_ns), or None if nothing is pending.
+        Stale commands (plan_seq below the cancel watermark) are skipped.
+        """
+        if self._get(_TAIL_OFF) < self._get(_HEAD_OFF):
+            self._pull()
+        heap = self._heap
+        if not heap:
+            return None
+        cancel = self._get(_CANCEL_OFF)
+        done = self._get(_DONE_OFF)
+        dropped = 0
+        entry = None
+        while heap:
+            _, _, cmd, seq, t_ns = heapq.heappop(heap)
+            done += 1
+            if seq < cancel:
+                dropped += 1
+                continue
+            entry = (cmd, seq, t_ns)
+            break
+        if dropped:
+            _U64.pack_into(self._mm, _DROPPED_OFF, self.cancelled() + dropped)
+            self.ack(dropped)
+        _U64.pack_into(self._mm, _DONE_OFF, done)
+        return entry
+
+    def ack(self, n: int) -> None:
+        """n received commands have been written to the game (or given up)."""
+        _U64.pack_into(self._mm, _ACKED_OFF, self.acked() + n)
+
+    def try_recv(self) -> str | None:
+        entry = self.try_recv_entry()
+        return entry[0] if entry is not None else None
+
+    def recv(self, timeout: float | None = None) -> str | None:
+        entry = self.recv_entry(timeout)
+        return entry[0] if entry is not None else None
+
+    def recv_entry(self, timeout: float | None = None) -> tuple[str, int, int] | None:
+        """
+        Block until a command arrives (or timeout). Spins briefly, then backs
+        off to short sleeps, so an idle worker costs ~nothing but a fresh
+        command is picked up within a millisecond or so.
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        spins = 0
+        delay = 0.0002
+        while True:
+            entry = self.try_recv_entry()
+            if entry is not None:
+                return entry
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            if spins < 200:
+                spins += 1
+                continue
+            time.sleep(delay)
+            delay = min(delay * 2, 0.002)
+
+    def recv_many(
+        self, timeout: float | None = None, limit: int = 16
+    ) -> list[tuple[str, int, int]]:
+        """
+        recv_entry() one command, then take whatever else is already queued.
+        Returns [(cmd, plan_seq, t_ns), ...] in delivery (priority) order.
+        """
+        entry = self.recv_entry(timeout)
+        if entry is None:
+            return []
+        entries = [entry]
+        while len(entries) < limit:
+            entry = self.try_recv_entry()
+            if entry is None:
+                break
+            entries.append(entry)
+        return entries
+
+    def close(self) -> None:
+        self._mm.close()
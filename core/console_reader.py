@@ -6,10 +6,12 @@ import time
 import traceback
 from dataclasses import dataclass
 
-import psutil
 import win32console
 import win32api
 
+from core import telemetry
+from core.process_locator import ProcessLocator
+
 
 @dataclass
 class ConsoleDumpResult:
@@ -19,32 +21,31 @@ class ConsoleDumpResult:
 
 
 def _log(path: str, msg: str) -> None:
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(msg.rstrip() + "\n")
+    # reader 프로세스 로그(run_logs/reader.log)로 보냄; setup은 이미 돼 있으면 no-op
+    telemetry.setup(os.path.dirname(path) or ".", "reader", console_level=telemetry.OFF)
+    telemetry.get("reader").info(msg.rstrip())
 
 
-def _find_crawl_console_pid() -> int | None:
+def _match_crawl_console(info: dict) -> bool:
     """
-    crawl-console 프로세스를 찾는다.
+    crawl-console 프로세스인지 판단.
     exe 이름이 환경마다 달라서 'crawl'과 'console' 키워드로 최대한 넓게 잡는다.
     """
-    candidates = []
-    for p in psutil.process_iter(["pid", "name", "exe", "cmdline"]):
-        try:
-            name = (p.info.get("name") or "").lower()
-            exe = (p.info.get("exe") or "").lower()
-            cmd = " ".join(p.info.get("cmdline") or []).lower()
-
-            blob = " ".join([name, exe, cmd])
-            if "crawl" in blob and ("console" in blob or "crawl-console" in blob):
-                candidates.append(p.info["pid"])
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            continue
-
-    # 여러 개면 가장 마지막에 뜬 걸 고르는 게 낫지만,
-    # 여기선 첫 번째로 충분한 경우가 대부분이라 그냥 첫 번째 사용
-    return candidates[0] if candidates else None
+    name = (info.get("name") or "").lower()
+    exe = (info.get("exe") or "").lower()
+    cmd = " ".join(info.get("cmdline") or []).lower()
+
+    blob = " ".join([name, exe, cmd])
+    return "crawl" in blob and ("console" in blob or "crawl-console" in blob)
+
+
+# 한 번 찾은 PID는 캐시; 프로세스가 죽거나 재시작됐을 때만 다시 스캔
+_locator = ProcessLocator(_match_crawl_console, attrs=("pid", "name", "exe", "cmdline"))
+
+
+def _find_crawl_console_pid() -> int | None:
+    """crawl-console 프로세스를 찾는다 (core/process_locator.py 캐시 사용)."""
+    return _locator.pid()
 
 
 def attach_to_crawl_console(status_log_path: str) -> bool:
@@ -0,0 +1,755 @@
+# core/controller.py
+# Controller decision logic (mode / FSM / command planning), independent of
+# where frames come from and where commands go:
+#   main.py   : live  - frames from frames.shm, commands to commands.shm,
+#                       now = time.time()
+#   replay.py : replay - recorded frames, commands captured in memory,
+#                        now = recorded timestamps (virtual clock)
+#
+# step(state, gs, now) is the whole policy as a pure function over a
+# ControllerState; Controller is the thin stateful wrapper main.py uses.
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+
+from core import monsters, telemetry, trace
+from core.rules import Matcher, Rule, RuleSet, gather
+from core.state_parser import GameState
+
+# HP thresholds (with hysteresis)
+CAUTION_ENTER = 0.75
+CAUTION_EXIT = 0.90
+PANIC_ENTER = 0.45
+PANIC_EXIT = 0.65
+
+# Cooldowns are fallbacks: with acked=True (the frame already reflects every
+# command sent, see Controller.responded) the next action goes out at once.
+AUTOEXPLORE_COOLDOWN = 3.0
+RETREAT_HOLD_SEC = 3.0
+ALERT_HOLD_SEC = 3.0  # 몬스터 감지 후, 탐색을 최소 3초 멈춤
+NO_MONSTERS_CONFIRM = 2  # 2프레임 연속 "없음"이면 진짜 없음으로 인정
+# ===== FIGHT stabilization (Day 5) =====
+FIGHT_ATTACK_COOLDOWN_SEC = 1.0
+FIGHT_RECHECK_INTERVAL_SEC = 1.0
+
+# side-panel danger (core/monsters.py) relative to monsters.player_power(xl)
+THREAT_EASY_RATIO = 0.6  # clearly weaker than us: fight it
+THREAT_DEADLY_RATIO = 1.2  # clearly stronger: back off
+
+
+def update_mode(last_mode: str, hp_ratio: float) -> str:
+    """3-state mode with hysteresis to avoid flapping."""
+    mode = last_mode
+
+    if last_mode == "NORMAL":
+        if hp_ratio < PANIC_ENTER:
+            mode = "PANIC"
+        elif hp_ratio < CAUTION_ENTER:
+            mode = "CAUTION"
+
+    elif last_mode == "CAUTION":
+        if hp_ratio < PANIC_ENTER:
+            mode = "PANIC"
+        elif hp_ratio >= CAUTION_EXIT:
+            mode = "NORMAL"
+
+    else:  # PANIC
+        if hp_ratio >= PANIC_EXIT:
+            mode = "CAUTION"
+
+    return mode
+
+
+def evaluate_threat(gs: GameState, mode):
+    # HP가 위험하면 무조건 HIGH
+    if mode == "PANIC":
+        return "HIGH"
+    if mode == "CAUTION":
+        return "HIGH"
+
+    # ✅ 추가: 근접 전투/포위 신호면 무조건 HIGH
+    if gs.melee_contact:
+        return "HIGH"
+
+    # 몬스터 없으면 LOW
+    if not gs.monsters_present and not gs.monster_seen:
+        return "LOW"
+
+    count = gs.monster_count
+    asleep = gs.monster_asleep
+
+    # 패널 몬스터를 전부 알면 개수 대신 몬스터 지식으로 판단
+    if gs.monsters:
+        danger, unknown = monsters.panel_danger(gs.monsters)
+        if not unknown:
+            ratio = danger / monsters.player_power(gs.xl)
+            if ratio >= THREAT_DEADLY_RATIO:
+                return "MID"
+            if ratio <= THREAT_EASY_RATIO:
+                # 잠든 약한 몬스터는 깨우지 않고 무시
+                return "LOW" if asleep and mode == "NORMAL" else "HIGH"
+
+    # 2마리 이상이면 위험
+    if count >= 2:
+        return "HIGH"
+
+    # 1마리 + asleep + HP 정상 => 안전(공격 가능)
+    if count == 1 and asleep and mode == "NORMAL":
+        return "LOW"
+
+    # 그 외는 애매(일단 MID)
+    return "MID"
+
+
+def opposite_dir(k):
+    opp = {
+        "h": "l",
+        "l": "h",
+        "j": "k",
+        "k": "j",
+        "y": "n",
+        "n": "y",
+        "u": "b",
+        "b": "u",
+    }
+    return opp.get(k) if k else None
+
+
+def choose_escape_move(last_move_key, retreat_last_choice, avoid_dir=None):
+    """Blind fallback (no map): rotate through directions, no back-stepping."""
+    move_keys = ["h", "j", "k", "l", "y", "u", "b", "n"]
+
+    prev = retreat_last_choice
+    opp = opposite_dir(last_move_key)
+
+    candidates = []
+
+    # ✅ 1) opp를 무조건 1순위로 두지 말고,
+    #    "avoid_dir(되돌아가기 금지)"가 아니면만 넣기
+    if opp and opp != avoid_dir:
+        candidates.append(opp)
+
+    # ✅ 2) 나머지 후보 채우기(직전 반복 방지 + avoid_dir 제외)
+    for k in move_keys:
+        if k == prev:
+            continue
+        if avoid_dir and k == avoid_dir:
+            continue
+        if k not in candidates:
+            candidates.append(k)
+
+    # ✅ 3) 안전장치: 후보가 비면 avoid_dir 제한 풀고 다시 채우기
+    if not candidates:
+        for k in move_keys:
+            if k != prev and k not in candidates:
+                candidates.append(k)
+
+    return candidates[0], opp, prev
+
+
+@dataclass(slots=True)
+class ControllerState:
+    """
+    Everything the controller remembers between decisions (formerly ~20
+    locals in main.py). Plain values only, so it pickles / copies cheaply;
+    step() never modifies the instance it is given.
+    """
+
+    ratio_buf: tuple = ()  # last 3 HP ratios; conservative min() for survival
+    last_mode: str = "NORMAL"
+    ai_state: str = "EXPLORE"
+    last_autoexplore_time: float = 0.0
+    last_monsters_present: bool = False
+    alert_until: float = 0.0  # ALERT 상태 유지 시간(초)
+    retreat_until: float = 0.0
+    alert_action_done: bool = False
+    repeat_esc_sent: bool = False
+    more_sent: bool = False
+    no_monsters_streak: int = 0
+    last_move_key: str | None = None  # 마지막으로 보낸 MOVE 방향 (h/j/k/l/y/u/b/n)
+    retreat_last_choice: str | None = None  # RETREAT에서 최근 선택한 키(반복 방지용)
+    avoid_dir: str | None = None  # 바로 직후 되돌아가기 금지 방향
+    fight_next_attack_time: float = 0.0
+    fight_next_recheck_time: float = 0.0
+    # bumped whenever queued commands became stale (Controller cancels them)
+    plan_epoch: int = 0
+    # +1 per decision; the bus plan_seq of its commands, so a replan cancels
+    # everything queued before it, even on a re-decided frame
+    plan_id: int = 0
+    last_clock: float | None = None  # game Time/Turn seen on the last decision
+    last_rule: str | None = None  # POLICY rule that fired on this decision
+    rule_fired: tuple = ()  # ((rule name, time), ...) for rule cooldowns
+
+
+class _Cycle:
+    """Scratch for one step(): the state copy, emitted commands, notes."""
+
+    __slots__ = ("s", "now", "queue_empty", "acked", "out", "notes", "matcher")
+
+    def __init__(self, s, now, queue_empty, acked, notes, matcher):
+        self.s = s
+        self.now = now
+        self.queue_empty = queue_empty
+        self.acked = acked
+        self.out = []
+        self.notes = notes
+        self.matcher = matcher
+
+    def empty(self) -> bool:
+        # 이번 판단에서 이미 명령을 넣었으면 큐는 더 이상 비어있지 않음
+        return self.queue_empty and not self.out
+
+    def send(self, *cmds: str) -> None:
+        self.out.extend(cmds)
+
+    def replan(self, reason: str) -> None:
+        """
+        The situation changed: whatever is still queued was planned for the
+        old one. Plan as if the queue were empty; Controller drops the stale
+        commands (bus cancel watermark = this decision's plan_id) when it
+        sees plan_epoch move.
+        """
+        if not self.queue_empty:
+            self.queue_empty = True
+            self.s.plan_epoch += 1
+            self.note("[PLAN] {} -> cancel queued commands", reason)
+
+    def note(self, fmt: str, *args) -> None:
+        if self.notes is not None:
+            self.notes.append((fmt, args))
+
+    def escape_moves(self, gs: GameState, n: int = 1) -> list[str]:
+        """
+        n retreat steps. With a parsed map: a walkable path that keeps
+        maximising the path distance to the hostiles (core/map_grid.py);
+        otherwise (no numpy / no '@' or hostile on screen / boxed in) the
+        blind direction rotation.
+        """
+        s = self.s
+        keys = []
+        if gs.map is not None:
+            keys = gs.map.escape_keys(n, gs.hostile_glyphs, s.avoid_dir)
+            if keys:
+                self.note("[PLAN] escape path from map: {}", tuple(keys))
+        while len(keys) < n:
+            key, _, _ = choose_escape_move(
+                s.last_move_key, s.retreat_last_choice, s.avoid_dir
+            )
+            s.last_move_key = s.retreat_last_choice = key
+            s.avoid_dir = opposite_dir(key)
+            keys.append(key)
+        key = keys[-1]
+        s.last_move_key = s.retreat_last_choice = key
+        s.avoid_dir = opposite_dir(key)
+        return keys
+
+
+def game_clock(gs: GameState):
+    """Time (or Turn, when Time is not shown) from the status panel."""
+    return gs.time if gs.time is not None else gs.turn
+
+
+def format_note(note: tuple) -> str:
+    fmt, args = note
+    return fmt.format(*args) if args else fmt
+
+
+# per-tick detail lines; everything else is INFO
+_DEBUG_NOTES = ("[DBG2]", "[DEBUG]", "HP parsed", "HP%")
+_note_levels: dict[str, int] = {}
+
+
+def note_level(fmt: str) -> int:
+    level = _note_levels.get(fmt)
+    if level is None:
+        debug = fmt.startswith(_DEBUG_NOTES)
+        level = _note_levels[fmt] = telemetry.DEBUG if debug else telemetry.INFO
+    return level
+
+
+def step(
+    state: ControllerState,
+    gs: GameState,
+    now: float,
+    queue_empty: bool = True,
+    notes: list | None = None,
+    acked: bool = False,
+    matcher: Matcher | None = None,
+) -> tuple[ControllerState, list[str]]:
+    """
+    One decision on a parsed frame. Pure: returns (new state, commands to
+    enqueue) and leaves `state` untouched; `now` is whatever clock the caller
+    runs on. queue_empty says whether the input queue was empty when the
+    decision started; acked whether this frame was captured after every
+    command sent so far was delivered (the game has responded). If `notes`
+    is a list, log lines are appended to it as (fmt, args) (format_note()
+    renders them) — nothing is formatted otherwise.
+
+    matcher: the caller's Matcher(POLICY), kept across its own steps so only
+    changed facts are re-tested (each step feeds it every fact, so the rule
+    picked never depends on what it saw before). One per controller, never
+    shared; None matches from scratch.
+    """
+    if matcher is None:
+        matcher = Matcher(POLICY)
+    c = _Cycle(replace(state), now, queue_empty, acked, notes, matcher)
+    s = c.s
+    s.last_rule = None
+    s.plan_id += 1
+
+    ratio = gs.hp_ratio
+    if ratio is None:
+        c.note("[HP] not found (frame skip) -> hold actions")
+        return s, c.out
+
+    s.ratio_buf = (s.ratio_buf + (ratio,))[-3:]
+    stable_ratio = min(s.ratio_buf)
+    if s.last_mode == "PANIC":
+        stable_ratio = ratio
+    # HP가 정상(>= CAUTION_EXIT)으로 올라오면 버퍼 리셋해서 stale min 제거
+    if ratio >= CAUTION_EXIT and stable_ratio < CAUTION_EXIT:
+        s.ratio_buf = (ratio,)
+        stable_ratio = ratio
+
+    mode = update_mode(s.last_mode, stable_ratio)
+    if mode != s.last_mode:
+        c.replan("mode change")
+
+    # PANIC에 "진입한 순간"에만 계획(큐) 작성 — 스팸 방지
+    if mode == "PANIC" and s.last_mode != "PANIC":
+        if c.empty():
+            moves = c.escape_moves(gs, 3)
+            c.send(*[f"MOVE {k}" for k in moves])
+            c.note("[PLAN] wrote PANIC queue: MOVE x3 -> {}", tuple(moves))
+        else:
+            c.note("[INFO] PANIC entered but queue not empty (skip preload)")
+
+    if mode != s.last_mode:
+        c.note("[MODE] {} -> {} (hp={:.1f}%)", s.last_mode, mode, stable_ratio * 100)
+        s.last_mode = mode
+
+    # ===== Explore policy (FSM 기반) =====
+
+    if mode == "PANIC":
+        # PANIC 중에도 --more--는 최우선 처리 (입력 꼬임 방지)
+        if gs.more_prompt:
+            c.replan("more prompt")
+            if c.empty():
+                c.send("MORE")
+                c.note("[PLAN] PANIC: more prompt -> queued MORE")
+            c.note("[INFO] PANIC: more prompt shown, skip moves")
+            return s, c.out
+        # PANIC: 계속 도망 (큐가 비면 한 칸 이동) - RETREAT 로직 재사용
+        if c.empty():
+            prev = s.retreat_last_choice
+            (key,) = c.escape_moves(gs)
+            c.send(f"MOVE {key}")
+            c.note("[PLAN] PANIC -> queued MOVE {} (prev={})", key, prev)
+
+        c.note("[INFO] PANIC -> skip explore policy")
+
+    else:
+        _explore_policy(c, gs, mode)
+
+    c.note("HP parsed: {}", (gs.hp, gs.hp_max))
+    c.note("HP%: {:.1f}% (raw={:.1f}%)", stable_ratio * 100, ratio * 100)
+    return s, c.out
+
+
+def step_many(
+    states: list[ControllerState],
+    game_states: list[GameState],
+    now: float,
+    queue_empty: list[bool] | None = None,
+    matchers: list[Matcher] | None = None,
+) -> tuple[list[ControllerState], list[list[str]]]:
+    """
+    step() over independent controllers (e.g. many games / replays);
+    matchers: one per controller (see step()), or None.
+    """
+    new_states = []
+    commands = []
+    for i, (state, gs) in enumerate(zip(states, game_states)):
+        empty = True if queue_empty is None else queue_empty[i]
+        matcher = None if matchers is None else matchers[i]
+        state, cmds = step(state, gs, now, empty, matcher=matcher)
+        new_states.append(state)
+        commands.append(cmds)
+    return new_states, commands
+
+
+def _explore_policy(c: _Cycle, gs: GameState, mode: str) -> None:
+    s = c.s
+    now = c.now
+    prev_state = s.ai_state
+    clock = game_clock(gs)
+    prev_clock = s.last_clock
+    s.last_clock = clock
+
+    # ---- no_monsters_streak 업데이트 ----
+    if gs.monsters_present:
+        s.no_monsters_streak = 0
+    else:
+        s.no_monsters_streak += 1
+    c.note("[DBG2] monsters_panel={}", gs.monsters[:5])
+    c.note(
+        "[DBG2] nearby={}, monsters_present={}, monster_seen={}",
+        gs.nearby[:5],
+        gs.monsters_present,
+        gs.monster_seen,
+    )
+    # monster_seen은 새 메시지 기준 에지, 패널은 상태라서 직전 값과 비교
+    monster_edge = gs.monster_seen or (
+        gs.monsters_present and not s.last_monsters_present
+    )
+    s.last_monsters_present = gs.monsters_present
+
+    # ---- FSM transition ----
+    just_entered_alert = False
+
+    if monster_edge:
+        s.ai_state = "ALERT"
+        s.alert_until = now + ALERT_HOLD_SEC
+        s.alert_action_done = False
+        just_entered_alert = True
+
+    if s.ai_state == "ALERT" and now >= s.alert_until:
+        if gs.monsters_present:
+            s.alert_until = now + 1.0
+            c.note("[INFO] ALERT extend (monster still visible)")
+        else:
+            if s.no_monsters_streak >= NO_MONSTERS_CONFIRM:
+                s.ai_state = "EXPLORE"
+                c.note("[STATE] ALERT -> EXPLORE (confirmed no monsters)")
+            else:
+                s.alert_until = now + 0.5
+                c.note("[INFO] ALERT hold (no_monsters not confirmed yet)")
+
+    # ---- threat-based transition (DEBUG 포함) ----
+    if s.ai_state == "ALERT" and not just_entered_alert:
+        threat = evaluate_threat(gs, mode)
+        c.note(
+            "[DEBUG] threat={}, mode={}, count={}, asleep={}, melee={}, "
+            "monsters_present={}",
+            threat,
+            mode,
+            gs.monster_count,
+            gs.monster_asleep,
+            gs.melee_contact,
+            gs.monsters_present,
+        )
+
+        if threat == "HIGH":
+            # ✅ HP가 낮으면 싸우지 말고 후퇴가 우선
+            if mode in ("CAUTION", "PANIC"):
+                c.note("[STATE] ALERT -> RETREAT (HIGH but low HP)")
+                s.ai_state = "RETREAT"
+                s.retreat_until = now + RETREAT_HOLD_SEC
+            else:
+                c.note("[STATE] ALERT -> FIGHT (HIGH: melee/breakout)")
+                s.ai_state = "FIGHT"
+                s.fight_next_attack_time = 0.0
+                s.fight_next_recheck_time = 0.0
+
+        elif threat == "MID":
+            # MID는 아직 보수적으로 후퇴 (나중에 FIGHT로 일부 전환)
+            c.note("[STATE] ALERT -> RETREAT (MID)")
+            s.ai_state = "RETREAT"
+            s.retreat_until = now + RETREAT_HOLD_SEC
+
+        elif threat == "LOW":
+            if s.no_monsters_streak >= NO_MONSTERS_CONFIRM:
+                c.note("[STATE] ALERT -> EXPLORE (confirmed no monsters)")
+                s.ai_state = "EXPLORE"
+            else:
+                c.note("[INFO] ALERT hold (LOW but not confirmed)")
+                s.alert_until = now + 0.5
+
+    # ---- RETREAT exit conditions ----
+    if s.ai_state == "RETREAT":
+        no_monsters = (not gs.monsters_present) and (not gs.monster_seen)
+
+        if no_monsters:
+            if mode in ("CAUTION", "PANIC"):
+                # 저HP면 “안전 모드” 유지: 바로 탐색 복귀 금지
+                c.note("[STATE] RETREAT hold (no monsters but low HP)")
+                # 최소 1초 더 유지(작게)
+                s.retreat_until = max(s.retreat_until, now + 1.0)
+            else:
+                c.note("[STATE] RETREAT -> EXPLORE (no monsters)")
+                s.ai_state = "EXPLORE"
+                s.alert_action_done = False
+
+        elif now >= s.retreat_until:
+            if mode in ("CAUTION", "PANIC") and gs.monsters_present:
+                # HP 낮고 아직 적이 보이면, 후퇴 계속
+                c.note("[STATE] RETREAT extend (low HP & monsters present)")
+                s.retreat_until = now + RETREAT_HOLD_SEC
+            else:
+                c.note("[STATE] RETREAT timeout -> EXPLORE")
+                s.ai_state = "EXPLORE"
+
+    if s.ai_state != prev_state or just_entered_alert:
+        c.replan(f"{prev_state} -> {s.ai_state}")
+
+    more_prompt = gs.more_prompt
+    if more_prompt:
+        if not s.more_sent:
+            c.replan("more prompt")
+        if (not s.more_sent) and c.empty():
+            c.send("MORE")
+            s.more_sent = True
+            c.note("[PLAN] more prompt -> queued MORE (once)")
+    else:
+        if s.more_sent:
+            c.note("[INFO] more prompt cleared")
+        s.more_sent = False
+
+    # ---- repeat command 프롬프트 처리 ----
+    repeat_prompt = gs.repeat_prompt
+
+    if repeat_prompt:
+        # 프롬프트가 떠 있는 동안엔 탐색/전투 정책을 멈추고 ESC만 관리
+        if not s.repeat_esc_sent:
+            c.replan("repeat prompt")
+        if (not s.repeat_esc_sent) and c.empty():
+            c.send("ESC")
+            s.repeat_esc_sent = True
+            c.note("[PLAN] repeat prompt -> queued ESC (once)")
+    else:
+        # 프롬프트가 사라지면 다음에 또 쓸 수 있도록 리셋
+        if s.repeat_esc_sent:
+            c.note("[INFO] repeat prompt cleared")
+        s.repeat_esc_sent = False
+
+    if repeat_prompt or more_prompt:
+        return
+
+    # ---- 메뉴/프롬프트 우선 처리 ----
+    if gs.shop_like or gs.confirm_y:
+        c.replan("shop screen" if gs.shop_like else "confirm prompt")
+
+    # ---- declarative rules (POLICY), then FSM actions ----
+    if _apply_rules(c, gs, mode):
+        pass
+
+    elif s.ai_state == "ALERT":
+        c.note("[INFO] ALERT: holding explore")
+
+    elif s.ai_state == "RETREAT":
+        if c.empty():
+            prev = s.retreat_last_choice
+            (key,) = c.escape_moves(gs)
+            c.send(f"MOVE {key}")
+            c.note("[PLAN] RETREAT -> queued MOVE {} (prev={})", key, prev)
+
+        c.note("[INFO] RETREAT: trying to move away")
+
+    elif s.ai_state == "FIGHT":
+        _fight(c, gs, mode)
+
+    elif s.ai_state == "EXPLORE" and not gs.monsters_present:
+        if c.empty() and mode == "NORMAL":
+            # acked + game clock unchanged since the last decision:
+            # the game is waiting for input (autoexplore stopped)
+            idle = c.acked and clock is not None and clock == prev_clock
+            if idle or now - s.last_autoexplore_time >= AUTOEXPLORE_COOLDOWN:
+                c.send("AUTOEXPLORE")
+                s.last_autoexplore_time = now
+                c.note("[PLAN] EXPLORE -> queued AUTOEXPLORE")
+
+
+# Policy rules: checked before the FSM actions in _explore_policy (prompts
+# are handled above them); the best matching rule replaces the FSM action
+# for that decision. Facts: GameState fields, ControllerState fields, plus
+# "mode" and "queue_empty" (see _apply_rules).
+POLICY = RuleSet(
+    [
+        Rule(
+            "shop_escape",
+            {"shop_like": True, "queue_empty": True},
+            ("ESC",),
+            priority=100,
+            note="[PLAN] shop screen -> queued ESC",
+        ),
+        Rule(
+            "confirm_yes",
+            {"confirm_y": True, "queue_empty": True},
+            ("CONFIRM_Y",),
+            priority=90,
+            note="[PLAN] confirm prompt -> queued CONFIRM_Y",
+        ),
+        Rule(
+            "alert_wait_once",
+            {"ai_state": "ALERT", "alert_action_done": False, "queue_empty": True},
+            ("WAIT",),
+            priority=50,
+            sets={"alert_action_done": True},
+            note="[PLAN] ALERT -> queued WAIT x1",
+        ),
+        # CAUTION/PANIC 등: 일단 안전하게 피 회복(휴식)
+        Rule(
+            "rest_when_hurt",
+            {
+                "ai_state": "EXPLORE",
+                "monsters_present": False,
+                "queue_empty": True,
+                "mode": ("!=", "NORMAL"),
+            },
+            ("WAIT",),
+            priority=10,
+            note="[PLAN] EXPLORE(CAUTION) -> queued WAIT",
+        ),
+    ]
+)
+
+
+def _apply_rules(c: _Cycle, gs: GameState, mode: str) -> bool:
+    """Fire the best matching POLICY rule; False if none applies."""
+    s = c.s
+    extra = {"mode": mode, "queue_empty": c.empty()}
+    c.matcher.update(gather(POLICY.fields, extra, gs, s))
+    fired = dict(s.rule_fired) if s.rule_fired else None
+    rule = c.matcher.select(c.now, fired)
+    if rule is None:
+        return False
+    c.send(*rule.then)
+    for name, value in rule.sets.items():
+        setattr(s, name, value)
+    if rule.cooldown:
+        fired = fired or {}
+        fired[rule.name] = c.now
+        s.rule_fired = tuple(fired.items())
+    s.last_rule = rule.name
+    c.note(f"[RULE {rule.name}] {rule.note}" if rule.note else f"[RULE {rule.name}]")
+    return True
+
+
+def _fight(c: _Cycle, gs: GameState, mode: str) -> None:
+    s = c.s
+    now = c.now
+
+    # ---- (1) 주기적 재평가 ----
+    if now >= s.fight_next_recheck_time:
+        threat = evaluate_threat(gs, mode)
+        c.note("[DEBUG] FIGHT recheck: threat={}, mode={}", threat, mode)
+
+        # 몬스터 완전 없음 확정
+        if (not gs.monsters_present) and (s.no_monsters_streak >= NO_MONSTERS_CONFIRM):
+            if mode in ("CAUTION", "PANIC"):
+                c.note("[STATE] FIGHT -> RETREAT (no monsters but low HP)")
+                s.ai_state = "RETREAT"
+                s.retreat_until = now + RETREAT_HOLD_SEC
+            else:
+                c.note("[STATE] FIGHT -> EXPLORE (confirmed no monsters)")
+                s.ai_state = "EXPLORE"
+                s.alert_action_done = False
+        # HP 낮으면 즉시 후퇴
+        elif mode in ("CAUTION", "PANIC"):
+            c.note("[STATE] FIGHT -> RETREAT (low HP)")
+            s.ai_state = "RETREAT"
+            s.retreat_until = now + RETREAT_HOLD_SEC
+
+        # MID는 보수적으로 후퇴 유지
+        elif threat == "MID":
+            c.note("[STATE] FIGHT -> RETREAT (MID)")
+            s.ai_state = "RETREAT"
+            s.retreat_until = now + RETREAT_HOLD_SEC
+
+        s.fight_next_recheck_time = now + FIGHT_RECHECK_INTERVAL_SEC
+        if s.ai_state != "FIGHT":
+            c.replan(f"FIGHT -> {s.ai_state}")
+
+    # ---- (2) 공격 쿨다운 ----
+    if s.ai_state == "FIGHT" and c.empty():
+        # previous ATTACK answered -> no need to wait out the cooldown
+        if gs.monsters_present and (c.acked or now >= s.fight_next_attack_time):
+            c.send("ATTACK")
+            s.fight_next_attack_time = now + FIGHT_ATTACK_COOLDOWN_SEC
+            c.note("[PLAN] FIGHT -> queued ATTACK (TAB, cooldown)")
+        else:
+            if not gs.monsters_present:
+                c.note("[INFO] FIGHT: no monsters (skip attack)")
+            else:
+                c.note("[INFO] FIGHT: attack cooldown")
+
+
+class Controller:
+    """
+    Live wrapper around step(): keeps the current ControllerState, reads the
+    queue depth from `bus` (send_many/depth/cancel_before), sends what step()
+    decided as one batch and hands the notes to `log` (a telemetry.Logger,
+    "controller" by default; False = no notes), which formats them off the
+    decision loop.
+    """
+
+    def __init__(self, bus, log=None):
+        self.bus = bus
+        self.log = telemetry.get("controller") if log is None else log
+        self.state = ControllerState()
+        self.matcher = Matcher(POLICY)  # this controller's rule facts
+        self.sent = 0  # bus head after our last send
+        self.sent_clock = None  # game clock of the frame that send was planned on
+
+    def responded(self, ack_seq: int, clock=None) -> bool:
+        """
+        True if the frame answers everything we sent: its ack_seq (set by
+        the screen source only when the screen changed after the commands
+        were delivered) covers our last send, or the game clock moved past
+        the one that send was planned on.
+        """
+        if ack_seq >= self.sent:
+            return True
+        return (
+            clock is not None
+            and self.sent_clock is not None
+            and clock > self.sent_clock
+        )
+
+    @property
+    def last_mode(self) -> str:
+        return self.state.last_mode
+
+    @property
+    def last_rule(self) -> str | None:
+        """Name of the POLICY rule behind the last decision, if any."""
+        return self.state.last_rule
+
+    def decide(
+        self,
+        gs: GameState,
+        now: float,
+        t_ns: int = 0,
+        acked: bool = False,
+        queue_empty: bool | None = None,
+    ) -> list[str]:
+        """
+        Commands go out tagged with this decision's plan_id (bus plan_seq)
+        and t_ns (frame capture time); acked: see step() (usually
+        responded(frame.ack_seq, game_clock(gs))). queue_empty: the bus
+        state the caller read (and recorded) for this decision, so replay
+        feeds step() the same value; None reads the bus now.
+        """
+        if queue_empty is None:
+            queue_empty = self.bus.depth() == 0
+        notes = [] if self.log and self.log.enabled(telemetry.INFO) else None
+        epoch = self.state.plan_epoch
+        t0 = trace.start()
+        self.state, cmds = step(
+            self.state, gs, now, queue_empty, notes, acked, self.matcher
+        )
+        trace.stop("decide", t0)
+        plan_id = self.state.plan_id
+        if self.state.plan_epoch != epoch:
+            # everything queued by earlier decisions is stale now
+            self.bus.cancel_before(plan_id)
+        if cmds:
+            t0 = trace.start()
+            self.sent = self.bus.send_many(cmds, plan_id, t_ns)
+            self.sent_clock = game_clock(gs)
+            trace.stop("enqueue", t0)
+        if notes:
+            log = self.log.log
+            for fmt, args in notes:
+                log(note_level(fmt), fmt, *args)
+        return cmds
@@ -0,0 +1,121 @@
+# core/frame.py
+# ScreenFrame: the canonical screen representation from capture to replay.
+#
+#   chars : array('I'), height*width unicode code points, row-major
+#   attrs : array('H'), same shape, fg | bg << 8 per cell (core/vt.py), or
+#           None when the source has no colours (win32 text capture)
+#
+# Fixed size per console size (120x45: 21.6 KB chars + 10.8 KB attrs), and
+# serialised as-is into the frame channel (core/frame_channel.py): capture
+# -> shm -> controller is one memcpy each way. Text exists only on demand:
+# text() / rows() decode once and cache; row(i) is a zero-copy view.
+from __future__ import annotations
+
+from array import array
+
+_ENC = "utf-32-le"
+
+
+class ScreenFrame:
+    __slots__ = ("width", "height", "chars", "attrs", "_text", "_rows")
+
+    def __init__(self, width: int, height: int, chars: array, attrs=None):
+        self.width = width
+        self.height = height
+        self.chars = chars
+        self.attrs = attrs
+        self._text = None
+        self._rows = None
+
+    # ---- construction ----
+    @classmethod
+    def from_text(cls, text: str, width: int, height: int) -> "ScreenFrame":
+        """Flat width*height text (ReadConsoleOutputCharacter); padded/cut."""
+        n = width * height
+        if len(text) != n:
+            text = text[:n].ljust(n)
+        frame = cls(width, height, array("I", text.encode(_ENC)))
+        frame._text = text
+        return frame
+
+    @classmethod
+    def from_grid(cls, chars: list[list[str]], attrs=None) -> "ScreenFrame":
+        """
+        Row lists of 1-char strings (+ rows of array('H') or int lists), as
+        core/vt.py keeps them.
+        """
+        height = len(chars)
+        width = len(chars[0]) if height else 0
+        text = "".join("".join(r) for r in chars)
+        frame = cls.from_text(text, width, height)
+        if attrs is not None:
+            a = array("H")
+            for row in attrs:
+                a.extend(row)
+            frame.attrs = a
+        return frame
+
+    @classmethod
+    def from_buffer(
+        cls, width: int, height: int, chars: bytes, attrs: bytes | None = None
+    ) -> "ScreenFrame":
+        """Inverse of chars_bytes()/attrs_bytes() (one copy each)."""
+        c = array("I")
+        c.frombytes(chars)
+        a = None
+        if attrs:
+            a = array("H")
+            a.frombytes(attrs)
+        return cls(width, height, c, a)
+
+    # ---- serialisation ----
+    def chars_bytes(self) -> bytes:
+        return self.chars.tobytes()
+
+    def attrs_bytes(self) -> bytes:
+        return self.attrs.tobytes() if self.attrs is not None else b""
+
+    # ---- views ----
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self.chars.tobytes().decode(_ENC, errors="replace")
+        return self._text
+
+    def rows(self) -> list[str]:
+        if self._rows is None:
+            t, w = self.text(), self.width
+            self._rows = [t[i : i + w] for i in range(0, len(t), w)] if w else [t]
+        return self._rows
+
+    def row(self, i: int) -> memoryview:
+        """Code points of row i, no copy."""
+        w = self.width
+        return memoryview(self.chars)[i * w : (i + 1) * w]
+
+    def attr_row(self, i: int) -> memoryview | None:
+        if self.attrs is None:
+            return None
+        w = self.width
+        return memoryview(self.attrs)[i * w : (i + 1) * w]
+
+    def cell(self, r: int, c: int) -> str:
+        return chr(self.chars[r * self.width + c])
+
+    def digest(self) -> int:
+        """Content hash (chars + attrs), for change detection."""
+        return hash((self.chars.tobytes(), self.attrs_bytes()))
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ScreenFrame):
+            return NotImplemented
+        return (
+            self.width == other.width
+            and self.chars == other.chars
+            and self.attrs == other.attrs
+        )
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        colour = "" if self.attrs is None else "+attrs"
+        return f"ScreenFrame({self.width}x{self.height}{colour})"
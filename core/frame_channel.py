@@ -0,0 +1,172 @@
+# core/frame_channel.py
+# Shared-memory frame channel: reader_worker publishes console frames,
+# main.py (controller) maps the same region once and reads the latest one.
+#
+# Layout (little-endian):
+#   header  : magic, version, nslots, slot_capacity, latest_seq
+#   slot[i] : seq_begin, seq_end, ts, width, height, length, crc32, ack_seq,
+#             data = chars (u32 code points, width*height) + attrs (u16 per
+#             cell, optional): a ScreenFrame (core/frame.py) byte for byte
+#
+# ack_seq: commands the frame answers: acknowledged by the input worker
+# before the capture (core/command_bus.py) and the screen changed since
+# before they were sent (ScreenSource.last_ack).
+#
+# Double buffered: frame `seq` goes into slot seq % 2, so the writer never
+# touches the slot holding the latest complete frame. The reader checks
+# seq_begin == seq_end == expected seq and crc32 before and after decoding,
+# so a torn (half written) frame is never returned.
+from __future__ import annotations
+
+import struct
+import time
+import zlib
+from dataclasses import dataclass
+
+from core.frame import ScreenFrame
+from core.shm import map_file
+
+MAGIC = b"DCFR"
+VERSION = 3
+NSLOTS = 2
+SLOT_CAPACITY = 128 * 1024  # 6 bytes per cell; 120x45 needs 32 KB
+
+_HEADER = struct.Struct("<4sIIIQ")
+_HEADER_SIZE = 64
+_LATEST_OFF = 16  # offset of latest_seq inside header
+_SEQ = struct.Struct("<Q")
+
+_SLOT = struct.Struct("<QQdHHIIQ")
+_SLOT_HDR_SIZE = 48
+_SLOT_SIZE = _SLOT_HDR_SIZE + SLOT_CAPACITY
+
+REGION_SIZE = _HEADER_SIZE + NSLOTS * _SLOT_SIZE
+
+
+@dataclass
+class Frame:
+    seq: int
+    ts: float
+    width: int
+    height: int
+    screen: ScreenFrame
+    ack_seq: int = 0
+
+    @property
+    def text(self) -> str:
+        """Flat width*height text (decoded on first use)."""
+        return self.screen.text()
+
+
+def _slot_off(seq: int) -> int:
+    return _HEADER_SIZE + (seq % NSLOTS) * _SLOT_SIZE
+
+
+def create_channel(path: str) -> None:
+    """(Re)create an empty frame region. Called by the controller at startup."""
+    mm = map_file(path, REGION_SIZE, create=True)
+    _HEADER.pack_into(mm, 0, MAGIC, VERSION, NSLOTS, SLOT_CAPACITY, 0)
+    mm.close()
+
+
+class FrameWriter:
+    """Publisher side (reader_worker)."""
+
+    def __init__(self, path: str, create: bool = False, wait: float = 5.0):
+        if create:
+            create_channel(path)
+        self._mm = map_file(path, REGION_SIZE, create=False, wait=wait)
+        magic, version, _, _, latest = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            _HEADER.pack_into(self._mm, 0, MAGIC, VERSION, NSLOTS, SLOT_CAPACITY, 0)
+            latest = 0
+        # continue numbering if the worker restarted on an existing region
+        self._seq = latest
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def publish(self, screen: ScreenFrame, ack_seq: int = 0) -> int:
+        chars = memoryview(screen.chars).cast("B")
+        attrs = memoryview(screen.attrs).cast("B") if screen.attrs else b""
+        length = len(chars) + len(attrs)
+        if length > SLOT_CAPACITY:
+            raise ValueError(f"screen too large for the channel: {screen!r}")
+        seq = self._seq + 1
+        off = _slot_off(seq)
+        mm = self._mm
+
+        # mark slot as "being written" (seq_end != seq_begin) before touching data
+        _SLOT.pack_into(mm, off, seq, 0, 0.0, 0, 0, 0, 0, 0)
+        # arrays straight into the slot, no intermediate bytes
+        pos = off + _SLOT_HDR_SIZE
+        mm[pos : pos + len(chars)] = chars
+        pos += len(chars)
+        mm[pos : pos + len(attrs)] = attrs
+        _SLOT.pack_into(
+            mm,
+            off,
+            seq,
+            seq,
+            time.time(),
+            screen.width,
+            screen.height,
+            length,
+            zlib.crc32(attrs, zlib.crc32(chars)),
+            ack_seq,
+        )
+        _SEQ.pack_into(mm, _LATEST_OFF, seq)
+
+        self._seq = seq
+        return seq
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+class FrameReader:
+    """Consumer side (controller). Map once, then call read() every tick."""
+
+    def __init__(self, path: str, wait: float = 5.0):
+        self._mm = map_file(path, REGION_SIZE, create=False, wait=wait)
+        self._view = memoryview(self._mm)
+
+    def latest_seq(self) -> int:
+        return _SEQ.unpack_from(self._mm, _LATEST_OFF)[0]
+
+    def read(self, after_seq: int = 0, retries: int = 3) -> Frame | None:
+        """
+        Latest complete frame with seq > after_seq, or None if there is
+        nothing new (or the writer kept overwriting it while we read).
+        """
+        for _ in range(retries):
+            seq = self.latest_seq()
+            if seq <= after_seq:
+                return None
+
+            off = _slot_off(seq)
+            begin, end, ts, width, height, length, crc, ack = _SLOT.unpack_from(
+                self._mm, off
+            )
+            if begin != seq or end != seq or length > SLOT_CAPACITY:
+                continue
+
+            data = self._view[off + _SLOT_HDR_SIZE : off + _SLOT_HDR_SIZE + length]
+            if zlib.crc32(data) != crc:
+                continue
+            ncells = width * height * 4
+            screen = ScreenFrame.from_buffer(
+                width, height, data[:ncells], data[ncells:]
+            )
+
+            # writer may have lapped us (seq + NSLOTS) while we decoded
+            if _SLOT.unpack_from(self._mm, off)[:2] != (seq, seq):
+                continue
+            return Frame(seq, ts, width, height, screen, ack)
+
+        return None
+
+    def close(self) -> None:
+        self._view.release()
+        self._mm.close()
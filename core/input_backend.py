@@ -0,0 +1,275 @@
+# core/input_backend.py
+# How input_worker delivers commands to crawl.
+#
+#   Win32InputBackend : focus the crawl-console window, then keybd_event
+#                       (Windows; one focus per batch, 20ms key presses).
+#   PtyInputBackend   : write key bytes straight into the pty master that
+#                       reader_worker runs crawl under (PtyScreenSource).
+#                       No window, no focus step; a batch of commands is
+#                       one os.write().
+#
+# The pty master fd lives in reader_worker. It hands a duplicate to
+# input_worker over a unix socket (SCM_RIGHTS), see serve_pty_fd().
+from __future__ import annotations
+
+import os
+import socket
+import threading
+import time
+
+from core import telemetry, trace
+
+# controller command -> bytes crawl reads on stdin
+KEY_BYTES = {
+    "WAIT": b".",
+    "AUTOEXPLORE": b"o",
+    "CONFIRM_Y": b"y",
+    "ESC": b"\x1b",
+    "ATTACK": b"\t",  # Tab = attack nearest enemy (DCSS 기본)
+    "MORE": b" ",
+}
+ESC = b"\x1b"
+
+log = telemetry.get("input")
+
+
+def command_bytes(cmd: str) -> bytes | None:
+    """Key bytes for one controller command, or None if unknown/malformed."""
+    data = KEY_BYTES.get(cmd)
+    if data is not None:
+        return data
+    if cmd.startswith("MOVE "):
+        parts = cmd.split()
+        if len(parts) == 2 and len(parts[1]) == 1:
+            return parts[1].encode("ascii", errors="ignore") or None
+    return None
+
+
+class BackendError(Exception):
+    """Delivering a batch failed; the backend reconnects on the next send."""
+
+
+class InputBackend:
+    """
+    send(cmds): deliver a batch of commands in order; returns how many were
+                handled (0 if crawl couldn't be reached). Any failure on the
+                way (OSError from a closed pty, pywintypes.error from the
+                win32 API, ...) comes out as BackendError, after close().
+    Subclasses implement _send().
+    """
+
+    name = "base"
+
+    def send(self, cmds: list[str]) -> int:
+        try:
+            return self._send(cmds)
+        except Exception as e:
+            self.close()
+            raise BackendError(f"{self.name}: {e!r}") from e
+
+    def _send(self, cmds: list[str]) -> int:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class PtyInputBackend(InputBackend):
+    """
+    Writes into the pty master fd. ESC is written on its own and followed by
+    a short gap: curses treats ESC + next byte within ESCDELAY as a single
+    Alt/escape sequence.
+    """
+
+    name = "pty"
+
+    def __init__(self, sock_path: str, esc_gap: float = 0.05, wait: float = 5.0):
+        self.sock_path = sock_path
+        self.esc_gap = esc_gap
+        self.wait = wait
+        self.fd = -1
+
+    def _connect(self) -> None:
+        if self.fd < 0:
+            self.fd = fetch_pty_fd(self.sock_path, wait=self.wait)
+
+    def _write(self, data: bytes) -> None:
+        while data:
+            n = os.write(self.fd, data)
+            data = data[n:]
+
+    def _send(self, cmds: list[str]) -> int:
+        self._connect()
+        chunk = b""
+        for cmd in cmds:
+            data = command_bytes(cmd)
+            if data is None:
+                log.warning("[input_worker] unknown cmd={}", cmd)
+            elif data == ESC:
+                self._write(chunk + ESC)
+                time.sleep(self.esc_gap)
+                chunk = b""
+            else:
+                chunk += data
+        if chunk:
+            self._write(chunk)
+        return len(cmds)
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class Win32InputBackend(InputBackend):
+    """Foreground crawl-console and synthesize key presses (old behaviour)."""
+
+    name = "win32"
+
+    # process name candidates (adjust if needed)
+    PROC_NAMES = ["crawl-console.exe", "crawl.exe"]
+
+    def __init__(self, os_api=None):
+        from core.process_locator import ProcessLocator, WindowLocator, by_name
+
+        # pid + window found once and cached; rescanned only when crawl
+        # exits/restarts or focusing fails
+        self.window = WindowLocator(
+            ProcessLocator(by_name(*self.PROC_NAMES), os_api=os_api)
+        )
+
+    def _force_foreground(self, hwnd: int) -> bool:
+        """Best-effort: bring hwnd to foreground even under focus restrictions."""
+        import win32con
+        import win32gui
+        import win32process
+
+        if hwnd is None or not win32gui.IsWindow(hwnd):
+            return False
+
+        try:
+            # Restore if minimized
+            win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
+
+            fg = win32gui.GetForegroundWindow()
+            fg_tid, _ = win32process.GetWindowThreadProcessId(fg) if fg else (0, 0)
+            tgt_tid, _ = win32process.GetWindowThreadProcessId(hwnd)
+
+            # Attach input threads to bypass focus-stealing restrictions
+            if fg_tid and fg_tid != tgt_tid:
+                win32process.AttachThreadInput(fg_tid, tgt_tid, True)
+
+            try:
+                win32gui.SetForegroundWindow(hwnd)
+                win32gui.BringWindowToTop(hwnd)
+                win32gui.SetActiveWindow(hwnd)
+            finally:
+                if fg_tid and fg_tid != tgt_tid:
+                    win32process.AttachThreadInput(fg_tid, tgt_tid, False)
+
+            return win32gui.GetForegroundWindow() == hwnd
+        except Exception:
+            return False
+
+    def _focus(self, retries: int = 10, delay: float = 0.1) -> bool:
+        hwnd = self.window.hwnd()
+        if not hwnd:
+            return False
+        for _ in range(retries):
+            if self._force_foreground(hwnd):
+                return True
+            time.sleep(delay)
+        self.window.invalidate()
+        return False
+
+    def _press(self, vk: int) -> None:
+        import win32api
+        import win32con
+
+        win32api.keybd_event(vk, 0, 0, 0)
+        time.sleep(0.02)
+        win32api.keybd_event(vk, 0, win32con.KEYEVENTF_KEYUP, 0)
+
+    def _vk(self, data: bytes) -> int:
+        import win32con
+
+        special = {
+            b".": 0xBE,  # VK_OEM_PERIOD
+            b"\x1b": win32con.VK_ESCAPE,
+            b"\t": win32con.VK_TAB,
+            b" ": win32con.VK_SPACE,
+        }
+        return special.get(data, ord(data.decode("ascii").upper()))
+
+    def _send(self, cmds: list[str]) -> int:
+        # cached; liveness re-checked by pid (process can restart)
+        pid = self.window.pid()
+        if not pid:
+            log.warning("[input_worker] crawl pid not found for cmds={}", tuple(cmds))
+            return 0
+
+        # one focus per batch, not per command
+        t0 = trace.start()
+        focused = self._focus()
+        trace.stop("focus", t0)
+        if not focused:
+            log.warning(
+                "[input_worker] failed to focus window for cmds={} pid={}",
+                tuple(cmds),
+                pid,
+            )
+            return 0
+
+        for cmd in cmds:
+            data = command_bytes(cmd)
+            if data is None:
+                log.warning("[input_worker] unknown cmd={}", cmd)
+                continue
+            self._press(self._vk(data))
+        return len(cmds)
+
+    def close(self) -> None:
+        # after a failure: look the window up again on the next send
+        self.window.invalidate()
+
+
+# ---- pty fd hand-off (reader_worker -> input_worker) ----
+def serve_pty_fd(sock_path: str, fd: int) -> threading.Thread:
+    """
+    Listen on sock_path and send a duplicate of fd to every client that
+    connects (input_worker may restart). Runs in a daemon thread.
+    """
+    try:
+        os.unlink(sock_path)
+    except FileNotFoundError:
+        pass
+    srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    srv.bind(sock_path)
+    srv.listen(1)
+
+    def loop():
+        while True:
+            conn, _ = srv.accept()
+            with conn:
+                socket.send_fds(conn, [b"pty"], [fd])
+
+    t = threading.Thread(target=loop, name="pty-fd-server", daemon=True)
+    t.start()
+    return t
+
+
+def fetch_pty_fd(sock_path: str, wait: float = 5.0) -> int:
+    """Connect to serve_pty_fd() and return the received pty master fd."""
+    deadline = time.perf_counter() + wait
+    while True:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+                s.connect(sock_path)
+                _, fds, _, _ = socket.recv_fds(s, 16, 1)
+            if fds:
+                return fds[0]
+        except (FileNotFoundError, ConnectionRefusedError):
+            pass
+        if time.perf_counter() >= deadline:
+            raise TimeoutError(f"pty fd not served at {sock_path}")
+        time.sleep(0.05)
@@ -0,0 +1,112 @@
+# core/layout.py
+# Where things are on the crawl console screen.
+#
+#   +----------------------+-------------------------+
+#   | map viewport         | stats (name .. Qv:)     |  rows [0, side_top)
+#   |                      +-------------------------+
+#   |                      | status lights + monster |  rows [side_top, view_rows)
+#   |                      | list                    |
+#   +----------------------+-------------------------+
+#   | messages (full width)                          |  rows [view_rows, height)
+#   +------------------------------------------------+
+#
+# Geometry only depends on the console size, so it is detected once per
+# (width, height) and cached; each detector then slices only its own region.
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+# crawl console defaults: map view is at most 21 rows, message area at least 7
+VIEW_MAX_ROWS = 21
+MSG_MIN_ROWS = 7
+# gap between the map viewport and the stat panel
+PANEL_GAP = 2
+
+
+@dataclass(frozen=True)
+class Layout:
+    width: int
+    height: int
+    panel_col: int  # first column of the right-hand panel
+    stats_top: int  # row of the character name
+    side_top: int  # first row after "Qv:" (status lights, then monster list)
+    view_rows: int  # map viewport / hud height; messages start here
+    found: bool = True  # False -> no hud on screen (menu, shop, ...)
+
+    @property
+    def stats_rows(self) -> range:
+        return range(self.stats_top, self.side_top)
+
+    @property
+    def side_rows(self) -> range:
+        return range(self.side_top, self.view_rows)
+
+    @property
+    def message_rows(self) -> range:
+        return range(self.view_rows, self.height)
+
+    @property
+    def map_rows(self) -> range:
+        return range(0, self.view_rows)
+
+    @property
+    def map_cols(self) -> tuple[int, int]:
+        return 0, max(0, self.panel_col - PANEL_GAP)
+
+
+def fallback_layout(width: int, height: int) -> Layout:
+    """No hud found: treat the whole screen as text (menus, prompts)."""
+    return Layout(width, height, width, 0, 0, 0, found=False)
+
+
+def detect_layout(rows: list[str], width: int) -> Layout:
+    height = len(rows)
+    hp_row = panel_col = -1
+    for i, row in enumerate(rows):
+        col = row.find("Health:")
+        if col < 0:
+            col = row.find("HP:")
+        if col >= 0:
+            hp_row, panel_col = i, col
+            break
+    if hp_row < 0:
+        return fallback_layout(width, height)
+
+    # name + species/job lines sit right above Health:
+    stats_top = max(0, hp_row - 2)
+    view_rows = max(hp_row + 1, min(VIEW_MAX_ROWS, height - MSG_MIN_ROWS))
+
+    side_top = -1
+    last_label = hp_row
+    for i in range(hp_row, view_rows):
+        part = rows[i][panel_col:]
+        if part.startswith("Qv:"):
+            side_top = i + 1
+            break
+        if ":" in part:
+            last_label = i
+    if side_top < 0:
+        side_top = last_label + 1
+
+    return Layout(width, height, panel_col, stats_top, side_top, view_rows)
+
+
+class LayoutCache:
+    """detect_layout() once per console size; re-detect only on resize."""
+
+    def __init__(self):
+        self._cache: dict[tuple[int, int], Layout] = {}
+
+    def get(self, rows: list[str], width: int) -> Layout:
+        key = (width, len(rows))
+        layout = self._cache.get(key)
+        if layout is not None:
+            return layout
+        layout = detect_layout(rows, width)
+        # 메뉴 화면처럼 hud가 없으면 캐시하지 않고 다음 프레임에 다시 찾기
+        if layout.found:
+            self._cache[key] = layout
+        return layout
+
+    def clear(self) -> None:
+        self._cache.clear()
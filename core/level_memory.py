@@ -0,0 +1,298 @@
+# core/level_memory.py
+# What we have seen of each level, kept across frames (FrameParser owns it).
+#
+#   memory = LevelMemory()
+#   level = memory.update(gs.place, gs.depth, grid, turn)   (per map change)
+#   level.glyphs / level.seen / level.origin / level.player / level.stairs()
+#   python -m core.level_memory                 (viewport-locating self-check)
+#
+# One LevelMap per "branch:depth" (level_key()). A LevelMap is a fixed
+# CANVAS_H x CANVAS_W canvas (twice crawl's 70x80 level, so any first
+# viewport position fits) of
+#   glyphs : uint8 terrain glyph (ASCII code, 127 = other, 0 = never seen)
+#   seen   : int32 game turn the cell was last visible (-1 = never)
+# Monsters and '@' are not terrain: those cells keep what was there before.
+#
+# The console view scrolls, so each viewport is first located on the canvas
+# among a few candidates: the origin that keeps '@' where it was (crawl
+# scrolls to follow the player; PLAYER_RADIUS cells of movement around it),
+# the previous origin and LOCAL_RADIUS around it (at most ~75 small array
+# compares). The best-agreeing one wins, ties in that order; a perfect match
+# ends the search early. If none of them agrees, or there is too little known
+# terrain in common to tell, the level is started over on a fresh canvas
+# rather than merged at a guessed place.
+# A merge then writes only the cells whose glyph changed and stamps the
+# visible ones with the turn.
+#
+# Memory stays bounded over a whole game: only the LIVE_LEVELS most recent
+# levels keep their arrays; older ones are zlib-packed (a few KB each) and
+# unpacked on return (stairs back up), and past MAX_LEVELS the least
+# recently visited level is dropped.
+#
+# Needs numpy like core/map_grid.py; without it there is no grid and
+# update() never creates a level.
+from __future__ import annotations
+
+import zlib
+from collections import OrderedDict
+
+from core.map_grid import MONSTER, PLAYER, np
+
+CANVAS_H, CANVAS_W = 140, 160
+UNKNOWN = 0
+NEVER = -1
+# located = at least OVERLAP_MIN known cells in common, MATCH_MIN agreeing
+OVERLAP_MIN = 24
+MATCH_MIN = 0.9
+LOCAL_RADIUS = 2
+PLAYER_RADIUS = 3
+LIVE_LEVELS = 2
+MAX_LEVELS = 40
+
+_BLANK = ord(" ")
+
+
+def level_key(place, depth) -> str:
+    return f"{place}:{depth}" if depth is not None else str(place)
+
+
+def _shifts(radius: int) -> list[tuple[int, int]]:
+    """(dr, dc) in the square of `radius`, nearest ring first."""
+    out = [
+        (dr, dc)
+        for dr in range(-radius, radius + 1)
+        for dc in range(-radius, radius + 1)
+    ]
+    out.sort(key=lambda s: (max(abs(s[0]), abs(s[1])), abs(s[0]) + abs(s[1])))
+    return out
+
+
+_LOCAL = _shifts(LOCAL_RADIUS)
+_PLAYER = _shifts(PLAYER_RADIUS)
+
+
+class LevelMap:
+    __slots__ = ("key", "glyphs", "seen", "origin", "player", "relocated")
+
+    def __init__(self, key: str):
+        self.key = key
+        self.glyphs = np.zeros((CANVAS_H, CANVAS_W), dtype=np.uint8)
+        self.seen = np.full((CANVAS_H, CANVAS_W), NEVER, dtype=np.int32)
+        self.origin = None  # canvas (row, col) of the viewport's top-left
+        self.player = None  # canvas (row, col) of '@' on the last merge
+        self.relocated = 0  # viewport lost and mapping restarted (stats)
+
+    # ---- merge ----
+    def merge(self, grid, turn: int) -> int:
+        """Fold one MapGrid into the canvas; number of cells rewritten."""
+        codes = np.minimum(grid.glyphs, 127).astype(np.uint8)
+        kind = grid.kind
+        terrain = (codes != _BLANK) & (kind != MONSTER) & (kind != PLAYER)
+        h, w = codes.shape
+        if h > CANVAS_H or w > CANVAS_W:
+            return 0
+        if self.origin is None:
+            self.origin = ((CANVAS_H - h) // 2, (CANVAS_W - w) // 2)
+        else:
+            origin = self._locate(codes, terrain, grid.player)
+            if origin is None:
+                # nothing fits with confidence (teleport, a big scroll, a
+                # misread place, too little terrain in common): start this
+                # level over rather than merge at a guessed place
+                self.relocated += 1
+                self.glyphs.fill(UNKNOWN)
+                self.seen.fill(NEVER)
+                origin = ((CANVAS_H - h) // 2, (CANVAS_W - w) // 2)
+            self.origin = origin
+
+        r0, c0 = self.origin
+        window = self.glyphs[r0 : r0 + h, c0 : c0 + w]
+        changed = terrain & (window != codes)
+        window[changed] = codes[changed]
+        self.seen[r0 : r0 + h, c0 : c0 + w][terrain] = turn
+        if grid.player is not None:
+            self.player = (r0 + grid.player[0], c0 + grid.player[1])
+        return int(np.count_nonzero(changed))
+
+    def _agreement(self, codes, terrain, r0: int, c0: int):
+        """Share of commonly known cells that agree, None if too few."""
+        h, w = codes.shape
+        if r0 < 0 or c0 < 0 or r0 + h > CANVAS_H or c0 + w > CANVAS_W:
+            return None
+        window = self.glyphs[r0 : r0 + h, c0 : c0 + w]
+        both = terrain & (window != UNKNOWN)
+        n = np.count_nonzero(both)
+        if n < OVERLAP_MIN:
+            return None
+        return np.count_nonzero(both & (window == codes)) / n
+
+    def _locate(self, codes, terrain, player):
+        """Canvas origin of this viewport, or None if none is convincing."""
+        # preference order, which also breaks ties: the origin that keeps '@'
+        # where it was (crawl follows the player), the old origin, then the
+        # rest nearest first. A scroll by one cell in a room still scores
+        # ~0.9 at the old origin, so every candidate is scored and the best
+        # one wins; only a perfect score ends the search early.
+        candidates = []
+        r0, c0 = self.origin
+        if player is not None and self.player is not None:
+            # '@' stayed put on the canvas: origin = its canvas - view position
+            pr, pc = self.player[0] - player[0], self.player[1] - player[1]
+            candidates.append((pr, pc))
+            candidates.append(self.origin)
+            candidates += [(pr + dr, pc + dc) for dr, dc in _PLAYER]
+        else:
+            candidates.append(self.origin)
+        candidates += [(r0 + dr, c0 + dc) for dr, dc in _LOCAL]
+        best, best_score = None, MATCH_MIN
+        tried = set()
+        for pos in candidates:
+            if pos in tried:
+                continue
+            tried.add(pos)
+            score = self._agreement(codes, terrain, pos[0], pos[1])
+            if score is None or score < best_score:
+                continue
+            if best is None or score > best_score:
+                best, best_score = pos, score
+                if score >= 1.0:
+                    break
+        return best
+
+    # ---- queries ----
+    def known(self):
+        return self.glyphs != UNKNOWN
+
+    def stairs(self) -> list[tuple[int, int]]:
+        """Canvas (row, col) of every remembered staircase."""
+        mask = (self.glyphs == ord("<")) | (self.glyphs == ord(">"))
+        return [(int(r), int(c)) for r, c in np.argwhere(mask)]
+
+    def to_view(self, pos: tuple[int, int]) -> tuple[int, int] | None:
+        """Canvas position -> current viewport (row, col) (may be off-screen)."""
+        if self.origin is None:
+            return None
+        return pos[0] - self.origin[0], pos[1] - self.origin[1]
+
+    # ---- packing ----
+    def pack(self) -> tuple:
+        return (
+            self.key,
+            self.origin,
+            self.player,
+            self.relocated,
+            zlib.compress(self.glyphs.tobytes(), 1),
+            zlib.compress(self.seen.tobytes(), 1),
+        )
+
+    @classmethod
+    def unpack(cls, packed: tuple) -> "LevelMap":
+        key, origin, player, relocated, glyphs, seen = packed
+        lm = cls.__new__(cls)
+        lm.key, lm.origin, lm.player, lm.relocated = key, origin, player, relocated
+        shape = (CANVAS_H, CANVAS_W)
+        # frombuffer views are read-only: copy
+        glyphs = np.frombuffer(zlib.decompress(glyphs), np.uint8)
+        seen = np.frombuffer(zlib.decompress(seen), np.int32)
+        lm.glyphs = glyphs.reshape(shape).copy()
+        lm.seen = seen.reshape(shape).copy()
+        return lm
+
+    def __repr__(self) -> str:
+        return f"LevelMap({self.key}, known={int(np.count_nonzero(self.known()))})"
+
+
+class LevelMemory:
+    """All levels of one game; the current one live, the rest packed."""
+
+    def __init__(self, live: int = LIVE_LEVELS, max_levels: int = MAX_LEVELS):
+        self.live_max = max(1, live)
+        self.max_levels = max_levels
+        self._live: OrderedDict[str, LevelMap] = OrderedDict()
+        self._packed: OrderedDict[str, tuple] = OrderedDict()
+        self.current: LevelMap | None = None
+
+    def level(self, key: str) -> LevelMap:
+        """LevelMap for key (unpacked or created), now most recently used."""
+        lm = self._live.pop(key, None)
+        if lm is None:
+            packed = self._packed.pop(key, None)
+            lm = LevelMap.unpack(packed) if packed else LevelMap(key)
+        self._live[key] = lm
+        self._trim()
+        return lm
+
+    def update(self, place, depth, grid, turn) -> LevelMap | None:
+        """Merge a new viewport into its level; the current LevelMap."""
+        if grid is None or not place:
+            return self.current
+        key = level_key(place, depth)
+        if self.current is None or self.current.key != key:
+            self.current = self.level(key)
+        self.current.merge(grid, int(turn or 0))
+        return self.current
+
+    def _trim(self) -> None:
+        while len(self._live) > self.live_max:
+            key, lm = self._live.popitem(last=False)
+            self._packed[key] = lm.pack()
+        while len(self._live) + len(self._packed) > self.max_levels and self._packed:
+            self._packed.popitem(last=False)
+
+    def keys(self) -> list[str]:
+        return list(self._packed) + list(self._live)
+
+    def nbytes(self) -> int:
+        """Approximate memory held (arrays + packed blobs)."""
+        live = sum(lm.glyphs.nbytes + lm.seen.nbytes for lm in self._live.values())
+        packed = sum(len(p[4]) + len(p[5]) for p in self._packed.values())
+        return live + packed
+
+    def reset(self) -> None:
+        self._live.clear()
+        self._packed.clear()
+        self.current = None
+
+
+def selftest() -> None:
+    """Locate a 17x33 view walking across a room, scrolled and not."""
+    from core.map_grid import MapGrid
+
+    h, w = 30, 90
+    level = [["#"] * w] + [["#"] + ["."] * (w - 2) + ["#"] for _ in range(h - 2)]
+    level.append(["#"] * w)
+    for r, c in ((7, 20), (21, 44), (9, 63)):
+        level[r][c] = "#"
+    level[15][50] = ">"
+    vh, vw = 17, 33
+
+    def view(r0, c0, pr, pc):
+        rows = [list(level[r0 + i][c0 : c0 + vw]) for i in range(vh)]
+        rows[pr - r0][pc - c0] = "@"
+        return MapGrid(np.array([[ord(ch) for ch in row] for row in rows]))
+
+    # crawl keeps '@' centred: the view scrolls one cell per step
+    lm = LevelMap("D:1")
+    for pc in range(vw // 2, w - vw // 2):
+        r0, c0 = 15 - vh // 2, pc - vw // 2
+        lm.merge(view(r0, c0, 15, pc), pc)
+        if pc == vw // 2:
+            shift = (lm.origin[0] - r0, lm.origin[1] - c0)
+        assert lm.origin == (r0 + shift[0], c0 + shift[1]), (pc, lm.origin)
+    assert lm.relocated == 0, lm.relocated
+    down = [p for p in lm.stairs() if lm.glyphs[p] == ord(">")]
+    assert down == [(shift[0] + 15, shift[1] + 50)], down
+    print("scrolling view: ok", lm)
+
+    # the view stays put and '@' walks across it
+    lm = LevelMap("D:1")
+    for pc in range(31, 62):
+        lm.merge(view(7, 30, 15, pc), pc)
+        if pc == 31:
+            origin = lm.origin
+        assert lm.origin == origin, (pc, lm.origin)
+    print("fixed view: ok", lm)
+
+
+if __name__ == "__main__":
+    selftest()
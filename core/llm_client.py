@@ -0,0 +1,346 @@
+# core/llm_client.py
+# LLM advice for the game loop without stalling it.
+#
+#   llm = LLMClient(model="gpt-4o-mini", max_concurrency=1)     (once)
+#
+#   decision loop (never blocks): act on the rule engine's choice now, use
+#   the LLM's answer on a later tick if it came back in time
+#   fut = llm.submit(messages)
+#   ...
+#   d = llm.poll(fut, default=rule_choice, parse=choice)   (None: not yet)
+#
+#   or block for at most `deadline` seconds:
+#   d = llm.decide(messages, default=rule_choice, deadline=0.5, parse=choice)
+#   d.value / d.source ("llm" | "default") / d.reason ("deadline", "busy", ...)
+#
+# - Requests go to an OpenAI-compatible POST <base_url>/chat/completions on
+#   a small pool of keep-alive HTTP(S) connections (stdlib http.client; one
+#   TLS handshake per connection, not per call). An idle connection the
+#   server has closed is noticed before use (readable socket) and dropped.
+#   A request is repeated on a fresh connection only when sending it failed
+#   on a reused one, i.e. the server never got it whole; once it is sent,
+#   a failure is an error (it may have been processed and billed).
+# - A thread pool of max_concurrency workers runs them. When every slot is
+#   taken, submit() refuses at once (decide() -> default, reason "busy")
+#   instead of queueing advice that would arrive too late anyway.
+# - decide() waits at most `deadline` seconds and otherwise returns the
+#   caller's default (the rule-based choice) immediately; the late reply is
+#   still read and accounted, just not used.
+# - timeout bounds each socket operation, so a hung server frees its slot.
+# - Token usage from each reply is summed, with a cost estimate from
+#   price_in / price_out (USD per 1M tokens); see stats().
+#
+# Environment: DCSS_LLM_URL, DCSS_LLM_MODEL, DCSS_LLM_CONCURRENCY,
+# DCSS_LLM_TIMEOUT, DCSS_LLM_DEADLINE, DCSS_LLM_PRICE_IN / _OUT,
+# OPENAI_API_KEY. experiments/mock_llm_server.py is a local stand-in that
+# can be slow or fail on purpose.
+from __future__ import annotations
+
+import http.client
+import json
+import os
+import select
+import threading
+import time
+import urllib.parse
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+from dataclasses import dataclass
+
+from core import telemetry
+
+BASE_URL = os.environ.get("DCSS_LLM_URL", "https://api.openai.com/v1")
+MODEL = os.environ.get("DCSS_LLM_MODEL", "gpt-4o-mini")
+MAX_CONCURRENCY = int(os.environ.get("DCSS_LLM_CONCURRENCY", "2"))
+TIMEOUT_SEC = float(os.environ.get("DCSS_LLM_TIMEOUT", "10"))
+DEADLINE_SEC = float(os.environ.get("DCSS_LLM_DEADLINE", "0.5"))
+# USD per 1M tokens
+PRICE_IN = float(os.environ.get("DCSS_LLM_PRICE_IN", "0.15"))
+PRICE_OUT = float(os.environ.get("DCSS_LLM_PRICE_OUT", "0.60"))
+
+
+class LLMError(Exception):
+    pass
+
+
+@dataclass(slots=True)
+class Reply:
+    text: str
+    prompt_tokens: int
+    completion_tokens: int
+    latency: float  # seconds, request -> parsed reply
+
+
+@dataclass(slots=True)
+class Decision:
+    value: object
+    source: str  # "llm" | "default"
+    reason: str = ""  # why the default: deadline / busy / error / unparsed
+    reply: Reply | None = None
+
+
+class _ConnectionPool:
+    """Keep-alive connections to one host; at most `size` kept idle."""
+
+    def __init__(self, base_url: str, size: int, timeout: float):
+        u = urllib.parse.urlsplit(base_url)
+        if u.scheme not in ("http", "https"):
+            raise ValueError(f"unsupported LLM url: {base_url}")
+        self.https = u.scheme == "https"
+        self.host = u.hostname
+        self.port = u.port
+        self.prefix = u.path.rstrip("/")
+        self.size = size
+        self.timeout = timeout
+        self._idle: list = []
+        self._lock = threading.Lock()
+        self.opened = 0  # connections created so far (stats / tests)
+
+    def _new(self):
+        self.opened += 1
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    @staticmethod
+    def _dropped(conn) -> bool:
+        """An idle keep-alive socket is readable only if the server closed it."""
+        if conn.sock is None:
+            return True
+        try:
+            r, _, _ = select.select([conn.sock], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        return bool(r)
+
+    def _take(self):
+        """(connection, reused): a live idle one, else a new one."""
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                return self._new(), False
+            if not self._dropped(conn):
+                return conn, True
+            conn.close()
+
+    def request(self, method: str, path: str, body: bytes, headers: dict):
+        """(status, body bytes)."""
+        conn, reused = self._take()
+        try:
+            conn.request(method, self.prefix + path, body, headers)
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            if not reused:
+                raise
+            # the reused socket died while sending: the server never got a
+            # whole request, so it is safe to send it once more
+            conn = self._new()
+            try:
+                conn.request(method, self.prefix + path, body, headers)
+            except BaseException:
+                conn.close()
+                raise
+        try:
+            resp = conn.getresponse()
+            data = resp.read()
+        except BaseException:
+            # sent: the server may have acted on it, never repeat
+            conn.close()
+            raise
+        if resp.will_close:
+            conn.close()
+        else:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+        return resp.status, data
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+class LLMClient:
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        model: str = MODEL,
+        api_key: str | None = None,
+        max_concurrency: int = MAX_CONCURRENCY,
+        timeout: float = TIMEOUT_SEC,
+        price_in: float = PRICE_IN,
+        price_out: float = PRICE_OUT,
+        enabled: bool = True,
+        log=None,
+    ):
+        self.model = model
+        self.api_key = (
+            os.environ.get("OPENAI_API_KEY", "") if api_key is None else api_key
+        )
+        self.enabled = enabled
+        self.price_in = price_in
+        self.price_out = price_out
+        self.max_concurrency = max(1, max_concurrency)
+        self.log = telemetry.get("llm") if log is None else log
+        self.pool = _ConnectionPool(base_url, self.max_concurrency, timeout)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency, thread_name_prefix="llm"
+        )
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        # accounting (read with stats())
+        self.requests = 0
+        self.replies = 0
+        self.errors = 0
+        self.busy = 0  # refused: every slot taken
+        self.late = 0  # replied after the caller's deadline
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency_total = 0.0
+
+    # ---- requests ----
+    def submit(self, messages: list[dict], **params) -> Future | None:
+        """
+        Start a chat completion in the background and return at once; None
+        if disabled or all max_concurrency slots are busy.
+        """
+        if not self.enabled:
+            return None
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.busy += 1
+            return None
+        with self._lock:
+            self.requests += 1
+        try:
+            fut = self._executor.submit(self._call, messages, params)
+        except RuntimeError:  # closed
+            self._slots.release()
+            return None
+        fut.add_done_callback(lambda _: self._slots.release())
+        return fut
+
+    def _call(self, messages: list[dict], params: dict) -> Reply:
+        body = json.dumps({"model": self.model, "messages": messages, **params})
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        t0 = time.monotonic()
+        try:
+            status, data = self.pool.request(
+                "POST", "/chat/completions", body.encode("utf-8"), headers
+            )
+            if status != 200:
+                raise LLMError(f"HTTP {status}: {data[:200]!r}")
+            obj = json.loads(data)
+            text = obj["choices"][0]["message"].get("content") or ""
+            usage = obj.get("usage") or {}
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            self.log.warning("[LLM] request failed: {}", repr(e))
+            raise
+        reply = Reply(
+            text,
+            int(usage.get("prompt_tokens") or 0),
+            int(usage.get("completion_tokens") or 0),
+            time.monotonic() - t0,
+        )
+        with self._lock:
+            self.replies += 1
+            self.prompt_tokens += reply.prompt_tokens
+            self.completion_tokens += reply.completion_tokens
+            self.latency_total += reply.latency
+        return reply
+
+    # ---- decisions ----
+    def wait(
+        self,
+        fut: Future | None,
+        default,
+        deadline: float = DEADLINE_SEC,
+        parse=None,
+    ) -> Decision:
+        """
+        The reply of `fut` if it is there within `deadline` seconds (0: only
+        if already done), else Decision(default, "default", reason).
+        parse(text) -> value, or None to fall back to the default.
+        """
+        if fut is None:
+            return Decision(default, "default", "busy" if self.enabled else "disabled")
+        # not fut.result(timeout): a socket timeout inside the call is a
+        # TimeoutError too (3.11+), and that one is an error, not "late"
+        done, _ = wait_futures((fut,), timeout=max(0.0, deadline))
+        if not done:
+            fut.add_done_callback(self._count_late)
+            return Decision(default, "default", "deadline")
+        return self._outcome(fut, default, parse)
+
+    def poll(self, fut: Future, default, parse=None) -> Decision | None:
+        """Non-blocking: None while `fut` is running, else like wait()."""
+        if not fut.done():
+            return None
+        return self._outcome(fut, default, parse)
+
+    def _outcome(self, fut: Future, default, parse) -> Decision:
+        try:
+            reply = fut.result()
+        except Exception as e:
+            return Decision(default, "default", f"error: {e}")
+        value = parse(reply.text) if parse is not None else reply.text.strip()
+        if value is None:
+            return Decision(default, "default", "unparsed", reply)
+        return Decision(value, "llm", "", reply)
+
+    def _count_late(self, fut: Future) -> None:
+        if not fut.cancelled() and fut.exception() is None:
+            with self._lock:
+                self.late += 1
+
+    def decide(
+        self,
+        messages: list[dict],
+        default,
+        deadline: float = DEADLINE_SEC,
+        parse=None,
+        **params,
+    ) -> Decision:
+        """
+        submit() + wait(): blocks for up to `deadline`. A loop that must not
+        block at all uses submit() now and poll() on its next ticks.
+        """
+        return self.wait(self.submit(messages, **params), default, deadline, parse)
+
+    # ---- accounting ----
+    @property
+    def cost(self) -> float:
+        """Estimated USD spent so far."""
+        return (
+            self.prompt_tokens * self.price_in + self.completion_tokens * self.price_out
+        ) / 1e6
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "replies": self.replies,
+                "errors": self.errors,
+                "busy": self.busy,
+                "late": self.late,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "cost_usd": round(self.cost, 6),
+                "mean_latency_ms": (
+                    self.latency_total / self.replies * 1000.0 if self.replies else 0.0
+                ),
+                "connections": self.pool.opened,
+            }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.pool.close()
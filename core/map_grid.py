@@ -0,0 +1,231 @@
+# core/map_grid.py
+# The map viewport as NumPy arrays + BFS distance fields for movement.
+#
+#   grid = MapGrid.from_rows(rows, layout)       (the parser does this)
+#   grid.glyphs      : uint32 code points, map rows x map cols
+#   grid.kind        : uint8 cell class (BLOCKED / FLOOR / STAIRS / TRAP /
+#                      MONSTER / PLAYER), one table lookup per frame
+#   grid.player      : (row, col) of '@', or None
+#   grid.distance_from(mask)        : 8-connected steps over walkable cells
+#   grid.escape_keys(n, hostile)    : up to n vi-keys that climb the hostile
+#                                     distance field from the player
+#
+# BFS runs as repeated 3x3 dilation of the whole frontier (separable: one
+# pass along rows, one along columns, on a flat padded copy so every shift
+# is a contiguous slice), so a ring costs a few array ops instead of a
+# Python loop per cell. escape_keys() stops the rings as soon as every cell
+# its path can reach has a distance (a monster next to the player: 2-4
+# rings). Nothing is computed unless asked: only RETREAT / PANIC do.
+#
+# numpy is optional: without it AVAILABLE is False, the parser attaches no
+# grid and the controller keeps rotating through directions as before.
+from __future__ import annotations
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the install
+    np = None
+
+AVAILABLE = np is not None
+
+BLOCKED, FLOOR, STAIRS, TRAP, MONSTER, PLAYER = range(6)
+
+# steps never reach this; also "no path" in distance fields
+UNREACHED = 32767
+
+# vi-keys -> (drow, dcol)
+DIRS = {
+    "h": (0, -1),
+    "j": (1, 0),
+    "k": (-1, 0),
+    "l": (0, 1),
+    "y": (-1, -1),
+    "u": (-1, 1),
+    "b": (1, -1),
+    "n": (1, 1),
+}
+
+# crawl console glyphs. Anything not listed (wall '#', unexplored ' ',
+# deep water / lava and other non-ASCII features) is BLOCKED.
+_FLOOR = ".,'+_{}~)([]?!%/=\"$|*`:"
+_STAIRS = "<>"
+_TRAP = "^"
+_MONSTER = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz&"
+
+
+def _kind_table():
+    table = np.full(128, BLOCKED, dtype=np.uint8)
+    for chars, kind in (
+        (_FLOOR, FLOOR),
+        (_STAIRS, STAIRS),
+        (_TRAP, TRAP),
+        (_MONSTER, MONSTER),
+        ("@", PLAYER),
+    ):
+        table[[ord(ch) for ch in chars]] = kind
+    return table
+
+
+_KIND = _kind_table() if AVAILABLE else None
+
+
+def _padded(mask):
+    """Flat copy of mask with a one-cell False border (no edge cases)."""
+    h, w = mask.shape
+    out = np.zeros((h + 2, w + 2), dtype=bool)
+    out[1:-1, 1:-1] = mask
+    return out.ravel()
+
+
+class MapGrid:
+    __slots__ = ("glyphs", "kind", "walkable", "player", "_fields")
+
+    def __init__(self, glyphs):
+        self.glyphs = glyphs
+        # non-ASCII glyphs index the last table entry (BLOCKED)
+        self.kind = _KIND[np.minimum(glyphs, 127)]
+        # where the player may step: floor, stairs, itself (traps are not)
+        self.walkable = (self.kind == FLOOR) | (self.kind == STAIRS)
+        self.walkable |= self.kind == PLAYER
+        at = np.flatnonzero(self.kind == PLAYER)
+        self.player = divmod(int(at[0]), glyphs.shape[1]) if at.size else None
+        self._fields: dict = {}
+
+    @classmethod
+    def from_rows(cls, rows: list[str], layout) -> "MapGrid | None":
+        """Map viewport of a parsed screen, or None (no hud / no numpy)."""
+        if not AVAILABLE or not layout.found:
+            return None
+        c0, c1 = layout.map_cols
+        width = c1 - c0
+        n = min(layout.view_rows, len(rows))
+        if width <= 0 or n <= 0:
+            return None
+        text = "".join(rows[i][c0:c1].ljust(width) for i in range(n))
+        glyphs = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        return cls(glyphs.reshape(n, width))
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.glyphs.shape
+
+    def mask(self, glyphs: str):
+        """Cells showing any of `glyphs`."""
+        out = np.zeros(self.glyphs.shape, dtype=bool)
+        for ch in set(glyphs):
+            out |= self.glyphs == ord(ch)
+        return out
+
+    def monsters(self, hostile: str = ""):
+        """
+        Monster cells; restricted to the `hostile` glyphs (side panel) when
+        given, since allies / summons share the letter glyphs.
+        """
+        mask = self.kind == MONSTER
+        if hostile:
+            mask &= self.mask(hostile)
+        return mask
+
+    def distance_from(self, sources, until=None):
+        """
+        int16 steps from the nearest source cell over walkable cells
+        (8-connected); UNREACHED where no path exists. With `until` (mask),
+        stop as soon as all of those cells are reached: everything still
+        UNREACHED is then farther than any of them.
+        """
+        h, w = self.glyphs.shape
+        stride = w + 2
+        passable = _padded(self.walkable | sources)
+        frontier = _padded(sources) & passable
+        free = passable & ~frontier
+        wanted = _padded(until) if until is not None else None
+        dist = np.full(passable.shape, UNREACHED, dtype=np.int16)
+        dist[frontier] = 0
+        # Flat padded layout: every shift is a contiguous slice, and the 3x3
+        # dilation is separable (left/right, then up/down). Border cells pick
+        # up garbage but are never in `free`.
+        row = np.zeros_like(passable)
+        grown = np.zeros_like(passable)
+        lo, hi = stride, len(passable) - stride
+        d = 0
+        while True:
+            if wanted is not None and not (wanted & free).any():
+                break
+            d += 1
+            np.bitwise_or(frontier[:-2], frontier[1:-1], out=row[1:-1])
+            row[1:-1] |= frontier[2:]
+            np.bitwise_or(row[: hi - stride], row[lo:hi], out=grown[lo:hi])
+            grown[lo:hi] |= row[lo + stride :]
+            frontier = grown & free
+            if not frontier.any():
+                break
+            dist[frontier] = d
+            free ^= frontier
+        return dist.reshape(h + 2, stride)[1:-1, 1:-1]
+
+    def _field(self, key, make):
+        field = self._fields.get(key)
+        if field is None:
+            field = self._fields[key] = self.distance_from(make())
+        return field
+
+    def hostile_distance(self, hostile: str = ""):
+        return self._field(("hostile", hostile), lambda: self.monsters(hostile))
+
+    def player_distance(self):
+        return self._field(("player",), lambda: self.kind == PLAYER)
+
+    def stairs_distance(self):
+        return self._field(("stairs",), lambda: self.kind == STAIRS)
+
+    def escape_keys(self, n: int, hostile: str = "", avoid: str | None = None):
+        """
+        Up to n moves walking away from the hostiles: each step goes to the
+        walkable neighbour farthest (by path) from any hostile, ties broken
+        towards stairs, then away from `avoid` (the way we just came). []
+        when the player or the hostiles are not on the map.
+        """
+        if self.player is None:
+            return []
+        monsters = self.monsters(hostile)
+        if not monsters.any():
+            return []
+        height, width = self.glyphs.shape
+        r, c = self.player
+        # the path only ever looks at cells within n steps of the player
+        near = np.zeros(self.glyphs.shape, dtype=bool)
+        near[max(0, r - n) : r + n + 1, max(0, c - n) : c + n + 1] = True
+        danger = self.distance_from(monsters, until=near)
+        stairs = None  # only needed to break ties
+        visited = {(r, c)}
+        keys = []
+        for _ in range(n):
+            options = []
+            for key, (dr, dc) in DIRS.items():
+                nr, nc = r + dr, c + dc
+                if not (0 <= nr < height and 0 <= nc < width):
+                    continue
+                if not self.walkable[nr, nc] or (nr, nc) in visited:
+                    continue
+                options.append((int(danger[nr, nc]), key, nr, nc))
+            if not options:
+                break
+            top = max(o[0] for o in options)
+            options = [o for o in options if o[0] == top]
+            if len(options) > 1 and stairs is None:
+                stairs = self.distance_from(self.kind == STAIRS, until=near)
+            _, key, r, c = max(
+                options,
+                key=lambda o: (
+                    -int(stairs[o[2], o[3]]) if stairs is not None else 0,
+                    o[1] != avoid,
+                ),
+            )
+            visited.add((r, c))
+            keys.append(key)
+            avoid = None
+        return keys
+
+    def __repr__(self) -> str:
+        h, w = self.glyphs.shape
+        return f"MapGrid({w}x{h}, player={self.player})"
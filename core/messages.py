@@ -0,0 +1,92 @@
+# core/messages.py
+# Message area -> stream of genuinely new messages.
+#
+# The message window keeps old lines on screen for a long time, so checking
+# "is 'hits you' visible" fires for many frames after the hit. MessageStream
+# diffs the message rows against the previous frame (scrolling, a line being
+# extended in place, --more-- pages) and yields each new message once.
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+MORE_MARKER = "--more--"
+
+# (kind, all of these substrings must appear in the lowercased text)
+MESSAGE_KINDS = (
+    ("melee_contact", ("hits you",)),
+    ("melee_contact", ("misses you",)),
+    ("melee_contact", ("you encounter",)),
+    ("monster_seen", ("comes into view",)),
+    ("nearby", ("is nearby!",)),
+    ("nearby", ("are nearby!",)),
+    ("nearby", ("there are monsters nearby",)),
+    ("confirm", ("y/n",)),
+    ("shop", ("welcome to", "shop")),
+)
+
+
+@dataclass(frozen=True, slots=True)
+class Message:
+    text: str
+    kind: str  # one of MESSAGE_KINDS kinds, or "other"
+
+
+def classify(text: str) -> str:
+    low = text.lower()
+    for kind, needles in MESSAGE_KINDS:
+        if all(n in low for n in needles):
+            return kind
+    return "other"
+
+
+def _clean(lines: Iterable[str]) -> list[str]:
+    out = []
+    for ln in lines:
+        s = ln.replace(MORE_MARKER, "").strip()
+        if s:
+            out.append(s)
+    return out
+
+
+def _new_lines(prev: list[str], cur: list[str]) -> list[str]:
+    """
+    Lines of cur that were not on screen in prev.
+
+    cur is expected to look like prev scrolled up by some amount plus new
+    lines at the bottom; the last overlapping line may also have grown
+    (crawl appends short messages to the current line).
+    """
+    if not prev:
+        return cur
+    for shift in range(len(prev)):
+        kept = prev[shift:]
+        m = len(kept)
+        if m > len(cur):
+            continue
+        if kept[:-1] != cur[: m - 1]:
+            continue
+        last_prev, last_cur = kept[-1], cur[m - 1]
+        if last_cur == last_prev:
+            return cur[m:]
+        if last_cur.startswith(last_prev):
+            return [last_cur[len(last_prev) :].strip()] + cur[m:]
+    # nothing overlaps: the window was cleared / a new --more-- page
+    return cur
+
+
+class MessageStream:
+    """Feed the message rows of every frame; iterate the new messages."""
+
+    def __init__(self):
+        self._prev: list[str] = []
+
+    def reset(self) -> None:
+        self._prev = []
+
+    def feed(self, rows: Iterable[str]) -> Iterator[Message]:
+        cur = _clean(rows)
+        new = _new_lines(self._prev, cur)
+        self._prev = cur
+        # classify lazily: cost is proportional to the new text only
+        return (Message(text, classify(text)) for text in new if text)
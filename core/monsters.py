@@ -0,0 +1,478 @@
+# core/monsters.py
+# Monster knowledge base: what a side-panel entry ("ggg 3 goblins") is worth.
+#
+#   db = monsters.get_db()
+#   db.lookup("3 goblins")        -> (3, Monster(goblin, g, hd=1, ...))
+#   db.by_glyph("o")              -> (Monster(orc), Monster(orc priest), ...)
+#   monsters.panel_danger(gs.monsters) -> (summed danger, unknown entries)
+#
+# The source of truth is _TABLE below (name, glyph, HD, speed, max damage of
+# the strongest attack, flags). It is compiled into a small binary file
+# (monsters.bin in a cache directory, rebuilt whenever _TABLE changes; see
+# cache_dir(): the package itself may be read-only):
+#
+#   header  <4sHHIII  magic, version, record size, records, aliases, crc
+#   records <IIBBBBH  name offset, glyph, name length, hd, speed, damage,
+#                     flags                      (fixed size, by index)
+#   aliases <IHH      string offset, length, record index
+#   strings           utf-8 pool (names + aliases)
+#
+# Aliases are every lookup form, precomputed at compile time: lower-case
+# name and its crawl plural ("goblins", "wolves", "orc priests"). Loading
+# mmaps the file and builds one dict alias -> record index from the alias
+# table (a few hundred entries, well under a millisecond); records are
+# unpacked on first use. A lookup is one regex for the "3 " count prefix
+# and one dict get, memoised per panel string.
+#
+# Numbers follow crawl's monster data loosely (rounded, early/mid game);
+# danger() is a heuristic, not a simulation.
+from __future__ import annotations
+
+import mmap
+import os
+import re
+import struct
+import zlib
+from dataclasses import dataclass
+
+MAGIC = b"DCMB"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIII")
+RECORD = struct.Struct("<IIBBBBH")
+ALIAS = struct.Struct("<IHH")
+
+
+def cache_dir() -> str:
+    """DCSS_CACHE_DIR, else <DCSS_OUT_DIR>/cache, else the user cache dir."""
+    path = os.environ.get("DCSS_CACHE_DIR")
+    if path:
+        return path
+    out = os.environ.get("DCSS_OUT_DIR")
+    if out:
+        return os.path.join(out, "cache")
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "dcss-ai")
+
+
+DEFAULT_PATH = os.path.join(cache_dir(), "monsters.bin")
+
+# flags
+RANGED = 1 << 0  # hits from a distance (arrows, spit, breath)
+CASTER = 1 << 1  # casts spells (bolts, smiting, summons, buffs)
+FAST = 1 << 2  # speed > 10 (set from speed at compile time)
+UNIQUE = 1 << 3
+POISON = 1 << 4
+PACK = 1 << 5  # usually comes in groups
+
+_FLAG_CHARS = {"r": RANGED, "c": CASTER, "u": UNIQUE, "p": POISON, "k": PACK}
+
+NORMAL_SPEED = 10
+
+# fmt: off
+# (name, glyph, hd, speed, max damage, flags: r c u p k)
+_TABLE = (
+    # D:1-4 fodder
+    ("rat", "r", 1, 10, 3, ""),
+    ("quokka", "r", 1, 10, 5, ""),
+    ("river rat", "r", 3, 10, 5, ""),
+    ("bat", "b", 1, 30, 2, ""),
+    ("newt", "l", 1, 10, 3, ""),
+    ("iguana", "l", 3, 10, 7, ""),
+    ("jackal", "h", 1, 14, 3, "k"),
+    ("hound", "h", 3, 15, 6, "k"),
+    ("wolf", "h", 4, 15, 8, "k"),
+    ("warg", "h", 6, 12, 12, "k"),
+    ("goblin", "g", 1, 10, 4, ""),
+    ("hobgoblin", "g", 1, 10, 5, ""),
+    ("gnoll", "g", 2, 10, 9, "k"),
+    ("gnoll shaman", "g", 3, 10, 5, "c"),
+    ("gnoll sergeant", "g", 3, 10, 10, ""),
+    ("kobold", "K", 1, 10, 4, ""),
+    ("big kobold", "K", 5, 10, 7, ""),
+    ("kobold demonologist", "K", 4, 10, 4, "c"),
+    ("ball python", "S", 2, 10, 5, ""),
+    ("adder", "S", 2, 10, 5, "p"),
+    ("water moccasin", "S", 4, 10, 10, "p"),
+    ("ooze", "J", 3, 8, 5, ""),
+    ("acid blob", "J", 4, 9, 10, ""),
+    ("worm", "w", 5, 6, 12, ""),
+    ("giant cockroach", "a", 2, 10, 3, ""),
+    ("endoplasm", "J", 1, 10, 2, ""),
+    ("frilled lizard", "l", 2, 10, 6, ""),
+    ("bullfrog", "F", 4, 10, 10, ""),
+    ("cane toad", "F", 5, 10, 12, ""),
+    # orcs
+    ("orc", "o", 1, 10, 6, "k"),
+    ("orc wizard", "o", 2, 10, 5, "c"),
+    ("orc priest", "o", 3, 10, 6, "c"),
+    ("orc warrior", "o", 4, 10, 10, ""),
+    ("orc knight", "o", 9, 10, 20, ""),
+    ("orc sorcerer", "o", 8, 10, 7, "c"),
+    ("orc high priest", "o", 11, 10, 7, "c"),
+    ("orc warlord", "o", 15, 10, 32, ""),
+    # D:4-10
+    ("killer bee", "y", 3, 20, 10, "pk"),
+    ("yellow wasp", "y", 5, 14, 13, "p"),
+    ("vampire mosquito", "y", 5, 20, 10, ""),
+    ("redback", "s", 5, 15, 18, "p"),
+    ("wolf spider", "s", 11, 15, 25, "p"),
+    ("jumping spider", "s", 8, 20, 20, "p"),
+    ("soldier ant", "a", 6, 10, 14, "p"),
+    ("scorpion", "s", 6, 10, 10, "p"),
+    ("centaur", "c", 4, 15, 10, "r"),
+    ("centaur warrior", "c", 9, 15, 16, "r"),
+    ("yaktaur", "c", 8, 10, 15, "r"),
+    ("ogre", "O", 5, 10, 17, ""),
+    ("two-headed ogre", "O", 6, 10, 17, ""),
+    ("ogre mage", "O", 10, 10, 12, "c"),
+    ("troll", "T", 7, 10, 20, ""),
+    ("deep troll", "T", 10, 10, 27, ""),
+    ("iron troll", "T", 16, 10, 35, ""),
+    ("cyclops", "C", 12, 10, 35, "r"),
+    ("ettin", "C", 13, 10, 45, ""),
+    ("yak", "Y", 7, 10, 18, "k"),
+    ("death yak", "Y", 14, 10, 30, "k"),
+    ("elephant", "Y", 12, 10, 30, ""),
+    ("zombie", "Z", 4, 8, 10, ""),
+    ("skeleton", "Z", 4, 10, 10, ""),
+    ("ghoul", "z", 4, 10, 9, ""),
+    ("phantom", "W", 7, 15, 10, ""),
+    ("wight", "W", 3, 10, 8, ""),
+    ("steam dragon", "D", 9, 10, 12, "r"),
+    ("swamp drake", "D", 6, 11, 14, "r"),
+    ("fire drake", "D", 6, 12, 12, "r"),
+    ("wyvern", "D", 5, 10, 18, ""),
+    ("hydra", "D", 10, 10, 18, ""),
+    ("komodo dragon", "l", 8, 10, 18, ""),
+    ("crocodile", "l", 8, 10, 20, ""),
+    ("deep elf fighter", "e", 3, 10, 9, ""),
+    ("deep elf mage", "e", 4, 10, 5, "c"),
+    ("deep elf archer", "e", 7, 10, 12, "r"),
+    ("deep elf knight", "e", 9, 10, 15, "c"),
+    ("deep elf annihilator", "e", 15, 10, 12, "c"),
+    ("naga", "N", 6, 10, 10, "r"),
+    ("naga mage", "N", 7, 10, 5, "c"),
+    ("naga warrior", "N", 10, 10, 18, ""),
+    ("salamander", "N", 7, 10, 15, ""),
+    ("boggart", "g", 2, 12, 5, "c"),
+    ("spriggan", "i", 6, 14, 8, ""),
+    ("harpy", "H", 7, 25, 10, ""),
+    ("manticore", "H", 9, 10, 14, "r"),
+    ("griffon", "H", 12, 18, 18, ""),
+    ("hippogriff", "H", 7, 10, 10, ""),
+    ("gargoyle", "9", 4, 10, 10, ""),
+    ("wraith", "W", 6, 10, 13, ""),
+    ("vampire", "V", 11, 10, 22, "c"),
+    ("lindwurm", "D", 9, 10, 20, ""),
+    ("minotaur", "H", 13, 10, 35, ""),
+    # uniques (early)
+    ("natasha", "f", 4, 10, 5, "uc"),
+    ("ijyb", "g", 3, 10, 6, "u"),
+    ("robin", "g", 5, 10, 7, "u"),
+    ("crazy yiuf", "g", 6, 10, 12, "u"),
+    ("sigmund", "@", 3, 10, 7, "uc"),
+    ("terence", "@", 3, 10, 8, "u"),
+    ("jessica", "@", 4, 10, 5, "uc"),
+    ("blork the orc", "o", 5, 10, 12, "u"),
+    ("edmund", "@", 4, 10, 11, "u"),
+    ("pikel", "@", 4, 10, 8, "uk"),
+    ("dowan", "e", 3, 10, 5, "uc"),
+    ("duvessa", "e", 3, 10, 9, "u"),
+    ("prince ribbit", "F", 6, 10, 10, "u"),
+    ("grinder", "W", 5, 10, 10, "uc"),
+    ("eustachio", "@", 4, 10, 8, "uc"),
+    ("menkaure", "M", 5, 10, 10, "uc"),
+    ("psyche", "@", 7, 10, 10, "uc"),
+    ("maurice", "@", 5, 10, 8, "uc"),
+    ("josephine", "@", 10, 10, 11, "uc"),
+    ("harold", "@", 8, 10, 10, "ur"),
+    ("urug", "o", 10, 10, 20, "u"),
+    ("erolcha", "O", 6, 10, 20, "uc"),
+    ("snorg", "T", 11, 10, 36, "u"),
+    ("nergalle", "o", 10, 10, 8, "uc"),
+    ("rupert", "@", 16, 10, 20, "u"),
+)
+# fmt: on
+
+
+@dataclass(frozen=True, slots=True)
+class Monster:
+    name: str
+    glyph: str
+    hd: int
+    speed: int
+    damage: int
+    flags: int
+
+    @property
+    def ranged(self) -> bool:
+        return bool(self.flags & RANGED)
+
+    @property
+    def caster(self) -> bool:
+        return bool(self.flags & CASTER)
+
+    @property
+    def fast(self) -> bool:
+        return bool(self.flags & FAST)
+
+    @property
+    def unique(self) -> bool:
+        return bool(self.flags & UNIQUE)
+
+    def danger(self) -> float:
+        """
+        Rough fighting strength on the same scale as player_power():
+        HD plus a quarter of the best hit, scaled by speed, with extra
+        weight for things you cannot simply walk away from or out-melee.
+        """
+        d = (self.hd + self.damage / 4.0) * self.speed / NORMAL_SPEED
+        if self.flags & CASTER:
+            d *= 1.5
+        if self.flags & RANGED:
+            d *= 1.25
+        if self.flags & UNIQUE:
+            d *= 1.5
+        return d
+
+
+def player_power(xl) -> float:
+    """What an XL `xl` character handles comfortably, in danger() units."""
+    return 3.0 + 2.0 * (xl or 1)
+
+
+# ---- plurals (crawl's pluralise(), the cases that occur in monster names) ----
+_PLURAL_IRREGULAR = {"foot": "feet", "ox": "oxen", "mouse": "mice"}
+
+
+def pluralise(name: str) -> str:
+    head, sep, tail = name.partition(" of ")
+    if sep:
+        # "spirit of the forest" -> "spirits of the forest"
+        return pluralise(head) + sep + tail
+    words = name.split(" ")
+    last = words[-1]
+    if last in _PLURAL_IRREGULAR:
+        last = _PLURAL_IRREGULAR[last]
+    elif last.endswith("man") and last not in ("human", "shaman"):
+        last = last[:-3] + "men"
+    elif last.endswith(("lf", "rf")):
+        last = last[:-1] + "ves"
+    elif last.endswith(("s", "x", "ch", "sh", "z")):
+        last += "es"
+    elif last.endswith("y") and last[-2:-1] not in ("a", "e", "o", "u"):
+        last = last[:-1] + "ies"
+    elif last.endswith("o") and last[-2:-1] not in ("o",):
+        last += "es"
+    else:
+        last += "s"
+    return " ".join(words[:-1] + [last])
+
+
+def _source_crc() -> int:
+    return zlib.crc32(repr((VERSION, _TABLE)).encode("utf-8"))
+
+
+def compile_table(table=_TABLE) -> bytes:
+    """_TABLE -> the binary format described at the top."""
+    pool = bytearray()
+    offsets: dict[str, int] = {}
+
+    def intern(s: str) -> tuple[int, int]:
+        raw = s.encode("utf-8")
+        off = offsets.get(s)
+        if off is None:
+            off = offsets[s] = len(pool)
+            pool.extend(raw)
+        return off, len(raw)
+
+    records = bytearray()
+    aliases: dict[str, int] = {}
+    for idx, (name, glyph, hd, speed, damage, flag_chars) in enumerate(table):
+        flags = 0
+        for ch in flag_chars:
+            flags |= _FLAG_CHARS[ch]
+        if speed > NORMAL_SPEED:
+            flags |= FAST
+        off, n = intern(name)
+        records += RECORD.pack(off, ord(glyph), n, hd, speed, damage, flags)
+        forms = [name.lower()]
+        if not flags & UNIQUE:
+            forms.append(pluralise(name.lower()))
+        for form in forms:
+            # first definition wins (table order = preference)
+            aliases.setdefault(form, idx)
+
+    alias_bytes = bytearray()
+    for form, idx in aliases.items():
+        off, n = intern(form)
+        alias_bytes += ALIAS.pack(off, n, idx)
+
+    header = HEADER.pack(
+        MAGIC, VERSION, RECORD.size, len(table), len(aliases), _source_crc()
+    )
+    return bytes(header + records + alias_bytes + pool)
+
+
+_COUNT_RE = re.compile(r"(\d+)\s+(.*)")
+_ARTICLES = ("a ", "an ", "the ")
+
+
+class MonsterDB:
+    """Read-only view over a compiled table (bytes or mmap)."""
+
+    def __init__(self, buf):
+        magic, version, rec_size, n_rec, n_alias, crc = HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or version != VERSION or rec_size != RECORD.size:
+            raise ValueError("not a monster table (or an old version)")
+        self.crc = crc
+        self._buf = buf
+        self._rec_base = HEADER.size
+        alias_base = self._rec_base + n_rec * RECORD.size
+        self._pool = alias_base + n_alias * ALIAS.size
+        self._records: list[Monster | None] = [None] * n_rec
+
+        self._index: dict[str, int] = {}
+        pool = self._pool
+        for i in range(n_alias):
+            off, n, idx = ALIAS.unpack_from(buf, alias_base + i * ALIAS.size)
+            form = bytes(buf[pool + off : pool + off + n]).decode("utf-8")
+            self._index[form] = idx
+
+        self._glyphs: dict[str, list[int]] = {}
+        for idx in range(n_rec):
+            glyph = chr(struct.unpack_from("<I", buf, self._record_at(idx) + 4)[0])
+            self._glyphs.setdefault(glyph, []).append(idx)
+        # panel string -> (count, record index or -1)
+        self._memo: dict[str, tuple[int, int]] = {}
+
+    def _record_at(self, idx: int) -> int:
+        return self._rec_base + idx * RECORD.size
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def record(self, idx: int) -> Monster:
+        m = self._records[idx]
+        if m is None:
+            off, glyph, n, hd, speed, damage, flags = RECORD.unpack_from(
+                self._buf, self._record_at(idx)
+            )
+            pool = self._pool
+            name = bytes(self._buf[pool + off : pool + off + n]).decode("utf-8")
+            m = self._records[idx] = Monster(name, chr(glyph), hd, speed, damage, flags)
+        return m
+
+    def _resolve(self, text: str) -> tuple[int, int]:
+        s = text.strip().lower()
+        count = 1
+        m = _COUNT_RE.fullmatch(s)
+        if m:
+            count, s = int(m.group(1)), m.group(2)
+        for article in _ARTICLES:
+            if s.startswith(article) and s not in self._index:
+                s = s[len(article) :]
+                break
+        return count, self._index.get(s, -1)
+
+    def lookup(self, text: str) -> tuple[int, Monster | None]:
+        """(count, Monster or None) for a panel / message name."""
+        hit = self._memo.get(text)
+        if hit is None:
+            if len(self._memo) >= 4096:
+                self._memo.clear()
+            hit = self._memo[text] = self._resolve(text)
+        count, idx = hit
+        return count, (self.record(idx) if idx >= 0 else None)
+
+    def by_glyph(self, glyph: str) -> tuple[Monster, ...]:
+        return tuple(self.record(i) for i in self._glyphs.get(glyph, ()))
+
+    def entry_danger(self, glyph: str, name: str, status: str = "") -> float | None:
+        """
+        Danger of one side-panel entry (all its monsters). Unknown names
+        fall back to the most dangerous known monster with that glyph;
+        None if the glyph is unknown too. Sleeping monsters count half.
+        """
+        count, m = self.lookup(name)
+        if m is not None:
+            d = m.danger()
+        else:
+            known = self.by_glyph(glyph[:1]) if glyph else ()
+            if not known:
+                return None
+            d = max(k.danger() for k in known)
+        if "asleep" in status:
+            d *= 0.5
+        return d * count
+
+
+def load(path: str = DEFAULT_PATH) -> MonsterDB:
+    """
+    mmap the compiled table at `path`, (re)compiling it first if missing
+    or built from a different _TABLE. Unwritable location: in memory.
+    """
+    crc = _source_crc()
+    buf = None
+    try:
+        with open(path, "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        db = MonsterDB(buf)
+        if db.crc == crc:
+            return db
+    except (OSError, ValueError, struct.error):
+        pass
+    # stale / corrupt: release the mapping before replacing the file
+    # (Windows cannot replace a mapped file)
+    if buf is not None:
+        buf.close()
+
+    data = compile_table()
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+    return MonsterDB(data)
+
+
+_db: MonsterDB | None = None
+
+
+def get_db() -> MonsterDB:
+    global _db
+    if _db is None:
+        _db = load()
+    return _db
+
+
+def panel_danger(entries) -> tuple[float, int]:
+    """
+    Summed danger of GameState.monsters ((glyph, name, status), ...) and
+    how many entries could not be rated at all.
+    """
+    db = get_db()
+    total = 0.0
+    unknown = 0
+    for glyph, name, status in entries:
+        d = db.entry_danger(glyph, name, status)
+        if d is None:
+            unknown += 1
+        else:
+            total += d
+    return total, unknown
+
+
+if __name__ == "__main__":
+    import time
+
+    t0 = time.perf_counter()
+    db = load()
+    print(
+        f"{len(db)} monsters from {DEFAULT_PATH} in {(time.perf_counter() - t0) * 1e3:.2f} ms"
+    )
@@ -0,0 +1,396 @@
+# core/process_locator.py
+# Finds the crawl process once and keeps what we need from it open:
+#
+#   ProcessLocator   : pid of the first process matching a predicate. The pid
+#                      is cached; liveness is checked by pid + start time
+#                      (pid reuse safe) at most every `check_every` seconds,
+#                      and the full process scan only runs again after the
+#                      process died or the caller reported a failure.
+#   ConsoleAttachment: AttachConsole + CONOUT$ handle for that pid, kept open
+#                      between captures (Win32ConsoleSource); one capture is
+#                      a single ReadConsoleOutputCharacter. Reattaches only
+#                      after a read failure or a game restart (the locator's
+#                      (pid, start time) identity changed, pid reuse too).
+#   WindowLocator    : top-level window of that process for
+#                      Win32InputBackend, cached until the window goes away
+#                      or the identity changes.
+#
+# All OS calls go through an OsApi object (Win32OsApi by default), so the
+# caching / reattach logic can be driven with a fake:
+#   python -m core.process_locator          (self-check against a fake OsApi)
+from __future__ import annotations
+
+import time
+from typing import Callable
+
+
+def by_name(*names: str) -> Callable[[dict], bool]:
+    """Matcher: process name equals one of `names` (case-insensitive)."""
+    wanted = {n.lower() for n in names}
+    return lambda info: (info.get("name") or "").lower() in wanted
+
+
+def name_contains(fragment: str) -> Callable[[dict], bool]:
+    fragment = fragment.lower()
+    return lambda info: fragment in (info.get("name") or "").lower()
+
+
+class OsApi:
+    """What the locators need from the OS. Override everything in fakes."""
+
+    def find_pids(self, match: Callable[[dict], bool], attrs: tuple) -> list[int]:
+        raise NotImplementedError
+
+    def start_time(self, pid: int) -> float | None:
+        """Process creation time, or None if no such process."""
+        raise NotImplementedError
+
+    def attach_console(self, pid: int) -> None:
+        raise NotImplementedError
+
+    def free_console(self) -> None:
+        raise NotImplementedError
+
+    def open_screen(self):
+        """Handle on the attached console's screen buffer (CONOUT$)."""
+        raise NotImplementedError
+
+    def read_screen(self, handle, width: int, height: int) -> str:
+        raise NotImplementedError
+
+    def close_screen(self, handle) -> None:
+        raise NotImplementedError
+
+    def find_window(self, pid: int):
+        raise NotImplementedError
+
+    def window_alive(self, hwnd) -> bool:
+        raise NotImplementedError
+
+
+class Win32OsApi(OsApi):
+    """psutil + pywin32 (imported lazily: the module loads anywhere)."""
+
+    def find_pids(self, match, attrs=("pid", "name")) -> list[int]:
+        import psutil
+
+        pids = []
+        for p in psutil.process_iter(list(attrs)):
+            try:
+                if match(p.info):
+                    pids.append(int(p.info["pid"]))
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return pids
+
+    def start_time(self, pid: int) -> float | None:
+        import psutil
+
+        try:
+            return psutil.Process(pid).create_time()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return None
+
+    def attach_console(self, pid: int) -> None:
+        import win32console
+
+        win32console.AttachConsole(pid)
+
+    def free_console(self) -> None:
+        import win32console
+
+        try:
+            win32console.FreeConsole()
+        except Exception:
+            pass
+
+    def open_screen(self):
+        import win32con
+        import win32console
+        import win32file
+
+        h = win32file.CreateFile(
+            "CONOUT$",
+            win32con.GENERIC_READ | win32con.GENERIC_WRITE,
+            win32con.FILE_SHARE_READ | win32con.FILE_SHARE_WRITE,
+            None,
+            win32con.OPEN_EXISTING,
+            0,
+            None,
+        )
+        return win32console.PyConsoleScreenBufferType(h)
+
+    def read_screen(self, handle, width: int, height: int) -> str:
+        import win32console
+
+        coord = win32console.PyCOORDType(0, 0)
+        return handle.ReadConsoleOutputCharacter(width * height, coord)
+
+    def close_screen(self, handle) -> None:
+        try:
+            handle.Close()
+        except Exception:
+            pass
+
+    def find_window(self, pid: int):
+        """First visible top-level hwnd owned by pid, else None."""
+        import win32gui
+        import win32process
+
+        result = {"hwnd": None}
+
+        def enum_handler(hwnd, _):
+            if not win32gui.IsWindowVisible(hwnd):
+                return
+            _, owner = win32process.GetWindowThreadProcessId(hwnd)
+            if owner == pid:
+                result["hwnd"] = hwnd
+
+        win32gui.EnumWindows(enum_handler, None)
+        return result["hwnd"]
+
+    def window_alive(self, hwnd) -> bool:
+        import win32gui
+
+        return bool(hwnd) and bool(win32gui.IsWindow(hwnd))
+
+
+class ProcessLocator:
+    def __init__(
+        self,
+        match: Callable[[dict], bool],
+        attrs: tuple = ("pid", "name"),
+        os_api: OsApi | None = None,
+        check_every: float = 0.5,
+        clock=time.monotonic,
+    ):
+        self.match = match
+        self.attrs = attrs
+        self.os = os_api if os_api is not None else Win32OsApi()
+        self.check_every = check_every
+        self.clock = clock
+        self._pid = None
+        self._started = None
+        self._checked = 0.0
+        self.scans = 0  # full process scans so far (stats / tests)
+
+    def pid(self) -> int | None:
+        """Cached pid if the process is still the one we found, else rescan."""
+        now = self.clock()
+        if self._pid is not None:
+            if now - self._checked < self.check_every:
+                return self._pid
+            self._checked = now
+            if self.os.start_time(self._pid) == self._started:
+                return self._pid
+            self._pid = None
+
+        self.scans += 1
+        pids = self.os.find_pids(self.match, self.attrs)
+        # 여러 개면 첫 번째 (대부분 하나뿐)
+        for pid in pids:
+            started = self.os.start_time(pid)
+            if started is not None:
+                self._pid, self._started, self._checked = pid, started, now
+                return pid
+        return None
+
+    def identity(self) -> tuple | None:
+        """
+        (pid, start time) of the located process, or None. A game restarted
+        under a reused pid is a new identity: whatever was opened for the
+        old one must be reopened.
+        """
+        pid = self.pid()
+        return (pid, self._started) if pid else None
+
+    def invalidate(self) -> None:
+        """Caller saw the pid fail (attach/read error): rescan next time."""
+        self._pid = None
+
+
+class ConsoleAttachment:
+    """The game's console, attached once and read many times."""
+
+    def __init__(self, locator: ProcessLocator):
+        self.locator = locator
+        self.os = locator.os
+        self._pid = None
+        self._ident = None  # locator identity the console was attached for
+        self._screen = None
+        self.attaches = 0  # stats / tests
+
+    def _detach(self) -> None:
+        if self._screen is not None:
+            self.os.close_screen(self._screen)
+            self._screen = None
+        if self._pid is not None:
+            self.os.free_console()
+            self._pid = None
+        self._ident = None
+
+    def _attach(self, ident: tuple) -> None:
+        self._detach()
+        # 현재 콘솔(보통 VSCode 터미널 콘솔)에서 분리 후 crawl 콘솔에 붙기
+        self.os.free_console()
+        self.os.attach_console(ident[0])
+        self._pid = ident[0]
+        self._screen = self.os.open_screen()
+        self._ident = ident
+        self.attaches += 1
+
+    def read(self, width: int, height: int) -> str:
+        ident = self.locator.identity()
+        if ident is None:
+            self._detach()
+            raise RuntimeError("crawl-console.exe를 찾지 못함")
+        try:
+            if ident != self._ident or self._screen is None:
+                self._attach(ident)
+            return self.os.read_screen(self._screen, width, height)
+        except Exception:
+            # handle went bad (game restarted, console closed): start over
+            self._detach()
+            self.locator.invalidate()
+            raise
+
+    def close(self) -> None:
+        self._detach()
+
+
+class WindowLocator:
+    """Window of the located process, looked up once per pid."""
+
+    def __init__(self, locator: ProcessLocator):
+        self.locator = locator
+        self.os = locator.os
+        self._ident = None
+        self._hwnd = None
+
+    def pid(self) -> int | None:
+        return self.locator.pid()
+
+    def hwnd(self):
+        ident = self.locator.identity()
+        if ident is None:
+            self._ident = self._hwnd = None
+            return None
+        if ident != self._ident or not self.os.window_alive(self._hwnd):
+            self._ident = ident
+            self._hwnd = self.os.find_window(ident[0])
+        return self._hwnd
+
+    def invalidate(self) -> None:
+        self._hwnd = None
+        self.locator.invalidate()
+
+
+class _FakeOs(OsApi):
+    """One fake game process; restart() reuses its pid, kill() ends it."""
+
+    def __init__(self, pid: int = 4242):
+        self.procs = {pid: 1000.0}  # pid -> start time
+        self.attached = None
+        self.calls: dict[str, int] = {}
+        self.fail_reads = 0
+
+    def _count(self, name: str) -> None:
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def restart(self, pid: int) -> None:
+        self.procs[pid] += 60.0
+
+    def kill(self, pid: int) -> None:
+        del self.procs[pid]
+
+    def find_pids(self, match, attrs=("pid", "name")) -> list[int]:
+        self._count("find_pids")
+        return [p for p in self.procs if match({"pid": p, "name": "crawl-console"})]
+
+    def start_time(self, pid: int) -> float | None:
+        return self.procs.get(pid)
+
+    def attach_console(self, pid: int) -> None:
+        self._count("attach_console")
+        if pid not in self.procs:
+            raise OSError("no such process")
+        self.attached = (pid, self.procs[pid])
+
+    def free_console(self) -> None:
+        self.attached = None
+
+    def open_screen(self):
+        return self.attached
+
+    def read_screen(self, handle, width: int, height: int) -> str:
+        self._count("read_screen")
+        if self.fail_reads:
+            self.fail_reads -= 1
+            raise OSError("handle is invalid")
+        if handle != self.attached or handle[0] not in self.procs:
+            raise OSError("stale console handle")
+        if self.procs[handle[0]] != handle[1]:
+            raise OSError("console of a dead process")
+        return "x" * (width * height)
+
+    def close_screen(self, handle) -> None:
+        pass
+
+    def find_window(self, pid: int):
+        self._count("find_window")
+        return (pid, self.procs.get(pid))
+
+    def window_alive(self, hwnd) -> bool:
+        return hwnd is not None and self.procs.get(hwnd[0]) == hwnd[1]
+
+
+def selftest() -> None:
+    """ProcessLocator / ConsoleAttachment / WindowLocator against _FakeOs."""
+    t = [0.0]
+    fake = _FakeOs()
+    loc = ProcessLocator(name_contains("crawl"), os_api=fake, clock=lambda: t[0])
+    con = ConsoleAttachment(loc)
+    win = WindowLocator(loc)
+
+    # found once, attached once, many reads
+    for _ in range(20):
+        t[0] += 0.1
+        assert con.read(4, 2) == "x" * 8
+        assert win.hwnd() == (4242, 1000.0)
+    assert loc.scans == 1 and con.attaches == 1, (loc.scans, con.attaches)
+    assert fake.calls["find_window"] == 1, fake.calls
+    print("cached: ok", fake.calls)
+
+    # the game restarts under the same pid: reattached on the next check,
+    # before any read fails
+    fake.restart(4242)
+    t[0] += 1.0
+    assert con.read(4, 2) == "x" * 8
+    assert loc.scans == 2 and con.attaches == 2, (loc.scans, con.attaches)
+    assert win.hwnd() == (4242, 1060.0)
+    print("pid reuse: ok, reattached")
+
+    # a failed read drops the handle; the next read attaches again
+    fake.fail_reads = 1
+    try:
+        con.read(4, 2)
+        raise AssertionError("read should have failed")
+    except OSError:
+        pass
+    assert con.read(4, 2) == "x" * 8 and con.attaches == 3, con.attaches
+    print("read failure: ok, reattached")
+
+    # the game exits: no pid, detached
+    fake.kill(4242)
+    t[0] += 1.0
+    try:
+        con.read(4, 2)
+        raise AssertionError("read should have failed")
+    except RuntimeError:
+        pass
+    assert win.hwnd() is None and fake.attached is None
+    print("exit: ok", fake.calls)
+
+
+if __name__ == "__main__":
+    selftest()
@@ -0,0 +1,324 @@
+# core/recorder.py
+# Session recorder: every distinct frame the controller looked at, plus its
+# decisions and emitted commands, for replay / benchmarks.
+#
+# On disk (one directory per session, run_logs/recordings/<start time>/):
+#   frames.bin   : records [kind u8, width u16, height u16, length u32] + zlib
+#                  payload. kind KEY = whole screen (utf-8), kind DELTA = only
+#                  rows that changed vs the previous frame:
+#                  repeated [row u16, nbytes u16, utf-8 row].
+#                  With the ATTRS bit set in kind (frames with colours, i.e.
+#                  ScreenFrame.attrs), KEY is [nbytes u32, utf-8 screen,
+#                  attrs] and each DELTA row is followed by its attrs
+#                  (width u16 values); a row counts as changed when its
+#                  text or its attrs did.
+#                  A KEY frame every `keyframe_every` frames (and on resize
+#                  or when attrs appear / disappear).
+#   frames.idx   : fixed 32-byte entries [offset u64, seq u64, ts f64,
+#                  keyframe u32, length u32]; entry n is at n * 32, so frame n
+#                  is found in O(1) and rebuilt from at most keyframe_every
+#                  records.
+#   events.jsonl : {"t": time, "frame": n, "kind": ..., ...} per line
+#                  (decisions, commands).
+#
+# Recorder.frame()/event() only hand the data to a background writer thread
+# (text conversion, diff, compress, write), so the controller loop never
+# waits on disk. Frames are handed over as the ScreenFrame itself (no copy).
+from __future__ import annotations
+
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from array import array
+
+from core.frame import ScreenFrame
+from core.frame_channel import Frame
+
+KEY = 0
+DELTA = 1
+ATTRS = 0x80  # flag: record carries attrs
+
+_REC = struct.Struct("<BHHI")
+_IDX = struct.Struct("<QQdII")
+_ROW = struct.Struct("<HH")
+_LEN = struct.Struct("<I")
+
+FRAMES_FILE = "frames.bin"
+INDEX_FILE = "frames.idx"
+EVENTS_FILE = "events.jsonl"
+
+
+def _rows(text: str, width: int) -> list[str]:
+    if width <= 0:
+        return [text]
+    return [text[i : i + width] for i in range(0, len(text), width)]
+
+
+def _attr_rows(attrs: array | None, width: int, height: int):
+    """attrs as one bytes object per row, or None."""
+    if attrs is None:
+        return None
+    data = attrs.tobytes()
+    n = width * 2
+    return [data[i * n : (i + 1) * n] for i in range(height)]
+
+
+def session_dir(root: str) -> str:
+    """New session directory under root, named after the start time."""
+    path = os.path.join(root, time.strftime("%Y%m%d-%H%M%S"))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class Recorder:
+    def __init__(self, path: str, keyframe_every: int = 100, level: int = 6):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.keyframe_every = keyframe_every
+        self.level = level
+        self.frames = 0  # number of frames recorded so far
+        self._last = None
+        self._q: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="recorder", daemon=True)
+        self._thread.start()
+
+    # ---- hot path (controller) ----
+    def frame(self, screen: ScreenFrame, ts=None, seq=0) -> int:
+        """Record a frame unless identical to the previous one; its index."""
+        last = self._last
+        if (
+            last is not None
+            and screen.chars == last.chars
+            and screen.attrs == last.attrs
+        ):
+            return self.frames - 1
+        self._last = screen
+        n = self.frames
+        self.frames += 1
+        ts = time.time() if ts is None else ts
+        self._q.put(("frame", n, seq, ts, screen))
+        return n
+
+    def event(self, kind: str, **fields) -> None:
+        fields.setdefault("t", time.time())
+        fields["frame"] = self.frames - 1
+        fields["kind"] = kind
+        self._q.put(("event", fields))
+
+    def command(self, cmd: str) -> None:
+        self.event("command", cmd=cmd)
+
+    def close(self) -> None:
+        self._q.put(None)
+        self._thread.join()
+
+    # ---- writer thread ----
+    def _run(self) -> None:
+        frames_f = open(os.path.join(self.path, FRAMES_FILE), "wb")
+        index_f = open(os.path.join(self.path, INDEX_FILE), "wb")
+        events_f = open(os.path.join(self.path, EVENTS_FILE), "w", encoding="utf-8")
+        offset = 0
+        key = 0
+        prev_rows = None
+        prev_attrs = None
+        prev_size = None
+        last_flush = time.perf_counter()
+        try:
+            while True:
+                try:
+                    item = self._q.get(timeout=1.0)
+                except queue.Empty:
+                    item = ()
+                if item is None:
+                    break
+                if item and item[0] == "frame":
+                    _, n, seq, ts, screen = item
+                    width, height = screen.width, screen.height
+                    rows = screen.rows()
+                    attrs = _attr_rows(screen.attrs, width, height)
+                    if (
+                        prev_rows is None
+                        or prev_size != (width, height)
+                        or len(rows) != len(prev_rows)
+                        or (attrs is None) != (prev_attrs is None)
+                        or n - key >= self.keyframe_every
+                    ):
+                        kind = KEY
+                        key = n
+                        raw = screen.text().encode("utf-8")
+                        if attrs is not None:
+                            raw = _LEN.pack(len(raw)) + raw + screen.attrs_bytes()
+                    else:
+                        kind = DELTA
+                        parts = []
+                        for i, (a, b) in enumerate(zip(prev_rows, rows)):
+                            if a != b or (
+                                attrs is not None and attrs[i] != prev_attrs[i]
+                            ):
+                                data = b.encode("utf-8")
+                                parts.append(_ROW.pack(i, len(data)))
+                                parts.append(data)
+                                if attrs is not None:
+                                    parts.append(attrs[i])
+                        raw = b"".join(parts)
+                    if attrs is not None:
+                        kind |= ATTRS
+                    payload = zlib.compress(raw, self.level)
+                    frames_f.write(_REC.pack(kind, width, height, len(payload)))
+                    frames_f.write(payload)
+                    size = _REC.size + len(payload)
+                    index_f.write(_IDX.pack(offset, seq, ts, key, size))
+                    offset += size
+                    prev_rows = rows
+                    prev_attrs = attrs
+                    prev_size = (width, height)
+                elif item:
+                    events_f.write(
+                        json.dumps(item[1], ensure_ascii=False, separators=(",", ":"))
+                    )
+                    events_f.write("\n")
+
+                now = time.perf_counter()
+                if now - last_flush >= 1.0:
+                    frames_f.flush()
+                    index_f.flush()
+                    events_f.flush()
+                    last_flush = now
+        finally:
+            frames_f.close()
+            index_f.close()
+            events_f.close()
+
+
+class RecordingBus:
+    """CommandBus wrapper that also records every command sent."""
+
+    def __init__(self, bus, recorder: Recorder):
+        self._bus = bus
+        self._rec = recorder
+
+    def send(self, cmd: str, plan_seq: int, t_ns: int = 0) -> int:
+        head = self._bus.send(cmd, plan_seq, t_ns)
+        self._rec.command(cmd)
+        return head
+
+    def send_many(
+        self,
+        cmds: list[str],
+        plan_seq: int,
+        t_ns: int = 0,
+        priorities: list[int] | None = None,
+    ) -> int:
+        head = self._bus.send_many(cmds, plan_seq, t_ns, priorities)
+        for cmd in cmds:
+            self._rec.command(cmd)
+        return head
+
+    def cancel_before(self, plan_seq: int) -> None:
+        self._bus.cancel_before(plan_seq)
+        self._rec.event("cancel", before=plan_seq)
+
+    def __getattr__(self, name):
+        return getattr(self._bus, name)
+
+
+class Recording:
+    """Read side: Recording(path)[n] / .frames() / .events()."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, INDEX_FILE), "rb") as f:
+            idx = f.read()
+        # a crash can leave a partial last entry; ignore it
+        self._idx = idx[: len(idx) - len(idx) % _IDX.size]
+        self._f = open(os.path.join(path, FRAMES_FILE), "rb")
+        self._cache_n = -1
+        self._cache_rows: list[str] = []
+        self._cache_attrs: list[bytes] | None = None
+
+    def __len__(self) -> int:
+        return len(self._idx) // _IDX.size
+
+    def entry(self, n: int) -> tuple:
+        """(offset, seq, ts, keyframe, length) of frame n."""
+        return _IDX.unpack_from(self._idx, n * _IDX.size)
+
+    def _record(self, n: int):
+        offset, _, _, _, length = self.entry(n)
+        self._f.seek(offset)
+        data = self._f.read(length)
+        kind, width, height, size = _REC.unpack_from(data, 0)
+        raw = zlib.decompress(data[_REC.size : _REC.size + size])
+        return kind, width, height, raw
+
+    def _apply(self, rows: list[str], attrs, raw: bytes, width: int) -> None:
+        pos = 0
+        while pos < len(raw):
+            i, nbytes = _ROW.unpack_from(raw, pos)
+            pos += _ROW.size
+            rows[i] = raw[pos : pos + nbytes].decode("utf-8")
+            pos += nbytes
+            if attrs is not None:
+                attrs[i] = raw[pos : pos + width * 2]
+                pos += width * 2
+
+    def __getitem__(self, n: int) -> Frame:
+        if n < 0:
+            n += len(self)
+        if not 0 <= n < len(self):
+            raise IndexError(n)
+        _, seq, ts, key, _ = self.entry(n)
+
+        # sequential access: continue from the cached frame
+        if key <= self._cache_n < n:
+            start = self._cache_n + 1
+            rows = self._cache_rows
+            attrs = self._cache_attrs
+        else:
+            start = key
+            rows = []
+            attrs = None
+        for i in range(start, n + 1):
+            kind, width, height, raw = self._record(i)
+            if kind & ~ATTRS == KEY:
+                if kind & ATTRS:
+                    (nbytes,) = _LEN.unpack_from(raw, 0)
+                    text = raw[_LEN.size : _LEN.size + nbytes]
+                    a = array("H")
+                    a.frombytes(raw[_LEN.size + nbytes :])
+                    attrs = _attr_rows(a, width, height)
+                else:
+                    text, attrs = raw, None
+                rows = _rows(text.decode("utf-8"), width)
+            else:
+                self._apply(rows, attrs, raw, width)
+
+        self._cache_n = n
+        self._cache_rows = rows
+        self._cache_attrs = attrs
+        screen = ScreenFrame.from_text("".join(rows), width, height)
+        if attrs is not None:
+            screen.attrs = array("H")
+            screen.attrs.frombytes(b"".join(attrs))
+        return Frame(seq, ts, width, height, screen)
+
+    def frames(self):
+        for n in range(len(self)):
+            yield self[n]
+
+    def events(self, kind: str | None = None):
+        with open(os.path.join(self.path, EVENTS_FILE), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    ev = json.loads(line)
+                except ValueError:
+                    continue  # partial last line
+                if kind is None or ev.get("kind") == kind:
+                    yield ev
+
+    def close(self) -> None:
+        self._f.close()
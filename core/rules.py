@@ -0,0 +1,262 @@
+# core/rules.py
+# Declarative policy rules, compiled into an indexed decision structure.
+#
+#   RULES = RuleSet([
+#       Rule("shop_escape", {"shop_like": True, "queue_empty": True},
+#            ("ESC",), priority=90, note="[PLAN] shop screen -> queued ESC"),
+#       Rule("rest", {"mode": ("!=", "NORMAL"), "ai_state": "EXPLORE"},
+#            ("WAIT",), cooldown=1.0),
+#   ])
+#   matcher = Matcher(RULES)
+#   matcher.update(gather(RULES.fields, extra, gs, state))   (every decision)
+#   rule = matcher.select(now, fired)          (best matching, not cooling)
+#
+# A condition is field -> value (equality) or field -> (op, value) with op
+# in ==, !=, <, <=, >, >=, in, not in. Identical conditions are shared
+# between rules. Compiled index:
+#   field -> conditions on it -> rules using each condition
+# and per field the conditions are indexed by expected value (==, !=) and
+# by sorted threshold (<, <=, >, >=).
+# A Matcher remembers the last facts, every condition's truth and, per rule,
+# how many of its conditions are false. When a field changes old -> new,
+# update() re-tests only the conditions that can flip (expected value old
+# or new, threshold between old and new) and adjusts the counters of the
+# rules using them; rules at zero form the (usually tiny) agenda. A
+# decision costs O(flipped conditions + agenda), independent of the rule
+# count.
+#
+# The Matcher is only a cache of the facts it was fed: feeding it facts from
+# different sources just re-tests more conditions, results stay exact. It is
+# not thread-safe and sharing one defeats the cache: one per controller
+# (core/controller.py passes it into step()).
+# Cooldowns are decision state and live with the caller (`fired`: rule name
+# -> last time it fired).
+from __future__ import annotations
+
+import operator
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+
+OPS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda a, b: a in b,
+    "not in": lambda a, b: a not in b,
+}
+
+_MISSING = object()
+
+
+@dataclass(frozen=True, eq=False)
+class Rule:
+    name: str
+    when: dict  # field -> value | (op, value)
+    then: tuple[str, ...] = ()  # commands to queue
+    priority: int = 0  # higher wins
+    cooldown: float = 0.0  # seconds between two firings
+    sets: dict = field(default_factory=dict)  # state fields to assign on fire
+    note: str = ""  # log line when fired (prefixed with "[RULE <name>]")
+
+
+def _condition(name: str, spec) -> tuple:
+    if isinstance(spec, tuple) and len(spec) == 2 and spec[0] in OPS:
+        op, value = spec
+    else:
+        op, value = "==", spec
+    if isinstance(value, (list, set)):
+        value = frozenset(value)
+    return name, op, value
+
+
+def _number(x) -> bool:
+    return isinstance(x, (int, float))
+
+
+class _FieldIndex:
+    """
+    The conditions on one field, indexed so a value change old -> new only
+    yields those whose truth can differ: ==/!= by expected value, range
+    tests by sorted threshold (those between old and new), anything else
+    (in / not in, odd values) always.
+    """
+
+    __slots__ = ("all", "by_value", "ranges", "keys", "other")
+
+    def __init__(self):
+        self.all: list[int] = []
+        self.by_value: dict = {}
+        self.ranges: list[tuple] = []  # (threshold, condition), sorted
+        self.keys: list = []
+        self.other: list[int] = []
+
+    def add(self, ci: int, op: str, value) -> None:
+        self.all.append(ci)
+        if op in ("==", "!="):
+            try:
+                self.by_value.setdefault(value, []).append(ci)
+                return
+            except TypeError:
+                pass
+        elif op in ("<", "<=", ">", ">=") and _number(value):
+            self.ranges.append((value, ci))
+            return
+        self.other.append(ci)
+
+    def finish(self) -> None:
+        self.ranges.sort()
+        self.keys = [v for v, _ in self.ranges]
+
+    def affected(self, old, new) -> list[int]:
+        if old is _MISSING:
+            return self.all
+        out = list(self.other)
+        try:
+            out += self.by_value.get(old, ())
+            out += self.by_value.get(new, ())
+        except TypeError:
+            return self.all
+        if self.ranges:
+            if _number(old) and _number(new):
+                lo, hi = (old, new) if old <= new else (new, old)
+                i = bisect_left(self.keys, lo)
+                j = bisect_right(self.keys, hi)
+                out += [ci for _, ci in self.ranges[i:j]]
+            else:
+                out += [ci for _, ci in self.ranges]
+        return out
+
+
+class RuleSet:
+    """Rules compiled once; share it between any number of Matchers."""
+
+    def __init__(self, rules):
+        self.rules: tuple[Rule, ...] = tuple(rules)
+        names = [r.name for r in self.rules]
+        if len(set(names)) != len(names):
+            raise ValueError("duplicate rule names")
+        # best first: priority, then declaration order
+        order = sorted(range(len(self.rules)), key=lambda i: -self.rules[i].priority)
+        self.rank = [0] * len(self.rules)
+        for pos, i in enumerate(order):
+            self.rank[i] = pos
+
+        cond_ids: dict[tuple, int] = {}
+        self.conditions: list[tuple] = []  # (field, op function, value)
+        self.cond_rules: list[list[int]] = []
+        self.rule_conds: list[int] = []  # number of conditions per rule
+        self.by_field: dict[str, _FieldIndex] = {}
+        for ri, rule in enumerate(self.rules):
+            seen = set()
+            for name, spec in rule.when.items():
+                key = _condition(name, spec)
+                ci = cond_ids.get(key)
+                if ci is None:
+                    ci = cond_ids[key] = len(self.conditions)
+                    self.conditions.append((key[0], OPS[key[1]], key[2]))
+                    self.cond_rules.append([])
+                    index = self.by_field.get(key[0])
+                    if index is None:
+                        index = self.by_field[key[0]] = _FieldIndex()
+                    index.add(ci, key[1], key[2])
+                if ci not in seen:
+                    seen.add(ci)
+                    self.cond_rules[ci].append(ri)
+            self.rule_conds.append(len(seen))
+        for index in self.by_field.values():
+            index.finish()
+        self.fields = tuple(self.by_field)
+        self.always = [ri for ri, n in enumerate(self.rule_conds) if n == 0]
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+
+def gather(fields, *sources) -> dict:
+    """fields -> value, from the first source (dict or object) that has it."""
+    out = {}
+    for name in fields:
+        for src in sources:
+            if isinstance(src, dict):
+                value = src.get(name, _MISSING)
+            else:
+                value = getattr(src, name, _MISSING)
+            if value is not _MISSING:
+                out[name] = value
+                break
+        else:
+            out[name] = None
+    return out
+
+
+def _test(cond, value) -> bool:
+    _, fn, expected = cond
+    try:
+        return bool(fn(value, expected))
+    except TypeError:
+        # None < 0.5 etc.: an unknown value satisfies nothing
+        return False
+
+
+class Matcher:
+    def __init__(self, ruleset: RuleSet):
+        self.rs = ruleset
+        self.facts: dict = {}
+        # every condition starts false: each rule misses all of its conditions
+        self.truth = [False] * len(ruleset.conditions)
+        self.unsat = list(ruleset.rule_conds)
+        self.agenda: set[int] = set(ruleset.always)
+        self.tested = 0  # conditions re-tested by the last update() (stats)
+
+    def update(self, facts: dict) -> None:
+        rs = self.rs
+        last = self.facts
+        truth = self.truth
+        unsat = self.unsat
+        agenda = self.agenda
+        tested = 0
+        for name, value in facts.items():
+            old = last.get(name, _MISSING)
+            if old is value or (old is not _MISSING and old == value):
+                continue
+            last[name] = value
+            index = rs.by_field.get(name)
+            if index is None:
+                continue
+            for ci in index.affected(old, value):
+                tested += 1
+                now_true = _test(rs.conditions[ci], value)
+                if now_true == truth[ci]:
+                    continue
+                truth[ci] = now_true
+                step = -1 if now_true else 1
+                for ri in rs.cond_rules[ci]:
+                    n = unsat[ri] = unsat[ri] + step
+                    if n == 0:
+                        agenda.add(ri)
+                    elif n == 1 and step == 1:
+                        agenda.discard(ri)
+        self.tested = tested
+
+    def matching(self) -> list[Rule]:
+        """Every rule whose conditions all hold, best first."""
+        rank = self.rs.rank
+        return [self.rs.rules[i] for i in sorted(self.agenda, key=rank.__getitem__)]
+
+    def select(self, now: float, fired=None) -> Rule | None:
+        """Best matching rule that is not cooling down (fired: name -> t)."""
+        if not self.agenda:
+            return None
+        for rule in self.matching():
+            if rule.cooldown and fired:
+                t = fired.get(rule.name)
+                if t is not None and now - t < rule.cooldown:
+                    continue
+            return rule
+        return None
+
+    def reset(self) -> None:
+        self.__init__(self.rs)
@@ -0,0 +1,256 @@
+# core/screen_source.py
+# Where reader_worker gets screens from.
+#
+#   Win32ConsoleSource : AttachConsole + ReadConsoleOutputCharacter on a running
+#                        crawl-console.exe (Windows, polled at an adaptive
+#                        rate; unchanged screens are not returned).
+#   PtyScreenSource    : runs crawl (or any curses program) under a pty and
+#                        keeps the screen in an in-process VT emulator
+#                        (Linux/macOS, a new frame on every output burst).
+from __future__ import annotations
+
+import os
+import select
+import subprocess
+import time
+
+from core import trace
+from core.frame import ScreenFrame
+from core.vt import Terminal
+
+
+class ScreenSource:
+    """
+    width/height : console size in cells
+    read(timeout): new screen contents as a ScreenFrame (core/frame.py), or
+                   None if nothing changed within timeout (a screen equal to
+                   the last one returned is never returned again)
+    last_ack     : commands the returned screen answers: ack_probe()
+                   (commands delivered so far, set by reader_worker) sampled
+                   right before the capture, taken over only when the screen
+                   differs from a capture made before those commands were
+                   sent. Delivered-but-no-visible-effect (ESC on nothing)
+                   is never acked; the controller's cooldowns cover it.
+    """
+
+    width = 120
+    height = 45
+    ack_probe = None
+    last_ack = 0
+    _last_hash = None  # last screen returned
+    _ack_seen = 0  # newest ack count sampled
+    _ack_stamp = 0  # sampled right before the current capture
+    _base_hash = None  # a capture made before every send in _ack_seen
+
+    def _probe(self) -> int:
+        return self.ack_probe() if self.ack_probe is not None else 0
+
+    def _stamp(self) -> None:
+        """Call right before capturing: keys acked now were sent before it."""
+        self._ack_stamp = self._probe()
+
+    def _changed(self, frame: ScreenFrame) -> bool:
+        """
+        Settle last_ack for `frame`, then False if it hashes like the last
+        screen returned (nothing worth publishing).
+        """
+        h = frame.digest()
+        stamp = self._ack_stamp
+        if stamp > self.last_ack and h != self._base_hash:
+            # drawn after those keys went in, and not what the game showed
+            # before: the answer
+            self.last_ack = stamp
+        # keep the "before" snapshot: this capture only qualifies if no key
+        # was delivered from the previous sample until after it was taken
+        after = self._probe()
+        if stamp == self._ack_seen and after == self._ack_seen:
+            self._base_hash = h
+        self._ack_seen = max(self._ack_seen, stamp, after)
+        if h == self._last_hash:
+            return False
+        self._last_hash = h
+        return True
+
+    def start(self) -> None:
+        pass
+
+    def read(self, timeout: float) -> ScreenFrame | None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class Win32ConsoleSource(ScreenSource):
+    """
+    Polls fast (min_poll) while the screen keeps changing or right after a
+    command was delivered (ack_probe moved), and backs off by `backoff` per
+    unchanged capture up to max_poll when the game sits idle. A capture whose
+    hash equals the previous one is dropped (read() returns None).
+    The console stays attached between captures (ConsoleAttachment).
+    """
+
+    def __init__(
+        self,
+        width: int = 120,
+        height: int = 45,
+        min_poll: float = 0.025,
+        max_poll: float = 1.0,
+        backoff: float = 1.5,
+    ):
+        self.width = width
+        self.height = height
+        self.min_poll = min_poll
+        self.max_poll = max_poll
+        self.backoff = backoff
+        self.poll = min_poll
+        self.console = None  # ConsoleAttachment (core/process_locator.py)
+
+    def capture(self) -> str:
+        if self.console is None:
+            from core.process_locator import (
+                ConsoleAttachment,
+                ProcessLocator,
+                name_contains,
+            )
+
+            # found once, attached once; reattaches after a failure/restart
+            self.console = ConsoleAttachment(
+                ProcessLocator(name_contains("crawl-console"))
+            )
+        return self.console.read(self.width, self.height)
+
+    def _wait(self, timeout: float) -> None:
+        """Sleep out the poll interval; cut short when a command goes out."""
+        end = time.perf_counter() + min(self.poll, timeout)
+        ack = self._ack_seen
+        while True:
+            left = end - time.perf_counter()
+            if left <= 0:
+                return
+            time.sleep(min(left, self.min_poll))
+            if self.ack_probe is not None and self.ack_probe() != ack:
+                self.poll = self.min_poll
+                # give the game one fast interval to draw its answer
+                end = min(end, time.perf_counter() + self.min_poll)
+
+    def read(self, timeout: float) -> ScreenFrame | None:
+        self._wait(timeout)
+        self._stamp()
+        t0 = trace.start()
+        frame = ScreenFrame.from_text(self.capture(), self.width, self.height)
+        trace.stop("capture", t0)
+
+        if not self._changed(frame):
+            self.poll = min(self.max_poll, self.poll * self.backoff)
+            return None
+        self.poll = self.min_poll
+        return frame
+
+    def close(self) -> None:
+        if self.console is not None:
+            self.console.close()
+
+
+class PtyScreenSource(ScreenSource):
+    """
+    Spawn `cmd` on a fresh pty sized width x height and emulate its output.
+
+    read() blocks until the program writes something, then keeps draining
+    while more output follows within `settle` seconds (at most `max_burst`),
+    so one redraw (curses refresh) becomes one frame.
+    """
+
+    def __init__(
+        self,
+        cmd: list[str],
+        width: int = 120,
+        height: int = 45,
+        settle: float = 0.003,
+        max_burst: float = 0.05,
+        env: dict | None = None,
+    ):
+        self.cmd = cmd
+        self.width = width
+        self.height = height
+        self.settle = settle
+        self.max_burst = max_burst
+        self.env = env
+        self.term = Terminal(width, height)
+        self.proc: subprocess.Popen | None = None
+        self.master_fd = -1
+
+    def start(self) -> None:
+        import fcntl
+        import pty
+        import struct
+        import termios
+
+        master, slave = pty.openpty()
+        fcntl.ioctl(
+            slave,
+            termios.TIOCSWINSZ,
+            struct.pack("HHHH", self.height, self.width, 0, 0),
+        )
+        env = dict(os.environ if self.env is None else self.env)
+        env.setdefault("TERM", "xterm")
+        env["LINES"] = str(self.height)
+        env["COLUMNS"] = str(self.width)
+
+        self.proc = subprocess.Popen(
+            self.cmd,
+            stdin=slave,
+            stdout=slave,
+            stderr=slave,
+            env=env,
+            start_new_session=True,  # pty becomes the controlling terminal
+            close_fds=True,
+        )
+        os.close(slave)
+        self.master_fd = master
+
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def _drain(self, timeout: float) -> bool:
+        r, _, _ = select.select([self.master_fd], [], [], timeout)
+        if not r:
+            return False
+        try:
+            data = os.read(self.master_fd, 65536)
+        except OSError:  # EIO: child closed the pty
+            data = b""
+        if not data:
+            raise EOFError("pty closed")
+        self.term.feed(data)
+        return True
+
+    def read(self, timeout: float) -> ScreenFrame | None:
+        if not self._drain(timeout):
+            return None
+        # output started; the frame is taken at the end of the burst
+        self._stamp()
+        # capture = first output byte -> frame text (settle wait + emulation)
+        t0 = trace.start()
+        end = time.perf_counter() + self.max_burst
+        while time.perf_counter() < end and self._drain(self.settle):
+            pass
+        frame = self.term.frame()
+        trace.stop("capture", t0)
+        # cursor-only / identical redraws
+        return frame if self._changed(frame) else None
+
+    def attrs(self) -> list:
+        """Attribute grid (fg | bg << 8 per cell) of the current screen."""
+        return self.term.attrs
+
+    def close(self) -> None:
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=2.0)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        if self.master_fd >= 0:
+            os.close(self.master_fd)
+            self.master_fd = -1
@@ -0,0 +1,49 @@
+# core/shm.py
+# Small helper for the file-backed shared memory regions used between
+# reader_worker / input_worker / main (frame channel, command bus).
+from __future__ import annotations
+
+import mmap
+import os
+import time
+
+
+def map_file(
+    path: str, size: int, create: bool = False, wait: float = 0.0
+) -> mmap.mmap:
+    """
+    Map `path` (exactly `size` bytes) read/write into this process.
+
+    create=True  -> file is created (or resized) and zero-filled.
+    create=False -> file must already exist; waits up to `wait` seconds for
+                    the creator (normally the controller) to make it.
+    """
+    if create:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        mm[:] = bytes(size)
+        return mm
+
+    deadline = time.time() + wait
+    while True:
+        try:
+            fd = os.open(path, os.O_RDWR)
+            break
+        except FileNotFoundError:
+            if time.time() >= deadline:
+                raise
+            time.sleep(0.05)
+
+    try:
+        while os.fstat(fd).st_size < size:
+            if time.time() >= deadline:
+                raise RuntimeError(f"shared region too small: {path}")
+            time.sleep(0.05)
+        return mmap.mmap(fd, size)
+    finally:
+        os.close(fd)
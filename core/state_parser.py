@@ -1,5 +1,11 @@
 import re
 
+from core.frame import ScreenFrame
+from core.layout import Layout, LayoutCache
+from core.level_memory import LevelMemory
+from core.map_grid import MapGrid
+from core.messages import MessageStream
+
 
 def parse_hp(text: str):
     match = re.search(r"Health:\s*(\d+)/(\d+)", text)
@@ -24,3 +30,413 @@ def compute_hp_ratio(hp):
     if r > 1.0:
         return 1.0
     return r
+
+
+# ---------------------------------------------------------------------------
+# GameState: everything the controller needs from one console frame,
+# extracted in a single walk over the screen rows.
+# ---------------------------------------------------------------------------
+
+# 우측 스탯 패널 라벨 -> (GameState 필드, 값 정규식)
+# 한 줄에 여러 항목이 있을 수 있어서 (AC + Str 등) ':' 위치 기준으로 훑는다
+_NUM_RE = re.compile(r"\s*(-?\d+)")
+_PAIR_RE = re.compile(r"\s*(-?\d+)/(\d+)")
+_FLOAT_RE = re.compile(r"\s*(\d+(?:\.\d+)?)")
+_PLACE_RE = re.compile(r"\s*([A-Za-z][A-Za-z' ]*?)(?::(\d+))?(?=\s{2,}|\s*$)")
+STAT_FIELDS = {
+    "Health": ("hp", _PAIR_RE),
+    "HP": ("hp", _PAIR_RE),
+    "Magic": ("mp", _PAIR_RE),
+    "MP": ("mp", _PAIR_RE),
+    "AC": ("ac", _NUM_RE),
+    "EV": ("ev", _NUM_RE),
+    "SH": ("sh", _NUM_RE),
+    "Str": ("strength", _NUM_RE),
+    "Int": ("intelligence", _NUM_RE),
+    "Dex": ("dexterity", _NUM_RE),
+    "XL": ("xl", _NUM_RE),
+    "Next": ("xl_next", _NUM_RE),
+    "Place": ("place", _PLACE_RE),
+    "Gold": ("gold", _NUM_RE),
+    "Time": ("time", _FLOAT_RE),
+    "Turn": ("turn", _NUM_RE),
+}
+# 몬스터 목록 한 줄: 같은 글리프 반복 + 이름 (+ 상태)
+# 예: "S   ball python (constriction, asleep)", "ggg 3 goblins"
+MON_PANEL_RE = re.compile(r"^(([A-Za-z&;])\2*)\s+(.+?)(?:\s*\(([^)]*)\))?\s*$")
+NEARBY_RE = re.compile(r"_?\s*(?:a|an)\s+(.+?)\s+is nearby!", re.IGNORECASE)
+
+_LAYOUTS = LayoutCache()
+
+
+def split_rows(text, width: int | None = None) -> list[str]:
+    """
+    ReadConsoleOutputCharacter gives one flat width*height string (no
+    newlines); cut it into rows when the console width is known. A
+    ScreenFrame (core/frame.py) already knows its rows.
+    """
+    if isinstance(text, ScreenFrame):
+        return text.rows()
+    if "\n" in text or not width:
+        return text.splitlines()
+    return [text[i : i + width] for i in range(0, len(text), width)]
+
+
+class GameState:
+    __slots__ = (
+        # stat panel
+        "hp",
+        "hp_max",
+        "mp",
+        "mp_max",
+        "ac",
+        "ev",
+        "sh",
+        "strength",
+        "intelligence",
+        "dexterity",
+        "xl",
+        "xl_next",
+        "place",
+        "depth",
+        "gold",
+        "time",
+        "turn",
+        "status",
+        # monsters: ((glyph, name, status), ...)
+        "monsters",
+        "monster_asleep",
+        "nearby",
+        # messages that appeared since the previous frame (core.messages.Message)
+        "messages",
+        # map viewport (core.map_grid.MapGrid), None without hud / numpy
+        "map",
+        # remembered terrain of this level (core.level_memory.LevelMap)
+        "level",
+        # message / prompt signals
+        "generic_nearby",
+        "melee_contact",
+        "monster_seen",
+        "confirm_y",
+        "shop_like",
+        "more_prompt",
+        "repeat_prompt",
+    )
+
+    def __init__(self):
+        self.hp = self.hp_max = self.mp = self.mp_max = None
+        self.ac = self.ev = self.sh = None
+        self.strength = self.intelligence = self.dexterity = None
+        self.xl = self.xl_next = None
+        self.place = self.depth = None
+        self.gold = self.time = self.turn = None
+        self.status = ()
+        self.monsters = ()
+        self.monster_asleep = False
+        self.nearby = ()
+        self.messages = ()
+        self.map = None
+        self.level = None
+        self.generic_nearby = False
+        self.melee_contact = False
+        self.monster_seen = False
+        self.confirm_y = False
+        self.shop_like = False
+        self.more_prompt = False
+        self.repeat_prompt = False
+
+    @property
+    def hp_ratio(self):
+        if self.hp is None:
+            return None
+        return compute_hp_ratio((self.hp, self.hp_max))
+
+    @property
+    def monsters_present(self) -> bool:
+        return bool(self.monsters) or bool(self.nearby) or self.generic_nearby
+
+    @property
+    def hostile_glyphs(self) -> str:
+        """Map glyphs of the monsters listed in the side panel."""
+        return "".join({glyph[0] for (glyph, _, _) in self.monsters if glyph})
+
+    @property
+    def monster_count(self) -> int:
+        count = len(self.monsters) if self.monsters else len(self.nearby)
+        if count == 0 and self.monsters_present:
+            count = 1
+        return count
+
+    def as_flags(self) -> dict:
+        """Old detect_flags_from_text() dict shape (debug output / callers)."""
+        return {
+            "confirm_y": self.confirm_y,
+            "shop_like": self.shop_like,
+            "monster_seen": self.monster_seen,
+            "monsters_present": self.monsters_present,
+            "monster_count": self.monster_count,
+            "monster_asleep": self.monster_asleep,
+            "melee_contact": self.melee_contact,
+            "monsters_panel": [
+                (name, status) for (_, name, status) in self.monsters[:5]
+            ],
+            "nearby": list(self.nearby[:5]),
+        }
+
+    def __repr__(self):
+        return (
+            f"GameState(hp={self.hp}/{self.hp_max}, mp={self.mp}/{self.mp_max}, "
+            f"xl={self.xl}, place={self.place}:{self.depth}, turn={self.turn}, "
+            f"time={self.time}, monsters={len(self.monsters)}, status={self.status})"
+        )
+
+
+def _scan_stats(out: dict, row: str) -> int:
+    """
+    Collect every "Label: value" on one row into out (GameState field -> value).
+    Returns the column of the first label found, or -1 if none.
+    """
+    first = -1
+    c = row.find(":")
+    while c != -1:
+        k = c
+        while k > 0 and row[k - 1].isalpha():
+            k -= 1
+        entry = STAT_FIELDS.get(row[k:c])
+        if entry is not None:
+            field, value_re = entry
+            m = value_re.match(row, c + 1)
+            if m:
+                if first < 0:
+                    first = k
+                if field == "hp":
+                    out["hp"], out["hp_max"] = int(m.group(1)), int(m.group(2))
+                elif field == "mp":
+                    out["mp"], out["mp_max"] = int(m.group(1)), int(m.group(2))
+                elif field == "place":
+                    out["place"] = m.group(1).strip()
+                    out["depth"] = int(m.group(2)) if m.group(2) else None
+                elif field == "time":
+                    out["time"] = float(m.group(1))
+                else:
+                    out[field] = int(m.group(1))
+                c = m.end() - 1
+        c = row.find(":", c + 1)
+    return first
+
+
+def _parse_stats(rows: list[str], layout: Layout) -> dict:
+    col = layout.panel_col
+    out = {}
+    for i in layout.stats_rows:
+        _scan_stats(out, rows[i][col:])
+    return out
+
+
+def _parse_side(rows: list[str], layout: Layout) -> tuple[tuple, tuple]:
+    """Status lights and monster list below the stats: (status, monsters)."""
+    col = layout.panel_col
+    status = []
+    monsters = []
+    for i in layout.side_rows:
+        part = rows[i][col:].strip()
+        if not part:
+            continue
+        m = MON_PANEL_RE.match(part)
+        if m:
+            glyph = m.group(1)  # g, ggg 같은 것
+            name = m.group(3).strip()  # Robin, hobgoblin, 3 goblins 등
+            mstatus = (m.group(4) or "").strip().lower()
+            monsters.append((glyph, name, mstatus))
+        elif not monsters:
+            status.extend(part.split())
+    return tuple(status), tuple(monsters)
+
+
+def _parse_messages(rows: list[str], row_range: range) -> tuple:
+    """
+    What the message area shows right now (level signals, not events):
+    (nearby, generic_nearby, confirm_y, shop_like, more_prompt, repeat_prompt)
+    """
+    nearby = []
+    low_rows = []
+    for i in row_range:
+        low = rows[i].lower()
+        low_rows.append(low)
+        s = low.strip()
+        # 정확히 "... is nearby!" 형식만 인정
+        if s.endswith("is nearby!") or s.endswith("are nearby!"):
+            m = NEARBY_RE.search(rows[i].strip())
+            if m:
+                nearby.append(m.group(1).strip())
+
+    text = "\n".join(low_rows)
+    return (
+        tuple(nearby),
+        "there are monsters nearby" in text,
+        "(y/n)" in text or ("pick up" in text and "y/n" in text),
+        "welcome to" in text and "shop" in text,
+        "--more--" in text,
+        "number of times to repeat" in text and "command key" in text,
+    )
+
+
+def _build_state(
+    stats: dict,
+    side: tuple,
+    messages: tuple,
+    new_messages: tuple,
+    grid=None,
+    level=None,
+) -> GameState:
+    gs = GameState()
+    for field, value in stats.items():
+        setattr(gs, field, value)
+    gs.status, gs.monsters = side
+    (
+        gs.nearby,
+        gs.generic_nearby,
+        gs.confirm_y,
+        gs.shop_like,
+        gs.more_prompt,
+        gs.repeat_prompt,
+    ) = messages
+    gs.messages = new_messages
+    gs.map = grid
+    gs.level = level
+
+    gs.monster_asleep = any("asleep" in st for (_, _, st) in gs.monsters)
+    # 새 메시지 기준 에지 신호: 근접 전투/포위 (몬스터가 실제로 있을 때만 인정)
+    gs.melee_contact = gs.monsters_present and any(
+        m.kind == "melee_contact" for m in new_messages
+    )
+    # 'comes into view'는 "발견 이벤트"로만(진입 트리거용)
+    gs.monster_seen = any(m.kind == "monster_seen" for m in new_messages)
+    return gs
+
+
+def parse_game_state(text, width: int | None = None) -> GameState:
+    """
+    Cut the frame into rows, look up the cached screen layout and run each
+    region parser on its own slice only (stats / side panel / messages).
+    Stateless (every visible message counts as new); use FrameParser for a
+    stream of consecutive frames.
+    """
+    rows = split_rows(text, width)
+    if not rows:
+        return GameState()
+    width = width or max(len(r) for r in rows)
+    layout = _LAYOUTS.get(rows, width)
+    msg_rows = [rows[i] for i in layout.message_rows]
+    return _build_state(
+        _parse_stats(rows, layout),
+        _parse_side(rows, layout),
+        _parse_messages(rows, layout.message_rows),
+        tuple(MessageStream().feed(msg_rows)),
+        MapGrid.from_rows(rows, layout),
+    )
+
+
+def _touches(changed: list[int], rows: range) -> bool:
+    return any(rows.start <= i < rows.stop for i in changed)
+
+
+class FrameParser:
+    """
+    parse_game_state() for consecutive frames of one console.
+
+    Keeps hashes of the previous frame per row and region and re-runs only
+    the region parsers whose cells changed; the other regions reuse last
+    frame's result. The map and the right-hand panel share the top rows, so
+    there each row is hashed twice: its map columns and its panel columns
+    (an HP tick does not rebuild the map, a step does not reparse stats).
+    A layout (console size) change forces a full reparse. New messages are
+    tracked across frames by a MessageStream, so message events are edges.
+    """
+
+    def __init__(self):
+        self._layouts = LayoutCache()
+        self._layout = None
+        self._hashes: list[int] = []  # panel columns / whole message rows
+        self._map_hashes: list[int] = []  # map columns of the top rows
+        self._stats: dict = {}
+        self._side: tuple = ((), ())
+        self._messages: tuple = ()
+        self._map = None
+        # per-level map memory, kept across frames (and reset())
+        self.memory = LevelMemory()
+        self._stream = MessageStream()
+        # 마지막 parse()에서 다시 파싱한 영역 이름 (디버그/벤치용)
+        self.reparsed: tuple[str, ...] = ()
+
+    def reset(self) -> None:
+        self._layout = None
+        self._hashes = []
+        self._map_hashes = []
+        self._stream.reset()
+
+    def parse(self, text, width: int | None = None) -> GameState:
+        """text: flat/newline str or ScreenFrame."""
+        rows = split_rows(text, width)
+        if not rows:
+            self.reset()
+            return GameState()
+        width = width or max(len(r) for r in rows)
+        layout = self._layouts.get(rows, width)
+        c0, c1 = layout.map_cols
+        col = layout.panel_col
+        top = rows[: layout.view_rows]
+        map_hashes = [hash(r[c0:c1]) for r in top]
+        hashes = [hash(r[col:]) for r in top]
+        hashes += [hash(r) for r in rows[layout.view_rows :]]
+
+        if layout != self._layout or len(hashes) != len(self._hashes):
+            full = True
+            changed = []
+            map_changed = True
+        else:
+            full = False
+            changed = [
+                i for i, (a, b) in enumerate(zip(hashes, self._hashes)) if a != b
+            ]
+            map_changed = map_hashes != self._map_hashes
+
+        reparsed = []
+        if full or _touches(changed, layout.stats_rows):
+            self._stats = _parse_stats(rows, layout)
+            reparsed.append("stats")
+        if full or _touches(changed, layout.side_rows):
+            self._side = _parse_side(rows, layout)
+            reparsed.append("side")
+        new_messages = ()
+        if full or _touches(changed, layout.message_rows):
+            self._messages = _parse_messages(rows, layout.message_rows)
+            # hud가 없는 화면(메뉴 등)은 메시지 창이 아니므로 스트림에 넣지 않음
+            if layout.found:
+                new_messages = tuple(
+                    self._stream.feed(rows[i] for i in layout.message_rows)
+                )
+            reparsed.append("messages")
+        if map_changed:
+            self._map = MapGrid.from_rows(rows, layout)
+            stats = self._stats
+            self.memory.update(
+                stats.get("place"),
+                stats.get("depth"),
+                self._map,
+                stats.get("turn") or stats.get("time"),
+            )
+            reparsed.append("map")
+
+        self._layout = layout
+        self._hashes = hashes
+        self._map_hashes = map_hashes
+        self.reparsed = tuple(reparsed)
+        return _build_state(
+            self._stats,
+            self._side,
+            self._messages,
+            new_messages,
+            self._map,
+            self.memory.current,
+        )
@@ -0,0 +1,309 @@
+# core/telemetry.py
+# Structured, asynchronous logging for controller / reader / input workers.
+#
+#   telemetry.setup(OUT_DIR, "controller")       (once per process)
+#   log = telemetry.get("controller")
+#   log.info("[PLAN] queued MOVE {}", key)        (str.format style, like the
+#   log.debug("HP%: {:.1f}%", ratio * 100)         controller's step() notes)
+#
+# Callers never format or do I/O:
+#   - records below the level are dropped before anything is built;
+#   - the same line (fmt and args) seen more than RATE_BURST times in
+#     RATE_WINDOW_SEC is counted instead of logged (one "repeated N times"
+#     record follows); the same fmt with other args is a different line.
+#     Lines with unhashable args (lists) are never limited: pass tuples;
+#   - the rest is one deque.append of (t, level, logger, fmt, args, fields)
+#     onto a bounded ring. If the writer falls behind, the oldest records are
+#     overwritten and counted as dropped.
+# A background thread drains the ring every FLUSH_SEC, formats the batch,
+# appends it as JSON lines to run_logs/<process>.log (one write + flush per
+# batch), mirrors CONSOLE_LEVEL+ to stdout, and rotates the file to
+# <process>.log.1.gz ... .<BACKUPS>.gz once it grows past MAX_BYTES.
+#
+# args are formatted on the writer thread: pass values, not objects that
+# change afterwards.
+from __future__ import annotations
+
+import atexit
+import gzip
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+OFF = 100
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+_BY_NAME = {"DEBUG": DEBUG, "INFO": INFO, "WARNING": WARNING, "ERROR": ERROR}
+_BY_NAME["OFF"] = OFF
+
+
+def parse_level(value: str | None, default: int) -> int:
+    if not value:
+        return default
+    value = value.strip().upper()
+    if value.isdigit():
+        return int(value)
+    return _BY_NAME.get(value, default)
+
+
+# file / console thresholds (DCSS_LOG_CONSOLE=off silences stdout)
+LEVEL = parse_level(os.environ.get("DCSS_LOG_LEVEL"), INFO)
+CONSOLE_LEVEL = parse_level(os.environ.get("DCSS_LOG_CONSOLE"), INFO)
+
+RING_SIZE = 8192
+FLUSH_SEC = 0.2
+RATE_WINDOW_SEC = 10.0
+RATE_BURST = 5
+_MAX_TRACKED = 4096
+MAX_BYTES = int(os.environ.get("DCSS_LOG_MAX_BYTES", str(8 * 1024 * 1024)))
+BACKUPS = 5
+
+
+class _State:
+    __slots__ = (
+        "level",
+        "console_level",
+        "process",
+        "path",
+        "ring",
+        "dropped",
+        "repeats",
+        "writer",
+    )
+
+    def __init__(self):
+        self.level = min(LEVEL, CONSOLE_LEVEL)
+        self.console_level = CONSOLE_LEVEL
+        self.process = None
+        self.path = None
+        self.ring = deque(maxlen=RING_SIZE)
+        self.dropped = 0
+        # (fmt, args) -> [window start, count in window, fmt, args]
+        self.repeats: dict[tuple, list] = {}
+        self.writer = None
+
+
+_st = _State()
+
+
+class Logger:
+    """Cheap handle; all state lives in the module (one writer per process)."""
+
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def enabled(self, level: int) -> bool:
+        return level >= _st.level
+
+    def log(self, level: int, fmt: str, *args, **fields) -> None:
+        st = _st
+        if level < st.level:
+            return
+        now = time.time()
+        key = (fmt, args)
+        try:
+            rep = st.repeats.get(key)
+        except TypeError:
+            # unhashable args (lists, dicts): logged as they come rather than
+            # formatted here to get a key; pass tuples to have them limited
+            self._push(now, level, fmt, args, fields)
+            return
+        if rep is None:
+            if len(st.repeats) >= _MAX_TRACKED:
+                # f-strings / ever-changing values: every message is new
+                _flush_repeats()
+            st.repeats[key] = [now, 1, fmt, args]
+        elif now - rep[0] >= RATE_WINDOW_SEC:
+            if rep[1] > RATE_BURST:
+                self._push(now, level, *_repeated(fmt, args, rep[1]))
+            rep[0] = now
+            rep[1] = 1
+        else:
+            rep[1] += 1
+            if rep[1] > RATE_BURST:
+                return
+        self._push(now, level, fmt, args, fields)
+
+    def _push(self, now, level, fmt, args, fields) -> None:
+        ring = _st.ring
+        if len(ring) == RING_SIZE:
+            _st.dropped += 1
+        ring.append((now, level, self.name, fmt, args, fields))
+
+    def debug(self, fmt: str, *args, **fields) -> None:
+        if DEBUG >= _st.level:
+            self.log(DEBUG, fmt, *args, **fields)
+
+    def info(self, fmt: str, *args, **fields) -> None:
+        if INFO >= _st.level:
+            self.log(INFO, fmt, *args, **fields)
+
+    def warning(self, fmt: str, *args, **fields) -> None:
+        self.log(WARNING, fmt, *args, **fields)
+
+    def error(self, fmt: str, *args, **fields) -> None:
+        self.log(ERROR, fmt, *args, **fields)
+
+    def exception(self, fmt: str, *args, **fields) -> None:
+        """error() + the current traceback (formatted here: rare path)."""
+        self.log(ERROR, fmt, *args, exc=traceback.format_exc(), **fields)
+
+
+_loggers: dict[str, Logger] = {}
+
+
+def get(name: str) -> Logger:
+    lg = _loggers.get(name)
+    if lg is None:
+        lg = _loggers[name] = Logger(name)
+    return lg
+
+
+def render(fmt: str, args: tuple) -> str:
+    if not args:
+        return fmt
+    try:
+        return fmt.format(*args)
+    except Exception:
+        return f"{fmt} {args!r}"
+
+
+class _Writer(threading.Thread):
+    def __init__(self, path: str, process: str, console: bool):
+        super().__init__(name=f"telemetry-{process}", daemon=True)
+        self.path = path
+        self.process = process
+        self.console = console
+        self.stop_event = threading.Event()
+        self.f = None
+        self.size = 0
+        self.dropped_seen = 0
+
+    def _open(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.f = open(self.path, "a", encoding="utf-8")
+        self.size = self.f.tell()
+
+    def _rotate(self) -> None:
+        self.f.close()
+        for i in range(BACKUPS - 1, 0, -1):
+            src = f"{self.path}.{i}.gz"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}.gz")
+        with open(self.path, "rb") as src, gzip.open(f"{self.path}.1.gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(self.path)
+        self._open()
+
+    def _drain(self) -> None:
+        ring = _st.ring
+        lines = []
+        console = []
+        while True:
+            try:
+                t, level, name, fmt, args, fields = ring.popleft()
+            except IndexError:
+                break
+            msg = render(fmt, args)
+            rec = {
+                "t": round(t, 6),
+                "level": LEVEL_NAMES.get(level, level),
+                "proc": self.process,
+                "logger": name,
+                "msg": msg,
+            }
+            if fields:
+                rec.update(fields)
+            if level >= LEVEL:
+                lines.append(json.dumps(rec, ensure_ascii=False, default=str))
+            if self.console and level >= _st.console_level:
+                console.append(msg)
+
+        dropped = _st.dropped
+        if dropped != self.dropped_seen:
+            rec = {
+                "t": round(time.time(), 6),
+                "level": "WARNING",
+                "proc": self.process,
+                "logger": "telemetry",
+                "msg": f"ring full: dropped {dropped - self.dropped_seen} records",
+            }
+            self.dropped_seen = dropped
+            lines.append(json.dumps(rec))
+
+        if lines:
+            data = "\n".join(lines) + "\n"
+            self.f.write(data)
+            self.f.flush()
+            self.size += len(data)
+            if self.size >= MAX_BYTES:
+                self._rotate()
+        if console:
+            try:
+                sys.stdout.write("\n".join(console) + "\n")
+                sys.stdout.flush()
+            except (OSError, ValueError):
+                pass
+
+    def run(self) -> None:
+        while not self.stop_event.wait(FLUSH_SEC):
+            try:
+                self._drain()
+            except Exception:
+                # never take the process down because of a log line
+                traceback.print_exc()
+
+    def close(self) -> None:
+        self.stop_event.set()
+        self.join(timeout=2.0)
+        _flush_repeats()
+        self._drain()
+        self.f.close()
+
+
+def _repeated(fmt: str, args: tuple, n: int) -> tuple:
+    """(fmt, args, fields) of the summary for a line logged n times."""
+    return "{} (repeated {} more times)", (render(fmt, args), n - RATE_BURST), None
+
+
+def _flush_repeats() -> None:
+    now = time.time()
+    for _, n, fmt, args in _st.repeats.values():
+        if n > RATE_BURST:
+            get("telemetry")._push(now, INFO, *_repeated(fmt, args, n))
+    _st.repeats.clear()
+
+
+def setup(out_dir: str, process: str, console_level: int | None = None) -> None:
+    """
+    Start the writer for this process (run_logs/<process>.log). Idempotent.
+    console_level=OFF keeps stdout quiet (reader_worker: attached console).
+    """
+    if _st.writer is not None:
+        return
+    if console_level is not None:
+        _st.console_level = console_level
+    _st.level = min(LEVEL, _st.console_level)
+    _st.process = process
+    _st.path = os.path.join(out_dir, f"{process}.log")
+    w = _Writer(_st.path, process, _st.console_level < OFF)
+    w._open()
+    _st.writer = w
+    w.start()
+    atexit.register(shutdown)
+
+
+def shutdown() -> None:
+    """Flush everything still in the ring and stop the writer."""
+    w = _st.writer
+    if w is None:
+        return
+    _st.writer = None
+    w.close()
@@ -0,0 +1,170 @@
+# core/trace.py
+# Hot-path timing hooks + HDR-style latency histograms.
+#
+# Off unless DCSS_TRACE=1. When off, start() returns 0 and stop()/record()
+# return immediately, so the hooks cost one call each.
+#
+#   t0 = trace.start()
+#   ... stage ...
+#   trace.stop("parse", t0)
+#
+#   trace.record("frame_to_key", ns)     (a latency measured some other way)
+#   trace.maybe_dump(path)               (call from the loop; writes JSON
+#                                         every DUMP_INTERVAL_SEC)
+#
+# Each process keeps its own histograms and dumps them to
+# run_logs/trace_<process>.json (reader / controller / input).
+from __future__ import annotations
+
+import json
+import os
+import time
+
+ENABLED = os.environ.get("DCSS_TRACE", "0") not in ("", "0")
+DUMP_INTERVAL_SEC = float(os.environ.get("DCSS_TRACE_DUMP_SEC", "10"))
+
+# 2^SUB_BITS buckets per power of two -> ~3% relative error
+SUB_BITS = 5
+_SUB = 1 << SUB_BITS
+_MAX_EXP = 42  # values up to 2^48 ns (~3 days)
+_NBUCKETS = (_MAX_EXP + 2) * _SUB
+
+
+class Histogram:
+    """
+    Log-linear (HDR-style) histogram of non-negative integers (ns).
+    Values below 2^SUB_BITS are exact; above, each power of two is split
+    into 2^SUB_BITS equal buckets. Fixed memory, O(1) record.
+    """
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * _NBUCKETS
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    @staticmethod
+    def _index(v: int) -> int:
+        if v < _SUB:
+            return v
+        shift = v.bit_length() - SUB_BITS - 1
+        if shift > _MAX_EXP:
+            return _NBUCKETS - 1
+        return (shift + 1) * _SUB + (v >> shift) - _SUB
+
+    @staticmethod
+    def _lower(i: int) -> int:
+        group, sub = divmod(i, _SUB)
+        if group == 0:
+            return sub
+        return (sub + _SUB) << (group - 1)
+
+    def record(self, v: int) -> None:
+        if v < 0:
+            v = 0
+        self.counts[self._index(v)] += 1
+        self.count += 1
+        self.total += v
+        if self.min is None or v < self.min:
+            self.min = v
+        if v > self.max:
+            self.max = v
+
+    def percentile(self, p: float) -> int:
+        if not self.count:
+            return 0
+        target = max(1, int(self.count * p / 100.0 + 0.5))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c:
+                seen += c
+                if seen >= target:
+                    # upper edge of the bucket, capped by the real max
+                    return min(self._lower(i + 1) - 1, self.max)
+        return self.max
+
+    def merge(self, other: "Histogram") -> None:
+        for i, c in enumerate(other.counts):
+            if c:
+                self.counts[i] += c
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+
+    def summary(self) -> dict:
+        """Microseconds."""
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count / 1000.0,
+            "min_us": self.min / 1000.0,
+            "p50_us": self.percentile(50) / 1000.0,
+            "p90_us": self.percentile(90) / 1000.0,
+            "p99_us": self.percentile(99) / 1000.0,
+            "p999_us": self.percentile(99.9) / 1000.0,
+            "max_us": self.max / 1000.0,
+        }
+
+
+_hists: dict[str, Histogram] = {}
+_last_dump = time.monotonic()
+
+
+def start() -> int:
+    return time.perf_counter_ns() if ENABLED else 0
+
+
+def stop(stage: str, t0: int) -> None:
+    if t0:
+        record(stage, time.perf_counter_ns() - t0)
+
+
+def record(stage: str, ns: int) -> None:
+    if not ENABLED:
+        return
+    h = _hists.get(stage)
+    if h is None:
+        h = _hists[stage] = Histogram()
+    h.record(int(ns))
+
+
+def histograms() -> dict[str, Histogram]:
+    return _hists
+
+
+def summary() -> dict:
+    return {stage: h.summary() for stage, h in sorted(_hists.items())}
+
+
+def dump(path: str) -> None:
+    """Write summary() as JSON (atomically: readers never see half a file)."""
+    if not ENABLED:
+        return
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(
+            {"pid": os.getpid(), "time": time.time(), "stages": summary()},
+            f,
+            indent=2,
+        )
+    os.replace(tmp, path)
+
+
+def maybe_dump(path: str) -> None:
+    global _last_dump
+    if not ENABLED:
+        return
+    now = time.monotonic()
+    if now - _last_dump >= DUMP_INTERVAL_SEC:
+        _last_dump = now
+        dump(path)
+
+
+def reset() -> None:
+    _hists.clear()
@@ -0,0 +1,358 @@
+# core/vt.py
+# Minimal in-process VT100/xterm emulator: enough of the escape sequences a
+# curses program (crawl console, ncurses) emits to keep a character grid and
+# an attribute grid of what the terminal would show.
+from __future__ import annotations
+
+import codecs
+from array import array
+
+from core.frame import ScreenFrame
+
+DEFAULT_FG = 7
+DEFAULT_BG = 0
+DEFAULT_ATTR = DEFAULT_FG | (DEFAULT_BG << 8)
+
+# DEC special graphics (ESC ( 0) used by curses for box drawing
+_DEC_GRAPHICS = {
+    "j": "┘",
+    "k": "┐",
+    "l": "┌",
+    "m": "└",
+    "n": "┼",
+    "q": "─",
+    "t": "├",
+    "u": "┤",
+    "v": "┴",
+    "w": "┬",
+    "x": "│",
+    "a": "▒",
+    "`": "◆",
+    "~": "·",
+    "0": "█",
+}
+
+
+def make_attr(fg: int, bg: int) -> int:
+    """attr = fg | bg << 8 (colour indexes 0-255)."""
+    return (fg & 0xFF) | ((bg & 0xFF) << 8)
+
+
+class Terminal:
+    def __init__(self, cols: int = 80, rows: int = 24):
+        self.cols = cols
+        self.rows = rows
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.reset()
+
+    # ---- state ----
+    def reset(self) -> None:
+        self.chars = [[" "] * self.cols for _ in range(self.rows)]
+        # rows of array('H'): ScreenFrame attrs are just these concatenated
+        self.attrs = [array("H", [DEFAULT_ATTR]) * self.cols for _ in range(self.rows)]
+        self.x = 0
+        self.y = 0
+        self._saved = (0, 0)
+        self._top = 0
+        self._bottom = self.rows - 1
+        self._fg = DEFAULT_FG
+        self._bg = DEFAULT_BG
+        self._bold = False
+        self._reverse = False
+        self._graphics = False  # G0 = DEC special graphics
+        self._wrap_pending = False
+        self._state = "text"
+        self._buf = ""
+
+    def resize(self, cols: int, rows: int) -> None:
+        self.cols, self.rows = cols, rows
+        self.reset()
+
+    # ---- output ----
+    def text(self) -> str:
+        """Flat rows*cols string (same shape as ReadConsoleOutputCharacter)."""
+        return "".join("".join(r) for r in self.chars)
+
+    def frame(self) -> ScreenFrame:
+        """Current screen + colours as a ScreenFrame (core/frame.py)."""
+        return ScreenFrame.from_grid(self.chars, self.attrs)
+
+    def lines(self) -> list[str]:
+        return ["".join(r) for r in self.chars]
+
+    # ---- input ----
+    def feed(self, data: bytes | str) -> None:
+        if isinstance(data, bytes):
+            data = self._decoder.decode(data)
+        for ch in data:
+            state = self._state
+            if state == "text":
+                self._text(ch)
+            elif state == "esc":
+                self._esc(ch)
+            elif state == "csi":
+                self._csi(ch)
+            elif state == "osc":
+                if ch == "\x07":
+                    self._state = "text"
+                elif ch == "\x1b":
+                    self._state = "osc_esc"
+            elif state == "osc_esc":
+                self._state = "text" if ch == "\\" else "osc"
+            elif state == "charset":
+                self._graphics = ch == "0"
+                self._state = "text"
+            elif state == "charset1":
+                # G1 designation: ignored (no SO/SI support)
+                self._state = "text"
+
+    def _text(self, ch: str) -> None:
+        if ch == "\x1b":
+            self._state = "esc"
+        elif ch == "\r":
+            self.x = 0
+            self._wrap_pending = False
+        elif ch in "\n\x0b\x0c":
+            self._index()
+        elif ch == "\x08":
+            self.x = max(0, self.x - 1)
+            self._wrap_pending = False
+        elif ch == "\t":
+            self.x = min(self.cols - 1, (self.x // 8 + 1) * 8)
+        elif ch < " " or ch == "\x7f":
+            pass  # BEL, SO/SI, ...
+        else:
+            self._put(ch)
+
+    def _put(self, ch: str) -> None:
+        if self._wrap_pending:
+            self.x = 0
+            self._index()
+            self._wrap_pending = False
+        if self._graphics:
+            ch = _DEC_GRAPHICS.get(ch, ch)
+        fg, bg = self._fg, self._bg
+        if self._bold and fg < 8:
+            fg += 8
+        if self._reverse:
+            fg, bg = bg, fg
+        self.chars[self.y][self.x] = ch
+        self.attrs[self.y][self.x] = make_attr(fg, bg)
+        if self.x == self.cols - 1:
+            self._wrap_pending = True
+        else:
+            self.x += 1
+
+    def _index(self) -> None:
+        if self.y == self._bottom:
+            self._scroll_up(1)
+        elif self.y < self.rows - 1:
+            self.y += 1
+
+    def _reverse_index(self) -> None:
+        if self.y == self._top:
+            self._scroll_down(1)
+        elif self.y > 0:
+            self.y -= 1
+
+    def _blank_row(self):
+        return [" "] * self.cols, array(
+            "H", [make_attr(self._fg, self._bg)]
+        ) * self.cols
+
+    def _scroll_up(self, n: int, top: int | None = None) -> None:
+        top = self._top if top is None else top
+        for _ in range(n):
+            del self.chars[top]
+            del self.attrs[top]
+            c, a = self._blank_row()
+            self.chars.insert(self._bottom, c)
+            self.attrs.insert(self._bottom, a)
+
+    def _scroll_down(self, n: int, top: int | None = None) -> None:
+        top = self._top if top is None else top
+        for _ in range(n):
+            del self.chars[self._bottom]
+            del self.attrs[self._bottom]
+            c, a = self._blank_row()
+            self.chars.insert(top, c)
+            self.attrs.insert(top, a)
+
+    def _esc(self, ch: str) -> None:
+        self._state = "text"
+        if ch == "[":
+            self._state = "csi"
+            self._buf = ""
+        elif ch == "]":
+            self._state = "osc"
+        elif ch == "(":
+            self._state = "charset"
+        elif ch in ")*+":
+            self._state = "charset1"
+        elif ch == "7":
+            self._saved = (self.x, self.y)
+        elif ch == "8":
+            self.x, self.y = self._saved
+        elif ch == "D":
+            self._index()
+        elif ch == "E":
+            self.x = 0
+            self._index()
+        elif ch == "M":
+            self._reverse_index()
+        elif ch == "c":
+            self.reset()
+
+    def _csi(self, ch: str) -> None:
+        if " " <= ch <= "?":
+            # parameter bytes (0-9 ; ? > ...) and intermediates (space $ ...)
+            self._buf += ch
+            return
+        self._state = "text"
+        self._wrap_pending = False
+        buf = self._buf
+        if any(c < "0" for c in buf):
+            return  # sequences with intermediates (DECSCUSR, ...) don't draw
+        private = buf[:1] in ("?", ">", "=", "<")
+        if private:
+            buf = buf[1:]
+        try:
+            params = [int(p) if p else 0 for p in buf.split(";")] if buf else []
+        except ValueError:
+            return
+
+        def arg(i: int = 0, default: int = 1) -> int:
+            v = params[i] if i < len(params) else 0
+            return v if v else default
+
+        if private:
+            # ?1049h / ?47h alt screen, ?25l cursor, ... -> only clearing matters
+            if ch in "hl" and any(p in (47, 1047, 1049) for p in params):
+                self._erase_display(2)
+            return
+
+        if ch in "Hf":
+            self.y = min(self.rows - 1, arg(0) - 1)
+            self.x = min(self.cols - 1, arg(1) - 1)
+        elif ch == "A":
+            self.y = max(0, self.y - arg())
+        elif ch in "Be":
+            self.y = min(self.rows - 1, self.y + arg())
+        elif ch in "Ca":
+            self.x = min(self.cols - 1, self.x + arg())
+        elif ch == "D":
+            self.x = max(0, self.x - arg())
+        elif ch == "E":
+            self.x = 0
+            self.y = min(self.rows - 1, self.y + arg())
+        elif ch == "F":
+            self.x = 0
+            self.y = max(0, self.y - arg())
+        elif ch in "G`":
+            self.x = min(self.cols - 1, arg() - 1)
+        elif ch == "d":
+            self.y = min(self.rows - 1, arg() - 1)
+        elif ch == "J":
+            self._erase_display(arg(0, 0))
+        elif ch == "K":
+            self._erase_line(arg(0, 0))
+        elif ch == "X":
+            n = arg()
+            c, a = self._blank_row()
+            self.chars[self.y][self.x : self.x + n] = c[: min(n, self.cols - self.x)]
+            self.attrs[self.y][self.x : self.x + n] = a[: min(n, self.cols - self.x)]
+        elif ch == "@":
+            n = min(arg(), self.cols - self.x)
+            c, a = self._blank_row()
+            row, arow = self.chars[self.y], self.attrs[self.y]
+            row[self.x : self.x] = c[:n]
+            arow[self.x : self.x] = a[:n]
+            del row[self.cols :], arow[self.cols :]
+        elif ch == "P":
+            n = min(arg(), self.cols - self.x)
+            c, a = self._blank_row()
+            row, arow = self.chars[self.y], self.attrs[self.y]
+            del row[self.x : self.x + n], arow[self.x : self.x + n]
+            row.extend(c[:n])
+            arow.extend(a[:n])
+        elif ch == "L":
+            if self._top <= self.y <= self._bottom:
+                self._scroll_down(min(arg(), self._bottom - self.y + 1), top=self.y)
+        elif ch == "M":
+            if self._top <= self.y <= self._bottom:
+                self._scroll_up(min(arg(), self._bottom - self.y + 1), top=self.y)
+        elif ch == "S":
+            self._scroll_up(arg())
+        elif ch == "T":
+            self._scroll_down(arg())
+        elif ch == "r":
+            top, bottom = arg(0) - 1, arg(1, self.rows) - 1
+            if 0 <= top < bottom < self.rows:
+                self._top, self._bottom = top, bottom
+                self.x = self.y = 0
+        elif ch == "m":
+            self._sgr(params or [0])
+        elif ch == "s":
+            self._saved = (self.x, self.y)
+        elif ch == "u":
+            self.x, self.y = self._saved
+
+    def _erase_display(self, mode: int) -> None:
+        if mode == 0:
+            self._erase_line(0)
+            rows = range(self.y + 1, self.rows)
+        elif mode == 1:
+            self._erase_line(1)
+            rows = range(0, self.y)
+        else:
+            rows = range(self.rows)
+        for r in rows:
+            self.chars[r], self.attrs[r] = self._blank_row()
+
+    def _erase_line(self, mode: int) -> None:
+        c, a = self._blank_row()
+        if mode == 0:
+            lo, hi = self.x, self.cols
+        elif mode == 1:
+            lo, hi = 0, self.x + 1
+        else:
+            lo, hi = 0, self.cols
+        self.chars[self.y][lo:hi] = c[lo:hi]
+        self.attrs[self.y][lo:hi] = a[lo:hi]
+
+    def _sgr(self, params: list[int]) -> None:
+        i = 0
+        while i < len(params):
+            p = params[i]
+            if p == 0:
+                self._fg, self._bg = DEFAULT_FG, DEFAULT_BG
+                self._bold = self._reverse = False
+            elif p == 1:
+                self._bold = True
+            elif p == 22:
+                self._bold = False
+            elif p == 7:
+                self._reverse = True
+            elif p == 27:
+                self._reverse = False
+            elif 30 <= p <= 37:
+                self._fg = p - 30
+            elif p == 39:
+                self._fg = DEFAULT_FG
+            elif 40 <= p <= 47:
+                self._bg = p - 40
+            elif p == 49:
+                self._bg = DEFAULT_BG
+            elif 90 <= p <= 97:
+                self._fg = p - 90 + 8
+            elif 100 <= p <= 107:
+                self._bg = p - 100 + 8
+            elif p in (38, 48) and i + 2 < len(params) and params[i + 1] == 5:
+                if p == 38:
+                    self._fg = params[i + 2]
+                else:
+                    self._bg = params[i + 2]
+                i += 2
+            elif p in (38, 48) and i + 4 < len(params) and params[i + 1] == 2:
+                i += 4  # truecolor: not representable, keep current colour
+            i += 1
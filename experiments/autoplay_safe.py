@@ -1,12 +1,16 @@
 import time
 import hashlib
 import os
+import sys
 from datetime import datetime
 
 import pyautogui                 # 스크린샷/픽셀검사용
 import pydirectinput as pdi      # 키입력용(DCSS에 잘 먹음)
 import pygetwindow as gw         # 창 찾기(activate는 안 씀)
-from openai import OpenAI        # LLM 호출
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.llm_client import LLMClient  # LLM 호출 (풀링, 비동기)
+from core.rules import Matcher, Rule, RuleSet  # 기본 결정 (규칙)
 
 # ===== 기본 설정 =====
 STUCK_SECONDS = 4
@@ -18,6 +22,27 @@ LLM_ENABLED = True
 LLM_MODEL = "gpt-4o-mini"
 LLM_COOLDOWN_SEC = 30
 LLM_MAX_CALLS_PER_RUN = 30
+# LLM은 루프를 막지 않음: 이번 틱은 규칙 결정대로 행동하고, 답이 이 시간
+# 안에 오면 다음 틱에서 그 답을 씀 (늦은 답/실패는 버리고 규칙 결정 유지)
+LLM_ADVICE_TTL_SEC = 3.0
+
+# 규칙 기반 결정 (core/rules.py). LLM이 없거나 답이 늦으면 이대로 행동
+POLICY = RuleSet(
+    [
+        Rule("low_hp_rest", {"hp_low": True}, ("rest",), priority=20),
+        Rule("enemy_fight", {"enemy": True}, ("fight",), priority=10),
+        Rule("explore", {}, ("explore",)),
+    ]
+)
+policy = Matcher(POLICY)
+
+# 한 번 만들어 계속 재사용 (연결 keep-alive). 동시 요청 1개: 이전 호출이
+# 아직 안 끝났으면 새로 보내지 않음
+llm = LLMClient(
+    model=LLM_MODEL,
+    max_concurrency=1,
+    enabled=LLM_ENABLED and bool(os.environ.get("OPENAI_API_KEY")),
+)
 
 os.makedirs(LOG_DIR, exist_ok=True)
 
@@ -106,16 +131,26 @@ def hp_likely_low():
     return ratio < 0.002
 
 
-def llm_decide_low_hp(enemy_now: bool):
-    """
-    HP 위험할 때만 LLM 호출. 출력은 rest/fight/explore 중 하나.
-    """
-    api_key = os.environ.get("OPENAI_API_KEY")
-    if not api_key or not LLM_ENABLED:
+def _parse_choice(text: str):
+    out = text.strip().lower()
+    if "rest" in out:
         return "rest"
+    if "fight" in out:
+        return "fight"
+    return "explore"
+
 
-    client = OpenAI(api_key=api_key)
+def rule_decision(hp_low: bool, enemy: bool) -> str:
+    """rest / fight / explore from POLICY."""
+    policy.update({"hp_low": hp_low, "enemy": enemy})
+    return policy.select(time.time()).then[0]
 
+
+def llm_ask_low_hp(enemy_now: bool):
+    """
+    HP 위험할 때만 LLM 호출 (백그라운드). 답은 rest/fight/explore 중 하나,
+    llm.poll()로 다음 틱에 확인. 보내지 못하면(동시 요청 중) None.
+    """
     system = (
         "너는 DCSS 자동플레이 AI의 생존 판단 뇌다.\n"
         "반드시 셋 중 하나만 출력: rest / fight / explore\n"
@@ -130,21 +165,14 @@ def llm_decide_low_hp(enemy_now: bool):
         "셋 중 하나만 답해: rest / fight / explore"
     )
 
-    resp = client.chat.completions.create(
-        model=LLM_MODEL,
-        messages=[
+    return llm.submit(
+        [
             {"role": "system", "content": system},
             {"role": "user", "content": user},
         ],
+        max_tokens=5,
     )
 
-    out = (resp.choices[0].message.content or "").strip().lower()
-    if "rest" in out:
-        return "rest"
-    if "fight" in out:
-        return "fight"
-    return "explore"
-
 
 # ===== 메인 =====
 print("DCSS 창을 찾는 중...")
@@ -170,6 +198,7 @@ recovery_cooldown = 0
 
 llm_last_call = 0.0
 llm_calls = 0
+llm_pending = None  # 답을 기다리는 LLM 요청 (Future)
 
 while True:
     if recovery_cooldown > 0:
@@ -180,43 +209,53 @@ while True:
         continue
 
     # ===== 행동 결정 =====
-    if hp_likely_low():
-        now = time.time()
+    # 규칙 결정이 먼저: LLM 답이 없으면 이대로 행동
+    hp_low = hp_likely_low()
+    enemy = enemy_likely()
+    decision = rule_decision(hp_low, enemy)
+    now = time.time()
+
+    if llm_pending is not None:
+        d = llm.poll(llm_pending, decision, parse=_parse_choice)
+        if d is None and now - llm_last_call > LLM_ADVICE_TTL_SEC:
+            print("LLM 답이 늦음 -> 규칙 결정 유지")
+            llm_pending = None
+        elif d is not None:
+            llm_pending = None
+            if hp_low and d.source == "llm":
+                decision = d.value
+            st = llm.stats()
+            print(
+                f"LLM 결정: {d.value} ({d.source} {d.reason}) -> {decision} "
+                f"(calls={llm_calls}, "
+                f"tokens={st['prompt_tokens']}+{st['completion_tokens']}, "
+                f"${st['cost_usd']:.4f})"
+            )
+    elif hp_low and llm.enabled:
         can_call = (llm_calls < LLM_MAX_CALLS_PER_RUN) and (now - llm_last_call >= LLM_COOLDOWN_SEC)
 
         if can_call:
-            print("HP 위험 감지! LLM 판단 호출")
+            print(f"HP 위험 감지! LLM 판단 요청 (그동안 규칙 결정: {decision})")
             log_event("lowhp")
             focus_dcss(win)
 
-            decision = llm_decide_low_hp(enemy_likely())
+            llm_pending = llm_ask_low_hp(enemy)
             llm_last_call = now
             llm_calls += 1
-            print(f"LLM 결정: {decision} (calls={llm_calls})")
-        else:
-            decision = "rest"
-
-        if decision == "rest":
-             # 메뉴/정보창 떠있을 수 있으니 ESC 한 번 정리
-            pdi.press("esc")
-            time.sleep(0.05)
-
-            # '기다리기(휴식)'을 안전하게 여러 번
-            pdi.press("5", presses=8, interval=0.05)          
-        elif decision == "fight":
-            pdi.press("enter")
-            time.sleep(0.05)
-            pdi.press("tab")
-        else:
-            pdi.press("o")
 
+    if decision == "rest":
+         # 메뉴/정보창 떠있을 수 있으니 ESC 한 번 정리
+        pdi.press("esc")
+        time.sleep(0.05)
+
+        # '기다리기(휴식)'을 안전하게 여러 번
+        pdi.press("5", presses=8, interval=0.05)          
+    elif decision == "fight":
+        pdi.press("enter")
+        time.sleep(0.05)
+        pdi.press("tab")
     else:
-        if enemy_likely():
-            pdi.press("enter")
-            time.sleep(0.05)
-            pdi.press("tab")
-        else:
-            pdi.press("o")
+        pdi.press("o")
 
     time.sleep(LOOP_INTERVAL)
 
@@ -0,0 +1,161 @@
+# experiments/fake_crawl.py
+# Stand-in for crawl console: a small curses program that draws a DCSS-like
+# screen (map, stat panel, monster list, message window) and reacts to the
+# same keys input_worker sends. Lets the pty screen source / input backend
+# run on machines without crawl:
+#
+#   DCSS_SCREEN_SOURCE=pty DCSS_CRAWL_CMD="python experiments/fake_crawl.py" python main.py
+import curses
+import random
+
+MAP = [
+    "#################################",
+    "#...............#...............#",
+    "#...............+...............#",
+    "#...............#...............#",
+    "#######+#########.......>.......#",
+    "#...............#...............#",
+    "#...............#################",
+    "#..<............#",
+    "#################",
+]
+MOVES = {
+    "h": (-1, 0),
+    "l": (1, 0),
+    "k": (0, -1),
+    "j": (0, 1),
+    "y": (-1, -1),
+    "u": (1, -1),
+    "b": (-1, 1),
+    "n": (1, 1),
+}
+PANEL = 37
+VIEW_ROWS = 21
+
+
+class Game:
+    def __init__(self):
+        self.px, self.py = 3, 2
+        self.hp, self.hp_max = 20, 20
+        self.turn = 0
+        self.monster = None  # [x, y, hp]
+        self.messages = ["Welcome, Robin the Minotaur Berserker."]
+        self.more = False
+
+    def walkable(self, x, y):
+        return 0 <= y < len(MAP) and 0 <= x < len(MAP[y]) and MAP[y][x] != "#"
+
+    def say(self, msg):
+        self.messages.append(msg)
+        # 가끔 --more-- 로 멈춤
+        if len(self.messages) % 7 == 0:
+            self.more = True
+
+    def tick(self):
+        self.turn += 1
+        if self.monster is None and random.random() < 0.08:
+            self.monster = [self.px + 4, self.py, 5]
+            if not self.walkable(self.monster[0], self.monster[1]):
+                self.monster = None
+            else:
+                self.say("A goblin comes into view.")
+        elif self.monster is not None:
+            mx, my, _ = self.monster
+            dx = (self.px > mx) - (self.px < mx)
+            dy = (self.py > my) - (self.py < my)
+            if abs(self.px - mx) <= 1 and abs(self.py - my) <= 1:
+                if random.random() < 0.6:
+                    self.hp = max(1, self.hp - random.randint(1, 3))
+                    self.say("The goblin hits you.")
+                else:
+                    self.say("The goblin misses you.")
+            elif self.walkable(mx + dx, my + dy):
+                self.monster[0], self.monster[1] = mx + dx, my + dy
+        elif self.hp < self.hp_max and self.turn % 3 == 0:
+            self.hp += 1
+
+    def key(self, ch):
+        if self.more:
+            if ch in (" ", "\r", "\x1b"):
+                self.more = False
+            return
+        if ch in MOVES:
+            dx, dy = MOVES[ch]
+            if self.walkable(self.px + dx, self.py + dy):
+                self.px += dx
+                self.py += dy
+            self.tick()
+        elif ch == "o":
+            if self.monster is not None:
+                self.say("There are monsters nearby!")
+            else:
+                for _ in range(3):
+                    dx, dy = random.choice(list(MOVES.values()))
+                    if self.walkable(self.px + dx, self.py + dy):
+                        self.px += dx
+                        self.py += dy
+                    self.tick()
+        elif ch in (".", "5"):
+            self.tick()
+        elif ch == "\t":
+            if self.monster is None:
+                self.say("You can't see any susceptible monsters within range!")
+            else:
+                self.monster[2] -= random.randint(1, 4)
+                if self.monster[2] <= 0:
+                    self.say("You kill the goblin!")
+                    self.monster = None
+                else:
+                    self.say("You hit the goblin.")
+                self.tick()
+
+    def draw(self, scr):
+        scr.erase()
+        for y, row in enumerate(MAP):
+            scr.addstr(y, 0, row)
+        if self.monster is not None:
+            scr.addstr(self.monster[1], self.monster[0], "g", curses.color_pair(1))
+        scr.addstr(self.py, self.px, "@")
+
+        hud = [
+            "Robin the Skirmisher",
+            "Minotaur Berserker",
+            f"Health: {self.hp}/{self.hp_max}",
+            "Magic:  0/0",
+            "AC:  3          Str: 21",
+            "EV:  9          Int:  7",
+            "SH:  0          Dex: 11",
+            "XL:  1 Next:  0% Place: Dungeon:1",
+            f"Noise: ---------  Time: {self.turn}.0 (1.0)",
+            "Wp: a - +0 hand axe",
+            "Qv: Nothing quivered",
+        ]
+        for i, line in enumerate(hud):
+            scr.addstr(i, PANEL, line)
+        if self.monster is not None:
+            scr.addstr(len(hud) + 1, PANEL, "g   goblin")
+
+        h, _ = scr.getmaxyx()
+        lines = self.messages[-(h - VIEW_ROWS - 1) :]
+        for i, msg in enumerate(lines):
+            scr.addstr(VIEW_ROWS + i, 0, "_" + msg)
+        if self.more:
+            scr.addstr(h - 1, 0, "--more--")
+        scr.refresh()
+
+
+def main(scr):
+    curses.curs_set(0)
+    curses.start_color()
+    curses.init_pair(1, curses.COLOR_YELLOW, curses.COLOR_BLACK)
+    game = Game()
+    while True:
+        game.draw(scr)
+        ch = scr.get_wch()
+        if ch == "Q":
+            break
+        game.key(ch if isinstance(ch, str) else "")
+
+
+if __name__ == "__main__":
+    curses.wrapper(main)
@@ -0,0 +1,241 @@
+# experiments/mock_llm_server.py
+# Local stand-in for an OpenAI-compatible chat endpoint, to exercise
+# core/llm_client.py without a key or network: keep-alive HTTP/1.1, usage in
+# every reply, and slow / failing answers on demand.
+#
+#   python experiments/mock_llm_server.py --port 8765 --delay 0.3 --fail-rate 0.2
+#   DCSS_LLM_URL=http://127.0.0.1:8765/v1 python ...      (point the client at it)
+#   python experiments/mock_llm_server.py --selftest      (client checks, then exit)
+#
+# A user message containing [slow] waits --slow seconds, [fail] answers 500,
+# [drop] closes the connection without answering. The reply is --answer.
+# --idle-timeout closes keep-alive connections idle that long (stale pooled
+# connections on the client side).
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class MockLLM(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        addr,
+        delay=0.0,
+        slow=2.0,
+        fail_rate=0.0,
+        answer="rest",
+        idle_timeout=None,
+    ):
+        super().__init__(addr, _Handler)
+        self.idle_timeout = idle_timeout
+        self.delay = delay
+        self.slow = slow
+        self.fail_rate = fail_rate
+        self.answer = answer
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+
+    def handle_error(self, request, client_address):
+        # clients hanging up mid-reply (timeouts) are part of the test
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # headers and body are separate writes
+
+    def setup(self):
+        # StreamRequestHandler.setup() applies it to the socket
+        self.timeout = self.server.idle_timeout
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, status: int, obj) -> None:
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        srv = self.server
+        with srv.lock:
+            srv.requests += 1
+        req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        if not self.path.endswith("/chat/completions"):
+            self._send(404, {"error": {"message": f"no route {self.path}"}})
+            return
+        prompt = " ".join(str(m.get("content", "")) for m in req.get("messages", []))
+        wait = srv.delay + (srv.slow if "[slow]" in prompt else 0.0)
+        if wait:
+            time.sleep(wait)
+        if "[drop]" in prompt:
+            self.close_connection = True
+            return
+        if "[fail]" in prompt or random.random() < srv.fail_rate:
+            self._send(500, {"error": {"message": "mock failure"}})
+            return
+        self._send(
+            200,
+            {
+                "id": f"mock-{srv.requests}",
+                "object": "chat.completion",
+                "model": req.get("model", "mock"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": srv.answer},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    # ~4 characters per token, near enough for accounting
+                    "prompt_tokens": max(1, len(prompt) // 4),
+                    "completion_tokens": max(1, len(srv.answer) // 4),
+                    "total_tokens": max(1, len(prompt) // 4)
+                    + max(1, len(srv.answer) // 4),
+                },
+            },
+        )
+
+
+def serve(port: int = 0, **kw) -> MockLLM:
+    """Start a MockLLM on a background thread (port 0: any free port)."""
+    srv = MockLLM(("127.0.0.1", port), **kw)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+def selftest() -> None:
+    from core.llm_client import LLMClient
+
+    srv = serve(slow=1.0)
+
+    def ask(text):
+        return [{"role": "user", "content": text}]
+
+    llm = LLMClient(srv.url, model="mock", api_key="", max_concurrency=2, timeout=3)
+
+    # answers in time, over one reused connection
+    for _ in range(5):
+        d = llm.decide(ask("hp low"), default="explore", deadline=1.0)
+        assert d.source == "llm" and d.value == "rest", d
+    assert srv.connections == 1, srv.connections
+    print("fast: ok", llm.stats())
+
+    # too slow: default at the deadline, the late reply is still accounted
+    t0 = time.monotonic()
+    d = llm.decide(ask("[slow]"), default="explore", deadline=0.1)
+    took = time.monotonic() - t0
+    assert d.value == "explore" and d.reason == "deadline", d
+    assert took < 0.3, took
+    time.sleep(1.2)
+    assert llm.stats()["late"] == 1, llm.stats()
+    print(f"slow: default after {took * 1000:.0f} ms, late reply counted")
+
+    # non-blocking: submit now, poll on later ticks
+    fut = llm.submit(ask("[slow]"))
+    assert llm.poll(fut, "explore") is None
+    time.sleep(1.2)
+    d = llm.poll(fut, "explore")
+    assert d is not None and d.source == "llm", d
+    print("poll: ok")
+
+    # failures: default, and the client keeps working afterwards
+    d = llm.decide(ask("[fail]"), default="explore", deadline=1.0)
+    assert d.value == "explore" and d.reason.startswith("error"), d
+    # dropped after the request arrived: an error, never sent twice
+    before = srv.requests
+    d = llm.decide(ask("[drop]"), default="explore", deadline=1.0)
+    assert d.value == "explore" and d.reason.startswith("error"), d
+    assert srv.requests == before + 1, srv.requests - before
+    d = llm.decide(ask("hp low"), default="explore", deadline=1.0)
+    assert d.source == "llm", d
+    print("fail: ok", llm.stats()["errors"], "errors")
+
+    # concurrency cap: the third request is refused at once
+    busy = [llm.submit(ask("[slow]")) for _ in range(2)]
+    d = llm.decide(ask("hp low"), default="explore", deadline=1.0)
+    assert d.reason == "busy", d
+    for fut in busy:
+        fut.result()
+    print("cap: ok, busy =", llm.stats()["busy"])
+
+    # request timeout: a hung server frees the slot
+    slow = LLMClient(srv.url, model="mock", api_key="", max_concurrency=1, timeout=0.3)
+    d = slow.decide(ask("[slow]"), default="explore", deadline=2.0)
+    assert d.reason.startswith("error"), d
+    slow.close()
+    print("timeout: ok")
+
+    # the server closes idle connections: noticed before reuse, not resent
+    idle = serve(idle_timeout=0.2)
+    c = LLMClient(idle.url, model="mock", api_key="", max_concurrency=1, timeout=3)
+    assert c.decide(ask("hp low"), default="explore", deadline=1.0).source == "llm"
+    time.sleep(0.5)
+    d = c.decide(ask("hp low"), default="explore", deadline=1.0)
+    assert d.source == "llm", d
+    assert idle.requests == 2 and idle.connections == 2, (
+        idle.requests,
+        idle.connections,
+    )
+    c.close()
+    idle.shutdown()
+    print("stale connection: ok")
+
+    print("stats:", llm.stats())
+    llm.close()
+    srv.shutdown()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="mock OpenAI-compatible chat server")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--delay", type=float, default=0.0, help="seconds per reply")
+    ap.add_argument("--slow", type=float, default=2.0, help="extra for [slow]")
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="share of 500s")
+    ap.add_argument("--answer", default="rest")
+    ap.add_argument("--idle-timeout", type=float, default=None)
+    ap.add_argument("--selftest", action="store_true")
+    args = ap.parse_args()
+    if args.selftest:
+        selftest()
+        return
+    srv = MockLLM(
+        ("127.0.0.1", args.port),
+        delay=args.delay,
+        slow=args.slow,
+        fail_rate=args.fail_rate,
+        answer=args.answer,
+        idle_timeout=args.idle_timeout,
+    )
+    print(f"mock LLM on {srv.url}  (Ctrl+C to stop)")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# experiments/pty_capture_demo.py
+# Run a curses program under PtyScreenSource and print what the parser sees.
+#   python experiments/pty_capture_demo.py                 (fake_crawl.py)
+#   python experiments/pty_capture_demo.py crawl           (real crawl)
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.screen_source import PtyScreenSource  # noqa: E402
+from core.state_parser import FrameParser  # noqa: E402
+
+cmd = sys.argv[1:] or [
+    sys.executable,
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_crawl.py"),
+]
+
+src = PtyScreenSource(cmd, 120, 45)
+src.start()
+parser = FrameParser()
+try:
+    frames = 0
+    t0 = time.perf_counter()
+    for key in "..llll..jj" + "." * 10:
+        screen = src.read(timeout=0.5)
+        if screen is None:
+            print("no output")
+            continue
+        frames += 1
+        gs = parser.parse(screen)
+        print(f"frame {frames}: {gs} new={[m.text for m in gs.messages]}")
+        os.write(src.master_fd, key.encode())
+    dt = time.perf_counter() - t0
+    print(f"{frames} frames in {dt:.2f}s")
+    print("\n".join(line.rstrip() for line in src.term.lines()[:24]))
+finally:
+    src.close()
@@ -1,191 +1,89 @@
 # input_worker.py
-# Reads run_logs/queue.txt and sends key input to crawl-console window (Windows).
-# Uses PID-based window lookup + forced foreground to reduce focus failures.
+# Receives commands from the controller over the shared-memory command bus
+# (run_logs/commands.shm, see core/command_bus.py) and delivers them to crawl
+# through an input backend (core/input_backend.py):
+#   win32 (default on Windows): PID-based window lookup + forced foreground,
+#         then keybd_event.
+#   pty   (default elsewhere) : key bytes written into the pty reader_worker
+#         runs crawl under; commands already queued go out in one write.
 
 import os
+import signal
+import sys
 import time
-import win32con
-import win32gui
-import win32api
-import win32process
 
-import psutil
+from core import telemetry, trace
+from core.command_bus import CommandBus
+from core.input_backend import BackendError, PtyInputBackend, Win32InputBackend
 
-OUT_DIR = r"C:\Users\Oh\Desktop\ai_dcss\run_logs"
-QUEUE_PATH = os.path.join(OUT_DIR, "queue.txt")
+OUT_DIR = os.environ.get("DCSS_OUT_DIR", r"C:\Users\Oh\Desktop\ai_dcss\run_logs")
+BUS_PATH = os.path.join(OUT_DIR, "commands.shm")
+PTY_SOCK_PATH = os.path.join(OUT_DIR, "pty.sock")
+TRACE_PATH = os.path.join(OUT_DIR, "trace_input.json")
 
-# process name candidates (adjust if needed)
-PROC_NAMES = ["crawl-console.exe", "crawl.exe"]
+INPUT_BACKEND = os.environ.get(
+    "DCSS_INPUT_BACKEND",
+    os.environ.get("DCSS_SCREEN_SOURCE", "win32" if os.name == "nt" else "pty"),
+)
+# max commands delivered per batch
+BATCH_MAX = 16
 
+log = telemetry.get("input")
 
-def find_crawl_pid() -> int | None:
-    """Find PID of crawl-console process."""
-    for p in psutil.process_iter(["pid", "name"]):
-        try:
-            name = (p.info.get("name") or "").lower()
-            if name in [n.lower() for n in PROC_NAMES]:
-                return int(p.info["pid"])
-        except Exception:
-            continue
-    return None
 
-
-def find_window_by_pid(target_pid: int):
-    """Return first visible top-level hwnd owned by target_pid, else None."""
-    result = {"hwnd": None}
-
-    def enum_handler(hwnd, _):
-        if not win32gui.IsWindowVisible(hwnd):
-            return
-        _, pid = win32process.GetWindowThreadProcessId(hwnd)
-        if pid == target_pid:
-            result["hwnd"] = hwnd
-
-    win32gui.EnumWindows(enum_handler, None)
-    return result["hwnd"]
-
-
-def force_foreground_window(hwnd: int) -> bool:
-    """Best-effort: bring hwnd to foreground even under focus restrictions."""
-    if hwnd is None or not win32gui.IsWindow(hwnd):
-        return False
-
-    try:
-        # Restore if minimized
-        win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
-
-        fg = win32gui.GetForegroundWindow()
-        fg_tid, _ = win32process.GetWindowThreadProcessId(fg) if fg else (0, 0)
-        tgt_tid, _ = win32process.GetWindowThreadProcessId(hwnd)
-
-        # Attach input threads to bypass focus-stealing restrictions
-        if fg_tid and fg_tid != tgt_tid:
-            win32process.AttachThreadInput(fg_tid, tgt_tid, True)
-
-        try:
-            win32gui.SetForegroundWindow(hwnd)
-            win32gui.BringWindowToTop(hwnd)
-            win32gui.SetActiveWindow(hwnd)
-        finally:
-            if fg_tid and fg_tid != tgt_tid:
-                win32process.AttachThreadInput(fg_tid, tgt_tid, False)
-
-        return win32gui.GetForegroundWindow() == hwnd
-    except Exception:
-        return False
-
-
-def focus_crawl_console(crawl_pid: int, retries: int = 10, delay: float = 0.1) -> bool:
-    hwnd = find_window_by_pid(crawl_pid)
-    if not hwnd:
-        return False
-    for _ in range(retries):
-        if force_foreground_window(hwnd):
-            return True
-        time.sleep(delay)
-    return False
-
-
-def press_key(char: str):
-    vk = ord(char.upper())
-    win32api.keybd_event(vk, 0, 0, 0)
-    time.sleep(0.02)
-    win32api.keybd_event(vk, 0, win32con.KEYEVENTF_KEYUP, 0)
-
-
-def press_period():
-    VK_OEM_PERIOD = 0xBE  # '.' key
-    win32api.keybd_event(VK_OEM_PERIOD, 0, 0, 0)
-    time.sleep(0.02)
-    win32api.keybd_event(VK_OEM_PERIOD, 0, win32con.KEYEVENTF_KEYUP, 0)
-
-
-def press_esc():
-    win32api.keybd_event(win32con.VK_ESCAPE, 0, 0, 0)
-    time.sleep(0.02)
-    win32api.keybd_event(win32con.VK_ESCAPE, 0, win32con.KEYEVENTF_KEYUP, 0)
-
-
-def pop_queue():
-    if not os.path.exists(QUEUE_PATH):
-        return None
-    try:
-        with open(QUEUE_PATH, "r", encoding="utf-8", errors="ignore") as f:
-            lines = [ln.strip() for ln in f.readlines()]
-        lines = [ln for ln in lines if ln]
-        if not lines:
-            return None
-
-        cmd = lines[0]
-        rest = lines[1:]
-        with open(QUEUE_PATH, "w", encoding="utf-8") as f:
-            f.write("\n".join(rest))
-        return cmd
-    except Exception:
-        return None
+def make_backend():
+    if INPUT_BACKEND == "pty":
+        return PtyInputBackend(PTY_SOCK_PATH)
+    return Win32InputBackend()
 
 
 if __name__ == "__main__":
     os.makedirs(OUT_DIR, exist_ok=True)
-    print("[input_worker] start")
-
-    crawl_pid = None
-    last_pid_check = 0.0
+    telemetry.setup(OUT_DIR, "input")
+    log.info("[input_worker] start (backend={})", INPUT_BACKEND)
+    bus = CommandBus(BUS_PATH, create=not os.path.exists(BUS_PATH))
+    backend = make_backend()
+    # controller stops us with SIGTERM: unwind so the trace dump still happens
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
 
-    while True:
-        cmd = pop_queue()
-        if not cmd:
-            time.sleep(0.05)
-            continue
-
-        # Refresh PID periodically (process can restart)
-        now = time.time()
-        if (crawl_pid is None) or (now - last_pid_check > 2.0):
-            crawl_pid = find_crawl_pid()
-            last_pid_check = now
-
-        if not crawl_pid:
-            print(f"[input_worker] crawl pid not found for cmd={cmd}")
-            continue
-
-        if not focus_crawl_console(crawl_pid):
-            print(
-                f"[input_worker] failed to focus window for cmd={cmd} pid={crawl_pid}"
-            )
-            continue
-
-        if cmd == "WAIT":
-            press_period()
-            print("[input_worker] sent: . (wait)")
-
-        elif cmd == "AUTOEXPLORE":
-            press_key("o")
-            print("[input_worker] sent: o (autoexplore)")
-
-        elif cmd == "CONFIRM_Y":
-            press_key("y")
-            print("[input_worker] sent: y (confirm)")
-
-        elif cmd == "ESC":
-            press_esc()
-            print("[input_worker] sent: ESC")
-        elif cmd == "ATTACK":
-            # Tab = attack nearest enemy (DCSS 기본)
-            win32api.keybd_event(win32con.VK_TAB, 0, 0, 0)
-            time.sleep(0.02)
-            win32api.keybd_event(win32con.VK_TAB, 0, win32con.KEYEVENTF_KEYUP, 0)
-            print("[input_worker] sent: TAB (attack)")
-        elif cmd == "MORE":
-            win32api.keybd_event(win32con.VK_SPACE, 0, 0, 0)
-            time.sleep(0.02)
-            win32api.keybd_event(win32con.VK_SPACE, 0, win32con.KEYEVENTF_KEYUP, 0)
-            print("[input_worker] sent: SPACE (more)")
-        elif cmd.startswith("MOVE "):
-            parts = cmd.split()
-            if len(parts) == 2 and len(parts[1]) == 1:
-                press_key(parts[1])
-                print(f"[input_worker] sent: {parts[1]} (move)")
-            else:
-                print(f"[input_worker] bad MOVE cmd={cmd}")
-        else:
-            print(f"[input_worker] unknown cmd={cmd}")
+    try:
+        while True:
+            entries = bus.recv_many(timeout=1.0, limit=BATCH_MAX)
+            trace.maybe_dump(TRACE_PATH)
+            if not entries:
+                continue
+            cmds = [cmd for cmd, _, _ in entries]
+            if trace.ENABLED:
+                # capture time of each distinct frame these commands came from
+                frame_ns = {t_ns for _, _, t_ns in entries if t_ns}
+                now_ns = time.time_ns()
+                for t_ns in frame_ns:
+                    trace.record("frame_to_dequeue", now_ns - t_ns)
+            try:
+                t0 = trace.start()
+                sent = backend.send(cmds)
+                trace.stop("key_delivery", t0)
+                if sent and trace.ENABLED:
+                    now_ns = time.time_ns()
+                    for t_ns in frame_ns:
+                        trace.record("frame_to_key", now_ns - t_ns)
+                if sent:
+                    log.info("[input_worker] sent: {}", tuple(cmds))
+            except BackendError as e:
+                # pty gone (game exited / reader restarted), win32 API error:
+                # the batch is lost, the backend reconnects next time
+                log.warning("[input_worker] send failed cmds={}: {}", tuple(cmds), e)
+            except Exception as e:
+                # a bug here must not stop delivery (unacked commands would
+                # block the controller's acked check forever)
+                log.exception(
+                    "[input_worker] send crashed cmds={}: {!r}", tuple(cmds), e
+                )
+            finally:
+                # delivered or given up: frames captured from now on may be
+                # taken as the game's answer (reader_worker stamps ack_seq)
+                bus.ack(len(entries))
+    finally:
+        backend.close()
+        trace.dump(TRACE_PATH)
+        telemetry.shutdown()
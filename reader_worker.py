@@ -1,85 +1,96 @@
 # reader_worker.py
-# Reads crawl-console Win32 CONOUT$ buffer and writes run_logs/console_dump.txt every 1s.
-# This process may not respond to Ctrl+C reliably (AttachConsole), and that's OK.
-# Controller will stop it with taskkill.
+# Captures the crawl screen and publishes it into the shared-memory frame
+# channel (run_logs/frames.shm, see core/frame_channel.py).
+#
+# Screen sources (core/screen_source.py):
+#   win32 (default on Windows): crawl-console CONOUT$ buffer, polled at
+#         DCSS_POLL_MIN (40 Hz) while the screen changes / right after a
+#         command, backing off to DCSS_POLL_MAX (1 s) when idle.
+#         This process may not respond to Ctrl+C reliably (AttachConsole),
+#         and that's OK. Controller will stop it with taskkill.
+#   pty   (default elsewhere) : runs DCSS_CRAWL_CMD under a pty and publishes
+#         a frame on every output burst; no window or focus needed. The pty
+#         master is also served on run_logs/pty.sock for input_worker.
+# Either way a screen identical to the previous one is not republished.
 
 import os
+import shlex
+import signal
+import sys
 import time
-import psutil
-import win32con
-import win32console
-import win32file
 
-OUT_DIR = r"C:\Users\Oh\Desktop\ai_dcss\run_logs"
-DUMP_PATH = os.path.join(OUT_DIR, "console_dump.txt")
-STATUS_PATH = os.path.join(OUT_DIR, "reader_status.log")
+from core import telemetry, trace
+from core.command_bus import CommandBus
+from core.frame_channel import FrameWriter
+from core.input_backend import serve_pty_fd
+from core.screen_source import PtyScreenSource, Win32ConsoleSource
 
+OUT_DIR = os.environ.get("DCSS_OUT_DIR", r"C:\Users\Oh\Desktop\ai_dcss\run_logs")
+FRAMES_PATH = os.path.join(OUT_DIR, "frames.shm")
+BUS_PATH = os.path.join(OUT_DIR, "commands.shm")
+PTY_SOCK_PATH = os.path.join(OUT_DIR, "pty.sock")
+TRACE_PATH = os.path.join(OUT_DIR, "trace_reader.json")
 
-def log(msg: str):
-    os.makedirs(OUT_DIR, exist_ok=True)
-    with open(STATUS_PATH, "a", encoding="utf-8") as f:
-        f.write(msg + "\n")
+SCREEN_SOURCE = os.environ.get(
+    "DCSS_SCREEN_SOURCE", "win32" if os.name == "nt" else "pty"
+)
+CRAWL_CMD = os.environ.get("DCSS_CRAWL_CMD", "crawl")
+WIDTH, HEIGHT = 120, 45
+POLL_MIN = float(os.environ.get("DCSS_POLL_MIN", "0.025"))
+POLL_MAX = float(os.environ.get("DCSS_POLL_MAX", "1.0"))
 
 
-def find_crawl_pid():
-    for proc in psutil.process_iter(["pid", "name"]):
-        name = (proc.info["name"] or "").lower()
-        if "crawl-console" in name:
-            return proc.info["pid"]
-    return None
+# run_logs/reader.log only: with the win32 source this process is attached
+# to crawl's console, so stdout is not ours
+log = telemetry.get("reader")
 
 
-def dump_once(width=120, height=45):
-    pid = find_crawl_pid()
-    if not pid:
-        raise RuntimeError("crawl-console.exe를 찾지 못함")
-
-    try:
-        win32console.FreeConsole()
-    except Exception:
-        pass
-
-    win32console.AttachConsole(pid)
-
-    h = win32file.CreateFile(
-        "CONOUT$",
-        win32con.GENERIC_READ | win32con.GENERIC_WRITE,
-        win32con.FILE_SHARE_READ | win32con.FILE_SHARE_WRITE,
-        None,
-        win32con.OPEN_EXISTING,
-        0,
-        None,
-    )
-
-    sb = win32console.PyConsoleScreenBufferType(h)
-    coord = win32console.PyCOORDType(0, 0)
-    text = sb.ReadConsoleOutputCharacter(width * height, coord)
-
-    try:
-        win32console.FreeConsole()
-    except Exception:
-        pass
-
-    os.makedirs(OUT_DIR, exist_ok=True)
-    with open(DUMP_PATH, "w", encoding="utf-8", errors="replace") as f:
-        f.write(text)
-
-    return text
+def make_source():
+    if SCREEN_SOURCE == "pty":
+        return PtyScreenSource(shlex.split(CRAWL_CMD), WIDTH, HEIGHT)
+    return Win32ConsoleSource(WIDTH, HEIGHT, POLL_MIN, POLL_MAX)
 
 
 if __name__ == "__main__":
-    log("=== reader_worker start ===")
+    telemetry.setup(OUT_DIR, "reader", console_level=telemetry.OFF)
+    log.info("=== reader_worker start (source={}) ===", SCREEN_SOURCE)
+    # controller normally creates the region before starting us
+    frames = FrameWriter(FRAMES_PATH, create=not os.path.exists(FRAMES_PATH))
+    source = make_source()
+    try:
+        # frames carry how many commands were delivered before capture
+        source.ack_probe = CommandBus(BUS_PATH, wait=2.0).acked
+    except (OSError, RuntimeError) as e:
+        log.warning("no command bus, frames not ack-stamped: {!r}", e)
+    source.start()
+    if SCREEN_SOURCE == "pty":
+        # input_worker writes keys into the same pty (PtyInputBackend)
+        serve_pty_fd(PTY_SOCK_PATH, source.master_fd)
+    # controller stops us with SIGTERM: unwind so logs/trace get flushed
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
     # Optional: lightweight heartbeat every 10s (uncomment if you want)
     # last_beat = 0.0
 
-    while True:
-        try:
-            dump_once()
-            # now = time.time()
-            # if now - last_beat >= 10.0:
-            #     log("heartbeat: dumping ok")
-            #     last_beat = now
-            time.sleep(1.0)
-        except Exception as e:
-            log(f"worker ERROR: {repr(e)}")
-            time.sleep(1.0)
+    try:
+        while True:
+            try:
+                screen = source.read(timeout=1.0)
+                if screen is not None:
+                    t0 = trace.start()
+                    frames.publish(screen, source.last_ack)
+                    trace.stop("publish", t0)
+                trace.maybe_dump(TRACE_PATH)
+                # now = time.time()
+                # if now - last_beat >= 10.0:
+                #     log.info("heartbeat: dumping ok")
+                #     last_beat = now
+            except EOFError:
+                log.info("game exited (pty closed)")
+                break
+            except Exception as e:
+                log.exception("worker ERROR: {!r}", e)
+                time.sleep(1.0)
+    finally:
+        source.close()
+        trace.dump(TRACE_PATH)
+        telemetry.shutdown()
@@ -0,0 +1,129 @@
+# replay.py
+# Headless replay of a recorded session (core/recorder.py) through the same
+# decision logic the live loop uses, as fast as the CPU allows.
+#
+#   python replay.py run_logs/recordings/20250101-120000
+#   python replay.py <session> --verbose       (controller logs)
+#
+# Every recorded "decide" event is re-run through controller.step() with its
+# recorded clock (virtual time), queue state and ack flag; the commands it returns are
+# compared with the commands recorded for that decision. Exit code 1 on
+# divergence, so it can gate policy changes.
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from dataclasses import dataclass, field
+
+from core.controller import POLICY, ControllerState, format_note, step
+from core.recorder import Recording
+from core.rules import Matcher
+from core.state_parser import FrameParser
+
+
+@dataclass
+class Mismatch:
+    decision: int
+    frame: int
+    t: float
+    recorded: list[str]
+    replayed: list[str]
+
+
+@dataclass
+class ReplayResult:
+    decisions: int = 0
+    frames: int = 0
+    commands: int = 0
+    elapsed: float = 0.0
+    mismatches: list[Mismatch] = field(default_factory=list)
+
+    @property
+    def rate(self) -> float:
+        return self.decisions / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def recorded_decisions(rec: Recording):
+    """(decide event, [commands recorded for it]) in session order."""
+    decide = None
+    cmds: list[str] = []
+    for ev in rec.events():
+        kind = ev.get("kind")
+        if kind == "decide":
+            if decide is not None:
+                yield decide, cmds
+            decide, cmds = ev, []
+        elif kind == "command" and decide is not None:
+            cmds.append(ev["cmd"])
+    if decide is not None:
+        yield decide, cmds
+
+
+def replay(path: str, log=None) -> ReplayResult:
+    rec = Recording(path)
+    state = ControllerState()
+    matcher = Matcher(POLICY)  # like Controller: one per run
+    notes = [] if log is not None else None
+    parser = FrameParser()
+    result = ReplayResult()
+
+    last_frame = -1
+    t0 = time.perf_counter()
+    try:
+        for i, (ev, recorded) in enumerate(recorded_decisions(rec)):
+            n = ev["frame"]
+            if n < 0 or n >= len(rec):
+                continue
+            frame = rec[n]
+            if n != last_frame:
+                result.frames += 1
+                last_frame = n
+
+            gs = parser.parse(frame.screen)
+            state, cmds = step(
+                state,
+                gs,
+                ev["t"],
+                ev.get("queue_empty", True),
+                notes,
+                ev.get("acked", False),
+                matcher,
+            )
+            if notes:
+                for note in notes:
+                    log(format_note(note))
+                notes.clear()
+
+            result.decisions += 1
+            result.commands += len(cmds)
+            if cmds != recorded:
+                result.mismatches.append(Mismatch(i, n, ev["t"], recorded, cmds))
+    finally:
+        rec.close()
+    result.elapsed = time.perf_counter() - t0
+    return result
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Replay a recorded session.")
+    ap.add_argument("session", help="recording directory (run_logs/recordings/...)")
+    ap.add_argument("--verbose", action="store_true", help="print controller logs")
+    ap.add_argument("--show", type=int, default=10, help="mismatches to print")
+    args = ap.parse_args()
+
+    res = replay(args.session, log=print if args.verbose else None)
+    print(
+        f"[REPLAY] {res.decisions} decisions, {res.frames} frames, "
+        f"{res.commands} commands in {res.elapsed:.3f}s "
+        f"({res.rate:.0f} decisions/s)"
+    )
+    for m in res.mismatches[: args.show]:
+        print(
+            f"[DIFF] decision={m.decision} frame={m.frame} t={m.t:.3f} "
+            f"recorded={m.recorded} replayed={m.replayed}"
+        )
+    if res.mismatches:
+        print(f"[REPLAY] {len(res.mismatches)} mismatching decisions")
+        sys.exit(1)
+    print("[REPLAY] identical")